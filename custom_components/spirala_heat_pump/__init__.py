@@ -1,28 +1,229 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import logging
+import os
+import time
+
+import voluptuous as vol
+
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.typing import ConfigType
+from homeassistant.util import dt as dt_util
 
-from .const import DOMAIN, PLATFORMS
+from .connection import ModbusError
+from .const import (
+    DOMAIN, PLATFORMS, CACHE_VERSION, HISTORY_KEYS, HISTORY_LEVELS, SERVICE_GET_HISTORY,
+    SERVICE_SCAN_REGISTERS, SCAN_VERSION, SCAN_DEFAULT_RANGE, SCAN_WATCH_SECS,
+    JOURNAL_KEYS, JOURNAL_FILES, JOURNAL_QUERY_LIMIT, SERVICE_GET_JOURNAL,
+    SERVICE_READ_REGISTERS, SERVICE_WRITE_REGISTERS, DEFAULT_REGISTER_MAX_AGE_SECS,
+    MAX_REGS_PER_READ, MAX_REGS_PER_WRITE,
+)
+from .cascade import SpiralaCascade
 from .coordinator import SpiralaCoordinator
 
 _LOGGER = logging.getLogger(__name__)
 
+GET_HISTORY_SCHEMA = vol.Schema({
+    vol.Optional("config_entry_id"): cv.string,
+    vol.Optional("unit_id"): vol.Coerce(int),
+    vol.Optional("keys"): vol.All(cv.ensure_list, [vol.In(HISTORY_KEYS)]),
+    vol.Optional("duration", default=3600): vol.All(vol.Coerce(float), vol.Range(min=1)),
+    vol.Optional("resolution"): vol.All(vol.Coerce(int), vol.In([res for res, _ in HISTORY_LEVELS])),
+})
+
+GET_JOURNAL_SCHEMA = vol.Schema({
+    vol.Optional("config_entry_id"): cv.string,
+    vol.Optional("unit_id"): vol.Coerce(int),
+    vol.Optional("keys"): vol.All(cv.ensure_list, [vol.In(JOURNAL_KEYS)]),
+    vol.Optional("start"): cv.datetime,
+    vol.Optional("end"): cv.datetime,
+    vol.Optional("duration", default=86400): vol.All(vol.Coerce(float), vol.Range(min=1)),
+    vol.Optional("limit", default=JOURNAL_QUERY_LIMIT): vol.All(vol.Coerce(int), vol.Range(min=0, max=100000)),
+})
+
+SCAN_REGISTERS_SCHEMA = vol.Schema({
+    vol.Optional("config_entry_id"): cv.string,
+    vol.Optional("unit_id"): vol.Coerce(int),
+    vol.Required("action"): vol.In(["sweep", "watch", "mark", "stop", "report", "clear"]),
+    vol.Optional("start", default=SCAN_DEFAULT_RANGE[0]): vol.All(vol.Coerce(int), vol.Range(min=0, max=65535)),
+    vol.Optional("end", default=SCAN_DEFAULT_RANGE[1]): vol.All(vol.Coerce(int), vol.Range(min=1, max=65536)),
+    vol.Optional("rescan", default=False): cv.boolean,
+    vol.Optional("duration", default=3600): vol.All(vol.Coerce(float), vol.Range(min=1)),
+    vol.Optional("interval", default=SCAN_WATCH_SECS): vol.All(vol.Coerce(float), vol.Range(min=1)),
+    vol.Optional("label", default="mark"): cv.string,
+    vol.Optional("value"): vol.Coerce(float),
+})
+
+READ_REGISTERS_SCHEMA = vol.Schema({
+    vol.Optional("config_entry_id"): cv.string,
+    vol.Optional("unit_id"): vol.Coerce(int),
+    vol.Required("address"): vol.All(vol.Coerce(int), vol.Range(min=0, max=65535)),
+    vol.Optional("count", default=1): vol.All(vol.Coerce(int), vol.Range(min=1, max=MAX_REGS_PER_READ)),
+    vol.Optional("max_age", default=DEFAULT_REGISTER_MAX_AGE_SECS): vol.All(vol.Coerce(float), vol.Range(min=0)),
+})
+
+WRITE_REGISTERS_SCHEMA = vol.Schema({
+    vol.Optional("config_entry_id"): cv.string,
+    vol.Optional("unit_id"): vol.Coerce(int),
+    vol.Required("address"): vol.All(vol.Coerce(int), vol.Range(min=0, max=65535)),
+    vol.Required("values"): vol.All(
+        cv.ensure_list, [vol.All(vol.Coerce(int), vol.Range(min=0, max=65535))],
+        vol.Length(min=1, max=MAX_REGS_PER_WRITE),
+    ),
+})
+
+def _coordinator(hass: HomeAssistant, call: ServiceCall) -> SpiralaCoordinator:
+    """Unit the call is for: by entry, then by unit ID within a cascade."""
+    runtimes = {
+        entry_id: runtime for entry_id, runtime in hass.data.get(DOMAIN, {}).items()
+        if isinstance(runtime, (SpiralaCoordinator, SpiralaCascade))
+    }
+    entry_id = call.data.get("config_entry_id") or next(iter(runtimes), None)
+    runtime = runtimes.get(entry_id)
+    if runtime is None:
+        raise ServiceValidationError(f"No loaded {DOMAIN} entry {entry_id}")
+    coordinators = runtime.coordinators if isinstance(runtime, SpiralaCascade) else [runtime]
+    unit_id = call.data.get("unit_id")
+    coordinator = next((c for c in coordinators if unit_id in (None, c.unit_id)), None)
+    if coordinator is None:
+        raise ServiceValidationError(f"No unit {unit_id} in {DOMAIN} entry {entry_id}")
+    return coordinator
+
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    async def _async_get_history(call: ServiceCall) -> ServiceResponse:
+        coordinator = _coordinator(hass, call)
+        end = time.time()
+        return coordinator.history.window(
+            end - call.data["duration"], end, call.data.get("keys"), call.data.get("resolution")
+        )
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_GET_HISTORY, _async_get_history,
+        schema=GET_HISTORY_SCHEMA, supports_response=SupportsResponse.ONLY,
+    )
+
+    async def _async_get_journal(call: ServiceCall) -> ServiceResponse:
+        coordinator = _coordinator(hass, call)
+        now = time.time()
+        end = min(now, dt_util.as_utc(call.data["end"]).timestamp()) if "end" in call.data else now
+        if "start" in call.data:
+            start = dt_util.as_utc(call.data["start"]).timestamp()
+        else:
+            start = end - call.data["duration"]
+        if end <= start:
+            raise ServiceValidationError("end must be after start")
+        # Include the transitions of the last poll
+        await coordinator.async_flush_journal()
+        return await hass.async_add_executor_job(
+            coordinator.journal.query, start, end, call.data.get("keys"), call.data["limit"]
+        )
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_GET_JOURNAL, _async_get_journal,
+        schema=GET_JOURNAL_SCHEMA, supports_response=SupportsResponse.ONLY,
+    )
+
+    async def _async_read_registers(call: ServiceCall) -> ServiceResponse:
+        coordinator = _coordinator(hass, call)
+        address, count = call.data["address"], call.data["count"]
+        if address + count > 65536:
+            raise ServiceValidationError("The range ends past register 65535")
+        try:
+            return await coordinator.async_read_registers(address, count, call.data["max_age"])
+        except (ModbusError, asyncio.TimeoutError) as exc:
+            raise HomeAssistantError(f"Register read failed: {exc}") from exc
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_READ_REGISTERS, _async_read_registers,
+        schema=READ_REGISTERS_SCHEMA, supports_response=SupportsResponse.ONLY,
+    )
+
+    async def _async_write_registers(call: ServiceCall) -> ServiceResponse:
+        coordinator = _coordinator(hass, call)
+        address, values = call.data["address"], call.data["values"]
+        if address + len(values) > 65536:
+            raise ServiceValidationError("The range ends past register 65535")
+        try:
+            return await coordinator.async_write_registers(address, values)
+        except (ModbusError, asyncio.TimeoutError) as exc:
+            raise HomeAssistantError(f"Register write failed: {exc}") from exc
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_WRITE_REGISTERS, _async_write_registers,
+        schema=WRITE_REGISTERS_SCHEMA, supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    async def _async_scan_registers(call: ServiceCall) -> ServiceResponse:
+        scanner = _coordinator(hass, call).scanner
+        action = call.data["action"]
+        await scanner.async_load()
+        try:
+            if action == "sweep":
+                if call.data["end"] <= call.data["start"]:
+                    raise ServiceValidationError("end must be greater than start")
+                return await scanner.async_sweep(call.data["start"], call.data["end"], call.data["rescan"])
+            if action == "mark":
+                return await scanner.async_mark(call.data["label"], call.data.get("value"))
+        except ModbusError as exc:
+            raise HomeAssistantError(f"Register scan failed: {exc}") from exc
+        if action == "watch":
+            scanner.start_watch(call.data["duration"], call.data["interval"])
+        elif action == "stop":
+            scanner.stop_watch()
+        elif action == "clear":
+            await scanner.async_clear()
+        return scanner.report()
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_SCAN_REGISTERS, _async_scan_registers,
+        schema=SCAN_REGISTERS_SCHEMA, supports_response=SupportsResponse.OPTIONAL,
+    )
     return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    coordinator = SpiralaCoordinator(hass, entry)
-    await coordinator.async_config_entry_first_refresh()
-    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = coordinator
+    runtime = SpiralaCascade(hass, entry) if entry.data.get("cascade") else SpiralaCoordinator(hass, entry)
+    try:
+        await runtime.async_setup()
+    except Exception:
+        # Give back the shared gateway connections; setup will be retried
+        await runtime.async_close()
+        raise
+    if isinstance(runtime, SpiralaCascade):
+        # Unit devices link to the cascade device, so it has to exist first
+        dr.async_get(hass).async_get_or_create(config_entry_id=entry.entry_id, **runtime.device_info)
+    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = runtime
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    entry.async_on_unload(entry.add_update_listener(_async_options_updated))
     return True
 
+async def _async_options_updated(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    # Scan intervals and read planning are fixed at coordinator creation
+    await hass.config_entries.async_reload(entry.entry_id)
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
-        coordinator: SpiralaCoordinator = hass.data[DOMAIN].pop(entry.entry_id)
-        await coordinator.async_close()
+        runtime: SpiralaCoordinator | SpiralaCascade = hass.data[DOMAIN].pop(entry.entry_id)
+        await runtime.async_close()
     return unload_ok
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    if entry.data.get("cascade"):
+        storage_ids = [f"{entry.entry_id}.{host}-{port}-{unit_id}" for host, port, unit_id in entry.data["units"]]
+    else:
+        storage_ids = [entry.entry_id]
+    for storage_id in storage_ids:
+        await Store(hass, CACHE_VERSION, f"{DOMAIN}.{storage_id}").async_remove()
+        await Store(hass, SCAN_VERSION, f"{DOMAIN}.{storage_id}.scan").async_remove()
+        base = hass.config.path(".storage", f"{DOMAIN}.{storage_id}")
+        journal = f"{base}.journal"
+        for path in (f"{base}.history", journal, *(f"{journal}.{k}" for k in range(1, JOURNAL_FILES))):
+            with contextlib.suppress(FileNotFoundError):
+                await hass.async_add_executor_job(os.remove, path)
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+from datetime import timedelta
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import DOMAIN, MANUFACTURER, DEVICE_NAME, CASCADE_NAME, HISTORY_FLUSH_SECS
+from .coordinator import SpiralaCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SpiralaCascade:
+    """The units of a cascade entry, polled by one scheduler.
+
+    Each unit keeps its own coordinator (snapshot, entities, history,
+    cache), but none of them runs a timer. One tick on a grid of
+    `scan_interval` polls the units that are due: running units every tick,
+    idle ones every `idle_scan_interval` rounded up to whole ticks. The due
+    units are refreshed concurrently. Units behind different gateways are
+    then on the wire at the same time; units behind the same gateway share
+    its connection, which serves them round-robin. A unit still polling at
+    its next tick skips it. Timers and wakeups stay the same however many
+    units there are.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
+        self.hass = hass
+        self.entry = entry
+        units = [tuple(unit) for unit in entry.data["units"]]
+        self.coordinators = [SpiralaCoordinator(hass, entry, unit) for unit in units]
+        self.device_identifier = (DOMAIN, f"cascade-{entry.entry_id}")
+        self.device_info = DeviceInfo(
+            identifiers={self.device_identifier},
+            manufacturer=MANUFACTURER,
+            model="Cascade",
+            name=CASCADE_NAME,
+        )
+        unit_ids = [unit[2] for unit in units]
+        for c in self.coordinators:
+            c.via_device = self.device_identifier
+            c.device_name = (
+                f"{DEVICE_NAME} {c.unit_id}" if len(set(unit_ids)) == len(unit_ids)
+                else f"{DEVICE_NAME} {c.host}:{c.port}/{c.unit_id}"
+            )
+        first = self.coordinators[0]
+        self.scan_secs = first.scan_secs
+        self.idle_secs = math.ceil(first.idle_scan_secs / self.scan_secs) * self.scan_secs
+        self._due: list[float] = []
+        self._next_tick: float | None = None
+        self._unsub_tick: CALLBACK_TYPE | None = None
+        self._unsub_flush: CALLBACK_TYPE | None = None
+
+    async def async_setup(self) -> None:
+        """Set up every unit (from its cache where there is one), then start ticking."""
+        results = await asyncio.gather(*(c.async_setup() for c in self.coordinators), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        first_tick = self.hass.loop.time() + self.scan_secs
+        self._due = [first_tick] * len(self.coordinators)
+        self._schedule()
+        self._unsub_flush = async_track_time_interval(
+            self.hass, self._async_flush_history, timedelta(seconds=HISTORY_FLUSH_SECS)
+        )
+
+    @callback
+    def _schedule(self) -> None:
+        if self._unsub_tick is not None:
+            self._unsub_tick()
+        now = self.hass.loop.time()
+        tick = min(self._due)
+        if tick <= now:
+            # Dues stay on the grid; ticks missed while the loop was busy are skipped
+            tick += (int((now - tick) // self.scan_secs) + 1) * self.scan_secs
+        self._next_tick = tick
+        self._unsub_tick = self.hass.loop.call_at(tick, self._tick).cancel
+
+    @callback
+    def _tick(self) -> None:
+        self._unsub_tick = None
+        tick = self._next_tick
+        due: list[int] = []
+        for i, c in enumerate(self.coordinators):
+            if self._due[i] > tick + self.scan_secs / 2:
+                continue
+            self._due[i] = tick + (self.scan_secs if c.compressor_running else self.idle_secs)
+            if c.polling:
+                c.stats.skipped_ticks += 1
+                continue
+            due.append(i)
+        if due:
+            self.hass.async_create_task(self._async_poll(due, tick))
+        self._schedule()
+
+    async def _async_poll(self, due: list[int], tick: float) -> None:
+        await asyncio.gather(*(self.coordinators[i].async_refresh() for i in due))
+        # A unit whose compressor just started is polled at the scan rate from the next tick
+        sooner = False
+        for i in due:
+            if self.coordinators[i].compressor_running and self._due[i] > tick + self.scan_secs:
+                self._due[i] = tick + self.scan_secs
+                sooner = True
+        if sooner and self._unsub_tick is not None:
+            self._schedule()
+
+    async def _async_flush_history(self, _now=None) -> None:
+        for c in self.coordinators:
+            await c.async_flush_history()
+
+    def total(self, key: str) -> float | None:
+        """Sum over all units; None unless every unit has a value, so totals never dip."""
+        values = [None if c.data is None else c.data.get(key) for c in self.coordinators]
+        return None if None in values else sum(values)
+
+    @property
+    def units_running(self) -> int:
+        return sum(c.compressor_running for c in self.coordinators)
+
+    @property
+    def units_faulted(self) -> int:
+        """Units reporting an error code, or not answering."""
+        return sum(
+            1 for c in self.coordinators
+            if not c.last_update_success or (c.data is not None and c.data.get("error_code") not in (None, 0))
+        )
+
+    async def async_close(self) -> None:
+        if self._unsub_tick is not None:
+            self._unsub_tick()
+            self._unsub_tick = None
+        if self._unsub_flush is not None:
+            self._unsub_flush()
+            self._unsub_flush = None
+        await asyncio.gather(*(c.async_close() for c in self.coordinators))
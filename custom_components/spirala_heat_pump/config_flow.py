@@ -1,17 +1,27 @@
 from __future__ import annotations
 
+import os
 import socket
-from typing import Any
+from typing import Any, Mapping
 import voluptuous as vol
 from homeassistant import config_entries
-from homeassistant.data_entry_flow import FlowResult
+from homeassistant.data_entry_flow import AbortFlow, FlowResult
 from homeassistant.core import callback
 
-from .const import DOMAIN, DEFAULT_PORT, DEFAULT_UNIT_ID, DEFAULT_SCAN_SECS
+from .const import (
+    DOMAIN, DEFAULT_PORT, DEFAULT_UNIT_ID, DEFAULT_SCAN_SECS, DEFAULT_IDLE_SCAN_SECS,
+    MAX_REGS_PER_READ, DEFAULT_MEDIUM_SCAN_SECS, DEFAULT_SLOW_SCAN_SECS, DEFAULT_FRAME_DELAY_MS,
+    TRANSPORTS, TRANSPORT_TCP, TRANSPORT_RTU_OVER_TCP, TRANSPORT_SERIAL, DEFAULT_BAUDRATE, BAUDRATES,
+    DEFAULT_SERIAL_DEVICE, EXPORT_FORMATS,
+)
+from .export import make_sink
+from .planner import plan_defaults
 
 STEP_USER_DATA_SCHEMA = vol.Schema({
     vol.Required("host"): str,
     vol.Optional("port", default=DEFAULT_PORT): int,
+    vol.Optional("transport", default=TRANSPORT_TCP): vol.In([TRANSPORT_TCP, TRANSPORT_RTU_OVER_TCP]),
+    vol.Optional("baudrate", default=DEFAULT_BAUDRATE): vol.In(BAUDRATES),
     vol.Optional("unit_id", default=DEFAULT_UNIT_ID): int,
     vol.Optional("scan_interval", default=DEFAULT_SCAN_SECS): int,
     vol.Optional("enable_cooling", default=True): bool,
@@ -20,10 +30,95 @@ STEP_USER_DATA_SCHEMA = vol.Schema({
     vol.Optional("external_temp_sensor_installed", default=False): bool,
 })
 
+STEP_SERIAL_DATA_SCHEMA = vol.Schema({
+    vol.Required("device", default=DEFAULT_SERIAL_DEVICE): str,
+    vol.Optional("baudrate", default=DEFAULT_BAUDRATE): vol.In(BAUDRATES),
+    vol.Optional("parity", default="N"): vol.In(["N", "E", "O"]),
+    vol.Optional("stopbits", default=1): vol.In([1, 2]),
+    vol.Optional("unit_id", default=DEFAULT_UNIT_ID): int,
+    vol.Optional("scan_interval", default=DEFAULT_SCAN_SECS): int,
+    vol.Optional("enable_cooling", default=True): bool,
+    vol.Optional("external_temp_sensor_installed", default=False): bool,
+})
+
+STEP_CASCADE_DATA_SCHEMA = vol.Schema({
+    vol.Optional("host"): str,
+    vol.Optional("port", default=DEFAULT_PORT): int,
+    vol.Optional("transport", default=TRANSPORT_TCP): vol.In(TRANSPORTS),
+    vol.Optional("baudrate", default=DEFAULT_BAUDRATE): vol.In(BAUDRATES),
+    vol.Required("units"): str,
+    vol.Optional("scan_interval", default=DEFAULT_SCAN_SECS): int,
+    vol.Optional("enable_cooling", default=True): bool,
+    vol.Optional("external_temp_sensor_installed", default=False): bool,
+})
+
+def parse_units(text: str, host: str | None, port: int) -> list[list[Any]]:
+    """Units of a cascade from e.g. "60, 61" or "10.0.0.5:502/60, 10.0.0.6".
+
+    Each item is `[host[:port]][/unit]`, or a bare unit ID behind the default
+    host; missing parts come from the defaults. A default port of 0 is a
+    serial port in `host`. Returns [host, port, unit_id] lists; raises
+    ValueError on a malformed or repeated unit.
+    """
+    units: list[list[Any]] = []
+    for item in filter(None, (part.strip() for part in text.replace(";", ",").split(","))):
+        unit_host, unit_port, unit_id = host, port, DEFAULT_UNIT_ID
+        if item.isdigit():
+            unit_id = int(item)
+        else:
+            address, _, unit = item.partition("/")
+            unit_host, _, unit_port_text = address.partition(":")
+            unit_port = int(unit_port_text) if unit_port_text else port
+            if unit:
+                unit_id = int(unit)
+        if not unit_host or not 0 <= unit_id <= 247 or not (0 < unit_port < 65536 or unit_port == port == 0):
+            raise ValueError(item)
+        unit = [unit_host, unit_port, unit_id]
+        if unit in units:
+            raise ValueError(item)
+        units.append(unit)
+    if len(units) < 2:
+        raise ValueError(text)
+    return units
+
+def entry_units(entry: config_entries.ConfigEntry) -> list[tuple[str, int, int]]:
+    """(host, port, unit_id) of every unit an entry polls; serial ports have port 0."""
+    data = entry.data
+    if data.get("cascade"):
+        return [tuple(unit) for unit in data["units"]]
+    if data.get("transport") == TRANSPORT_SERIAL:
+        return [(data["device"], 0, data.get("unit_id", DEFAULT_UNIT_ID))]
+    return [(data["host"], data.get("port"), data.get("unit_id", DEFAULT_UNIT_ID))]
+
+def explicit_plan_options(data: Mapping[str, Any], user_input: dict[str, Any]) -> dict[str, Any]:
+    """The options to store: `user_input` without read sizes left at what the link derives.
+
+    max_regs_per_read and read_gap default from the transport and baud rate
+    (plan_defaults). A stored value would win over that, so one equal to the
+    derived default, for the old or the new link settings, is not stored and
+    a later baud rate change derives them again.
+    """
+    link = {k: v for k, v in data.items() if k not in ("max_regs_per_read", "read_gap")}
+    derived = [plan_defaults(link), plan_defaults({**link, **user_input})]
+    options = dict(user_input)
+    for i, key in enumerate(("max_regs_per_read", "read_gap")):
+        if key in options and options[key] in {defaults[i] for defaults in derived}:
+            del options[key]
+    return options
+
 class SpiralaConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     VERSION = 1
 
+    def _abort_if_units_configured(self, units: list[tuple[str, int, int]]) -> None:
+        """Abort when a unit is already polled by another entry, single or cascade."""
+        configured = {unit for entry in self._async_current_entries() for unit in entry_units(entry)}
+        if configured.intersection(map(tuple, units)):
+            raise AbortFlow("already_configured")
+
     async def async_step_user(self, user_input: dict[str, Any] | None = None) -> FlowResult:
+        return self.async_show_menu(step_id="user", menu_options=["single", "serial", "cascade"])
+
+    async def async_step_single(self, user_input: dict[str, Any] | None = None) -> FlowResult:
         errors: dict[str, str] = {}
         if user_input is not None:
             host = user_input["host"]
@@ -34,8 +129,51 @@ class SpiralaConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             if not errors:
                 await self.async_set_unique_id(f"{host}:{user_input['port']}:{user_input['unit_id']}")
                 self._abort_if_unique_id_configured()
+                self._abort_if_units_configured([(host, user_input["port"], user_input["unit_id"])])
                 return self.async_create_entry(title=f"Spirála @ {host}", data=user_input)
-        return self.async_show_form(step_id="user", data_schema=STEP_USER_DATA_SCHEMA, errors=errors)
+        return self.async_show_form(step_id="single", data_schema=STEP_USER_DATA_SCHEMA, errors=errors)
+
+    async def async_step_serial(self, user_input: dict[str, Any] | None = None) -> FlowResult:
+        errors: dict[str, str] = {}
+        if user_input is not None:
+            device = user_input["device"]
+            if not await self.hass.async_add_executor_job(os.path.exists, device):
+                errors["device"] = "no_device"
+            if not errors:
+                await self.async_set_unique_id(f"{device}:0:{user_input['unit_id']}")
+                self._abort_if_unique_id_configured()
+                self._abort_if_units_configured([(device, 0, user_input["unit_id"])])
+                return self.async_create_entry(
+                    title=f"Spirála @ {device}", data={**user_input, "transport": TRANSPORT_SERIAL}
+                )
+        return self.async_show_form(step_id="serial", data_schema=STEP_SERIAL_DATA_SCHEMA, errors=errors)
+
+    async def async_step_cascade(self, user_input: dict[str, Any] | None = None) -> FlowResult:
+        errors: dict[str, str] = {}
+        if user_input is not None:
+            serial = user_input["transport"] == TRANSPORT_SERIAL
+            if serial:
+                # Every unit hangs off the one serial port in `host`
+                user_input["port"] = 0
+            try:
+                units = parse_units(user_input["units"], user_input.get("host"), user_input["port"])
+            except ValueError:
+                errors["units"] = "invalid_units"
+            else:
+                for host in set() if serial else {host for host, _, _ in units}:
+                    try:
+                        await self.hass.async_add_executor_job(socket.gethostbyname, host)
+                    except socket.gaierror:
+                        errors["units"] = "cannot_connect"
+            if not errors:
+                await self.async_set_unique_id("cascade:" + ",".join(f"{h}:{p}:{u}" for h, p, u in sorted(units)))
+                self._abort_if_unique_id_configured()
+                self._abort_if_units_configured(units)
+                data = {k: v for k, v in user_input.items() if k not in ("host", "port", "units")}
+                return self.async_create_entry(
+                    title=f"Spirála cascade ({len(units)} units)", data={**data, "cascade": True, "units": units}
+                )
+        return self.async_show_form(step_id="cascade", data_schema=STEP_CASCADE_DATA_SCHEMA, errors=errors)
 
     @staticmethod
     @callback
@@ -48,14 +186,41 @@ class SpiralaOptionsFlow(config_entries.OptionsFlowWithConfigEntry):
 
     async def async_step_init(self, user_input: dict[str, Any] | None = None) -> FlowResult:
         data = {**self.config_entry.data, **(self.config_entry.options or {})}
+        max_count, gap = plan_defaults(data)
         schema = vol.Schema({
             vol.Optional("scan_interval", default=data.get("scan_interval", DEFAULT_SCAN_SECS)): int,
+            vol.Optional("idle_scan_interval", default=data.get("idle_scan_interval", DEFAULT_IDLE_SCAN_SECS)):
+                vol.All(int, vol.Range(min=1)),
+            vol.Optional("medium_scan_interval", default=data.get("medium_scan_interval", DEFAULT_MEDIUM_SCAN_SECS)):
+                vol.All(int, vol.Range(min=1)),
+            vol.Optional("slow_scan_interval", default=data.get("slow_scan_interval", DEFAULT_SLOW_SCAN_SECS)):
+                vol.All(int, vol.Range(min=0)),
             vol.Optional("enable_cooling", default=data.get("enable_cooling", True)): bool,
             # vol.Optional("enable_dhw", default=data.get("enable_dhw", True)): bool,
             # vol.Optional("has_circuit_2", default=data.get("has_circuit_2", False)): bool,
             vol.Optional("external_temp_sensor_installed", default=data.get("external_temp_sensor_installed", False)): bool,
-
+            vol.Optional("max_regs_per_read", default=data.get("max_regs_per_read", max_count)):
+                vol.All(int, vol.Range(min=1, max=MAX_REGS_PER_READ)),
+            vol.Optional("read_gap", default=data.get("read_gap", gap)): vol.All(int, vol.Range(min=0)),
+            vol.Optional("auto_tune_gap", default=data.get("auto_tune_gap", True)): bool,
+            vol.Optional("frame_delay_ms", default=data.get("frame_delay_ms", DEFAULT_FRAME_DELAY_MS)):
+                vol.All(int, vol.Range(min=0, max=1000)),
+            vol.Optional("enable_history", default=data.get("enable_history", True)): bool,
+            vol.Optional("enable_journal", default=data.get("enable_journal", True)): bool,
+            vol.Optional("export_format", default=data.get("export_format", "off")): vol.In(("off", *EXPORT_FORMATS)),
+            vol.Optional("export_target", default=data.get("export_target", "")): str,
         })
+        if data.get("transport", TRANSPORT_TCP) != TRANSPORT_TCP:
+            schema = schema.extend({
+                vol.Optional("baudrate", default=data.get("baudrate", DEFAULT_BAUDRATE)): vol.In(BAUDRATES),
+            })
+        errors: dict[str, str] = {}
         if user_input is not None:
-            return self.async_create_entry(title="Options", data=user_input)
-        return self.async_show_form(step_id="init", data_schema=schema)
+            if user_input.get("export_format", "off") != "off":
+                try:
+                    make_sink(self.hass, user_input.get("export_target", ""))
+                except ValueError:
+                    errors["export_target"] = "invalid_export_target"
+            if not errors:
+                return self.async_create_entry(title="Options", data=explicit_plan_options(data, user_input))
+        return self.async_show_form(step_id="init", data_schema=schema, errors=errors)
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+import random
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
+
+from .const import (
+    DOMAIN, DATA_CONNECTIONS, REQUEST_TIMEOUT_SECS, RECONNECT_MIN_SECS, RECONNECT_MAX_SECS,
+    MAX_REGS_PER_READ, TRANSPORT_TCP, TRANSPORT_SERIAL, DEFAULT_BAUDRATE,
+)
+from .planner import rtu_read_secs, rtu_silent_secs
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ModbusError(Exception):
+    """A Modbus request failed; raised in place of pymodbus' own exceptions.
+
+    Importing `pymodbus.exceptions` imports most of pymodbus, so callers
+    catch these instead and pymodbus is only loaded with the first client.
+    """
+
+
+class ModbusConnectionError(ModbusError):
+    """The gateway or serial port is not connected, or the connection was lost."""
+
+
+def _import_pymodbus() -> tuple[Any, Any, Any]:
+    """pymodbus' client module, FramerType and exceptions module; blocks, so it runs in the executor."""
+    client = importlib.import_module("pymodbus.client")
+    return client, importlib.import_module("pymodbus").FramerType, importlib.import_module("pymodbus.exceptions")
+
+
+class SpiralaConnection:
+    """One Modbus client per gateway or serial port, shared by every unit behind it.
+
+    Requests are queued per unit ID and served round-robin by a single
+    worker, so one busy unit cannot starve the others and the gateway only
+    ever sees one outstanding frame. Each unit can ask for a quiet time on
+    the bus before its frame is sent.
+
+    Reconnecting is owned here rather than by pymodbus: a lost or refused
+    connection is retried with exponential backoff and jitter, and while
+    backing off requests fail fast with ModbusConnectionError instead of
+    touching the network.
+
+    On an RTU bus (a serial port, where `host` is the device and `port` 0,
+    or RTU over TCP) frames are kept the 3.5 character silence apart at
+    the bus baud rate, and the timeout allows for the largest read's wire time.
+
+    The pymodbus client is created on the first connect, so setting up an
+    entry does not import pymodbus until the unit is actually polled. That
+    first import runs in the executor (HA's when `hass` is given), not on
+    the event loop.
+    """
+
+    def __init__(self, host: str, port: int, transport: str = TRANSPORT_TCP,
+                 baudrate: int = DEFAULT_BAUDRATE, parity: str = "N", stopbits: int = 1,
+                 hass: HomeAssistant | None = None) -> None:
+        self.hass = hass
+        self.host = host
+        self.port = port
+        self.transport = transport
+        rtu = transport != TRANSPORT_TCP
+        self.timeout = REQUEST_TIMEOUT_SECS + (rtu_read_secs(baudrate, MAX_REGS_PER_READ) if rtu else 0.0)
+        self.bus_silence = rtu_silent_secs(baudrate) if rtu else 0.0
+        self._serial = {"baudrate": baudrate, "parity": parity, "stopbits": stopbits}
+        self.client: Any = None
+        self._errors: Any = None
+        self.refs = 0
+        self.state = "disconnected"
+        self.reconnects = 0
+        self._connect_failures = 0
+        self._retry_at = 0.0
+        self._queues: dict[int, deque[tuple[Callable[[], Awaitable[Any]], asyncio.Future]]] = {}
+        self._ready: deque[int] = deque()
+        self._wakeup = asyncio.Event()
+        self._frame_delay: dict[int, float] = {}
+        self._last_frame = 0.0
+        self._connect_lock = asyncio.Lock()
+        self._worker: asyncio.Task | None = None
+
+    def add_unit(self, unit_id: int, frame_delay: float = 0.0) -> None:
+        self._queues.setdefault(unit_id, deque())
+        self._frame_delay[unit_id] = frame_delay
+
+    async def _async_create_client(self) -> None:
+        if self.hass is not None:
+            client, framer_type, exceptions = await self.hass.async_add_executor_job(_import_pymodbus)
+        else:
+            client, framer_type, exceptions = await asyncio.get_running_loop().run_in_executor(
+                None, _import_pymodbus
+            )
+        if self.transport == TRANSPORT_SERIAL:
+            self.client = client.AsyncModbusSerialClient(
+                self.host, **self._serial, timeout=self.timeout, retries=0, reconnect_delay=0,
+            )
+        else:
+            self.client = client.AsyncModbusTcpClient(
+                self.host, port=self.port,
+                framer=framer_type.RTU if self.transport != TRANSPORT_TCP else framer_type.SOCKET,
+                timeout=self.timeout, retries=0, reconnect_delay=0,
+            )
+        self._errors = exceptions
+
+    @property
+    def connected(self) -> bool:
+        return self.client is not None and self.client.connected
+
+    @property
+    def backing_off(self) -> bool:
+        return not self.connected and time.monotonic() < self._retry_at
+
+    async def connect(self) -> bool:
+        async with self._connect_lock:
+            if self.connected:
+                return True
+            if time.monotonic() < self._retry_at:
+                return False
+            reconnect = self.state != "disconnected"
+            self.state = "connecting"
+            if self.client is None:
+                await self._async_create_client()
+            try:
+                await self.client.connect()
+            except (OSError, self._errors.ConnectionException) as exc:
+                _LOGGER.debug("Connect to %s:%s failed: %s", self.host, self.port, exc)
+            if self.client.connected:
+                if reconnect:
+                    self.reconnects += 1
+                self.state = "connected"
+                self._connect_failures = 0
+                return True
+            self._connect_failures += 1
+            delay = min(RECONNECT_MAX_SECS, RECONNECT_MIN_SECS * 2 ** (self._connect_failures - 1))
+            # Full jitter keeps several HA instances/entries from retrying in lockstep
+            delay = random.uniform(delay / 2, delay)
+            self._retry_at = time.monotonic() + delay
+            self.state = "backoff"
+            _LOGGER.warning(
+                "Cannot connect to %s:%s, retrying in %.1f s", self.host, self.port, delay
+            )
+            return False
+
+    def _connection_lost(self) -> None:
+        self.client.close()
+        self.state = "lost"
+
+    async def read_holding_registers(self, unit_id: int, address: int, count: int) -> tuple[Any, float]:
+        """Returns the response and the bus time it took, excluding queueing."""
+        return await self._submit(
+            unit_id, lambda: self.client.read_holding_registers(address, count=count, device_id=unit_id)
+        )
+
+    async def write_register(self, unit_id: int, address: int, value: int) -> tuple[Any, float]:
+        return await self._submit(
+            unit_id, lambda: self.client.write_register(address, value, device_id=unit_id)
+        )
+
+    async def write_registers(self, unit_id: int, address: int, values: list[int]) -> tuple[Any, float]:
+        return await self._submit(
+            unit_id, lambda: self.client.write_registers(address, values, device_id=unit_id)
+        )
+
+    async def _submit(self, unit_id: int, call: Callable[[], Awaitable[Any]]) -> tuple[Any, float]:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        fut = asyncio.get_running_loop().create_future()
+        queue = self._queues.setdefault(unit_id, deque())
+        queue.append((call, fut))
+        if len(queue) == 1:
+            self._ready.append(unit_id)
+            self._wakeup.set()
+        return await fut
+
+    async def _run(self) -> None:
+        while True:
+            if not self._ready:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            unit_id = self._ready.popleft()
+            queue = self._queues[unit_id]
+            call, fut = queue.popleft()
+            if queue:
+                # Back of the line: other units get their turn first
+                self._ready.append(unit_id)
+            if fut.cancelled():
+                continue
+            if not self.connected and not await self.connect():
+                # The caller may have given up while the connect was pending
+                if not fut.cancelled():
+                    fut.set_exception(ModbusConnectionError(f"{self.host}:{self.port} not connected"))
+                continue
+            wait = max(self._frame_delay.get(unit_id, 0.0), self.bus_silence) - (time.monotonic() - self._last_frame)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            t0 = time.monotonic()
+            try:
+                result = await asyncio.wait_for(call(), self.timeout + 1)
+            except Exception as exc:  # noqa: BLE001 - handed to the caller
+                if isinstance(exc, self._errors.ConnectionException) or not self.client.connected:
+                    self._connection_lost()
+                if not fut.cancelled():
+                    fut.set_exception(self._translate(exc))
+            else:
+                if not fut.cancelled():
+                    fut.set_result((result, time.monotonic() - t0))
+            finally:
+                self._last_frame = time.monotonic()
+
+    def _translate(self, exc: Exception) -> Exception:
+        """The ModbusError for a pymodbus exception, chained to it; anything else as is."""
+        if isinstance(exc, self._errors.ConnectionException):
+            error = ModbusConnectionError(str(exc))
+        elif isinstance(exc, self._errors.ModbusException):
+            error = ModbusError(str(exc))
+        else:
+            return exc
+        error.__cause__ = exc
+        return error
+
+    def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        for queue in self._queues.values():
+            while queue:
+                _, fut = queue.popleft()
+                fut.cancel()
+        self._ready.clear()
+        if self.client is not None:
+            self.client.close()
+
+
+def async_acquire_connection(hass: HomeAssistant, host: str, port: int, transport: str = TRANSPORT_TCP,
+                             **serial: Any) -> SpiralaConnection:
+    """Shared connection for a gateway or serial port, created on first use."""
+    connections: dict[tuple[str, int], SpiralaConnection] = (
+        hass.data.setdefault(DOMAIN, {}).setdefault(DATA_CONNECTIONS, {})
+    )
+    conn = connections.get((host, port))
+    if conn is None:
+        conn = connections[(host, port)] = SpiralaConnection(host, port, transport, **serial, hass=hass)
+    elif conn.transport != transport:
+        _LOGGER.warning(
+            "%s:%s is already used over %s, ignoring transport %s", host, port, conn.transport, transport
+        )
+    conn.refs += 1
+    return conn
+
+
+def async_release_connection(hass: HomeAssistant, conn: SpiralaConnection) -> None:
+    """Drop one reference; the last user closes the client."""
+    conn.refs -= 1
+    if conn.refs > 0:
+        return
+    _LOGGER.debug("Closing Modbus connection to %s:%s", conn.host, conn.port)
+    hass.data.get(DOMAIN, {}).get(DATA_CONNECTIONS, {}).pop((conn.host, conn.port), None)
+    conn.close()
@@ -4,83 +4,139 @@ DOMAIN = "spirala_heat_pump"
 MANUFACTURER = "Spirala"
 MODEL = "Spirala"
 DEVICE_NAME = "Spirala Heat Pump"
+CASCADE_NAME = "Spirala Cascade"
 PLATFORMS = ["sensor", "number", "switch", "select", "binary_sensor"]
 DEFAULT_PORT = 4196
 DEFAULT_UNIT_ID = 60
 DEFAULT_SCAN_SECS = 1
+# Scan interval while the compressor is off; scan_interval applies while it runs
+DEFAULT_IDLE_SCAN_SECS = 5
 
-# Register map (from Spirála Modbus sheet)
-TEMP_REGS = {
-    "tank_temp_1": 0,
-    "tank_temp_2": 1,
-    "dhw_tank_temp": 2,
-    # "outdoor_temp": 3,
-    "supply_temp": 10,
-    "return_temp": 11,
-}
+# Transports: Modbus TCP, RTU frames over a raw TCP socket (transparent
+# serial gateways) and RTU on a local serial port. The baud rate is that of
+# the RS485 bus, also behind an RTU-over-TCP gateway, and sets the frame timing
+TRANSPORT_TCP = "tcp"
+TRANSPORT_RTU_OVER_TCP = "rtu_over_tcp"
+TRANSPORT_SERIAL = "serial"
+TRANSPORTS = (TRANSPORT_TCP, TRANSPORT_RTU_OVER_TCP, TRANSPORT_SERIAL)
+DEFAULT_BAUDRATE = 9600
+BAUDRATES = (1200, 2400, 4800, 9600, 19200, 38400, 57600, 115200)
+DEFAULT_SERIAL_DEVICE = "/dev/ttyUSB0"
 
-STATUS_REGS = {
-    "error_code": 27,
-    "not_running_reason": 28,
-    "io_state": 29,
-    "relay_state": 30,
-    "active_circuit": 31,
-}
+# hass.data[DOMAIN] key of the shared per-gateway connections
+DATA_CONNECTIONS = "connections"
+# Quiet time on the bus before a frame to a unit; slow RS485 gateways need it
+DEFAULT_FRAME_DELAY_MS = 0
+# Writes are held this long so a slider drag or a script setting several
+# registers goes out as one batch of writes per contiguous range
+WRITE_DEBOUNCE_SECS = 0.3
 
-PERCENT_REGS = {
-    "injector_valve_pct": 32,
-    "cold_pump_pct": 33,
-}
+# Failure handling: per-request timeout, retries shared by all reads of one
+# poll, reconnect backoff and the number of failed polls before entities go
+# unavailable. Once unavailable, the unit is probed after a delay doubling
+# from the min to the max instead of on every tick
+REQUEST_TIMEOUT_SECS = 2.0
+POLL_RETRY_BUDGET = 2
+RECONNECT_MIN_SECS = 1.0
+RECONNECT_MAX_SECS = 60.0
+DEFAULT_FAILED_POLLS_UNAVAILABLE = 3
+PROBE_MIN_SECS = 10.0
+PROBE_MAX_SECS = 300.0
 
-COUNTER_REGS32 = {
-    "starts_count": 36,  # 36-37
-    "runtime_hours": 38,  # 38-39
-}
+# Read planning: Modbus caps a holding-register read at 125 registers
+MAX_REGS_PER_READ = 125
+DEFAULT_MAX_REGS_PER_READ = 64
+# Unmapped registers a read may bridge before a separate request is cheaper
+DEFAULT_READ_GAP = 8
+# RTU links: reads are sized from the wire time at the bus baud rate. The
+# unit's turnaround is what a request costs besides its bytes, and no
+# response may hold the bus longer than RTU_MAX_FRAME_SECS so writes and
+# other units are not stuck behind it
+RTU_TURNAROUND_SECS = 0.02
+RTU_MAX_FRAME_SECS = 0.15
 
-SETPOINT_REGS = {
-    "setpoint_1": 18,
-    "setpoint_2": 19,
-    "setpoint_dhw": 20,
-}
+# Poll tiers: live telemetry every scan, counters at a medium rate and
+# configuration registers slowly (or only after a write when set to 0)
+POLL_TIER_FAST = "fast"
+POLL_TIER_MEDIUM = "medium"
+POLL_TIER_SLOW = "slow"
+POLL_TIERS = (POLL_TIER_FAST, POLL_TIER_MEDIUM, POLL_TIER_SLOW)
+DEFAULT_MEDIUM_SCAN_SECS = 30
+DEFAULT_SLOW_SCAN_SECS = 600
 
-MODE_TOGGLE_REGS = {
-    "thermostat_mode_1": 41,
-    "thermostat_mode_2": 151,
-    "cooling_enable": 56,
-    "dhw_enable": 40,
-}
+# Change-only publishing: temperatures move by sensor noise every poll, so a
+# change smaller than the deadband is not published; any value, changed or
+# not, is republished after max silence
+TEMP_DEADBAND = 0.1
+DEFAULT_MAX_SILENCE_SECS = 300
 
-TIME_REGS = {
-    # key: (address, "seconds" | "minutes")
-    "pump_overrun":      (None, "seconds"),   # e.g., pump overrun after compressor stop
-    "anti_cycle_time":   (None, "minutes"),   # e.g., min time between compressor starts
-    "pump_min_run":      (None, "seconds"),   # e.g., min circulation pump runtime
-    "pump_post_defrost": (None, "seconds"),   # e.g., circulation after defrost
-}
+# Startup cache (HA Store): identity, feature flags and the last snapshot,
+# saved at most this often unless the identity or feature flags change
+CACHE_VERSION = 1
+CACHE_SAVE_SECS = 600
+
+# Identity (identity.py): while unknown, the identity block is read again
+# after a backoff growing from the min to the max
+IDENTITY_RETRY_MIN_SECS = 30
+IDENTITY_RETRY_MAX_SECS = 3600
+
+# Local telemetry history (history.py): keys kept per poll and the
+# (bucket seconds, rows) of each ring; 0 s is the raw per-poll ring.
+# 15 min raw at 1 s, 6 h of 10 s, 24 h of 1 min and 30 days of 15 min
+HISTORY_KEYS = (
+    "supply_temp", "return_temp", "tank_temp_1", "tank_temp_2", "dhw_tank_temp",
+    "injector_valve_pct", "cold_pump_pct",
+)
+HISTORY_LEVELS = ((0, 900), (10, 2160), (60, 1440), (900, 2880))
+HISTORY_FLUSH_SECS = 300
+SERVICE_GET_HISTORY = "get_history"
 
-# bit definitions for io_state (reg 29)
-IO_BITS = [
-    ("io_hdo", 0),
-    ("io_preso_evap", 1),
-    ("io_preso_cond", 2),
-    ("io_control_1", 3),
-    ("io_control_2", 4),
-    ("io_contactor", 5),
-    ("io_valve", 6),
-]
-
-# bit definitions for relay_state (reg 30)
-RELAY_BITS = [
-    ("relay_pump_circuit2", 0),
-    ("relay_dhw", 1),
-    ("relay_bivalence", 2),
-    ("relay_radiators", 3),
-    ("relay_primary_pump", 4),
-    # ("relay_fault", 5),
-    ("relay_cooling", 6),
-    ("relay_pump_circuit1", 7),
-]
+# Long-term statistics (longterm.py): hourly rows imported into the recorder
+# as external statistics, counters as state/sum and temperatures as
+# mean/min/max. Outages up to STATISTICS_BACKFILL_MAX_HOURS are backfilled
+# from the counter deltas
+STATISTICS_COUNTER_KEYS = ("starts_count", "runtime_hours")
+STATISTICS_MEAN_KEYS = ("supply_temp", "return_temp", "tank_temp_1", "tank_temp_2", "dhw_tank_temp")
+STATISTICS_BACKFILL_MAX_HOURS = 24 * 31
 
+# Transition journal (journal.py): every change of these values is a
+# 24 byte record; files rotate at JOURNAL_MAX_BYTES (~44k changes) and
+# JOURNAL_FILES of them are kept
+JOURNAL_KEYS = ("error_code", "not_running_reason", "active_circuit", "io_state", "relay_state")
+JOURNAL_MAX_BYTES = 1024 * 1024
+JOURNAL_FILES = 4
+JOURNAL_QUERY_LIMIT = 1000
+SERVICE_GET_JOURNAL = "get_journal"
+
+# Snapshot export (export.py): one record per poll to an external sink,
+# queued up to EXPORT_QUEUE_MAX records and sent in batches
+EXPORT_FORMATS = ("line", "msgpack", "cbor")
+EXPORT_MEASUREMENT = "spirala"
+EXPORT_QUEUE_MAX = 1000
+EXPORT_BATCH_MAX = 20
+EXPORT_FLUSH_SECS = 5.0
+EXPORT_SEND_TIMEOUT_SECS = 5.0
+EXPORT_RETRY_SECS = 10.0
+
+# Register discovery (scanner.py): swept range, largest read, and the pacing
+# that keeps scanner requests out of the way of the polls. Results are kept
+# in an HA Store so a range is only swept once per device
+SERVICE_SCAN_REGISTERS = "scan_registers"
+SCAN_VERSION = 1
+SCAN_DEFAULT_RANGE = (0, 256)
+SCAN_MAX_CHUNK = 32
+SCAN_GAP_SECS = 1.0
+SCAN_WATCH_SECS = 10
+
+# Raw register services: reads are answered from the register cache when
+# every register was seen within max_age (default below); FC16 writes at most
+# MAX_REGS_PER_WRITE registers
+SERVICE_READ_REGISTERS = "read_registers"
+SERVICE_WRITE_REGISTERS = "write_registers"
+DEFAULT_REGISTER_MAX_AGE_SECS = 10
+MAX_REGS_PER_WRITE = 123
+
+# Register map: registers.py. Enum tables of the decoded values:
 ERROR_ENUM = {
     0: "ok", 1: "sensor_internal_1", 2: "sensor_internal_2", 3: "sensor_internal_3",
     4: "sensor_internal_4", 5: "sensor_internal_5", 8: "actuator_error",
@@ -102,17 +158,3 @@ NOT_RUNNING_ENUM = {
 
 ACTIVE_CIRCUIT_ENUM = {0: "none", 1: "circuit_1", 2: "circuit_2", 3: "dhw"}
 THERMOSTAT_ENUM = {0: "machine", 1: "opentherm", 2: "equitherm", 3: "room", 4: "remote"}
-
-DIFF_REGS = {
-    "diff_circuit_1":  44,  # Diference okruhu 1
-    "diff_circuit_2":  81,  # Diference okruhu 2
-    "diff_dhw":        52,  # Diference TUV
-    "setpoint_circuit_1_hours_rotation": 71,
-}
-
-FEATURE_FLAGS = {
-    "enable_dhw": 87,
-    "has_passive_cooling": 88,
-    "has_separate_cooling_circuit": 89,
-    "has_circuit_2": 90,
-}
@@ -1,126 +1,826 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import math
+import time
 from datetime import timedelta
-from typing import Any
+from typing import Any, Callable
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
-
-from pymodbus.client import AsyncModbusTcpClient
-from pymodbus.exceptions import ModbusException
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.event import async_call_later, async_track_time_interval
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
 from .const import (
-    DOMAIN, DEFAULT_SCAN_SECS, TEMP_REGS, STATUS_REGS, PERCENT_REGS,
-    COUNTER_REGS32, SETPOINT_REGS, MODE_TOGGLE_REGS, DIFF_REGS, FEATURE_FLAGS
+    DOMAIN, MANUFACTURER, DEVICE_NAME, DEFAULT_SCAN_SECS, DEFAULT_IDLE_SCAN_SECS,
+    TRANSPORT_TCP, TRANSPORT_SERIAL, DEFAULT_BAUDRATE,
+    POLL_TIER_FAST, POLL_TIER_MEDIUM, POLL_TIER_SLOW, DEFAULT_MEDIUM_SCAN_SECS,
+    DEFAULT_SLOW_SCAN_SECS, DEFAULT_MAX_SILENCE_SECS, DEFAULT_FRAME_DELAY_MS,
+    WRITE_DEBOUNCE_SECS, POLL_RETRY_BUDGET, DEFAULT_FAILED_POLLS_UNAVAILABLE,
+    PROBE_MIN_SECS, PROBE_MAX_SECS,
+    HISTORY_KEYS, HISTORY_FLUSH_SECS, CACHE_VERSION, CACHE_SAVE_SECS,
+)
+from .connection import (
+    ModbusConnectionError, ModbusError, async_acquire_connection, async_release_connection,
 )
+from .decoder import DecodePlan, Snapshot
+from .export import async_create_exporter
+from .history import TelemetryHistory
+from .identity import IdentityReader
+from .journal import TransitionJournal
+from .longterm import LongTermStatistics
+from .metrics import METRIC_KEYS, MetricsEngine
+from .planner import ReadPlanner, internal_keys, plan_defaults, spans_by_tier, tier_by_address
+from .regcache import RegisterCache
+from .registers import FEATURE_KEYS, REGISTERS, schema_for
+from .scanner import RegisterScanner
+from .stats import FRAME_BYTES_RTU, FRAME_BYTES_TCP, PollStats
 
 _LOGGER = logging.getLogger(__name__)
 
-REG_BATCHES = [
-    (0, 16),   # temps 0-15
-    (16, 20),  # 16-35
-    (27, 10),  # status 27-36
-    (36, 4),   # counters hi/lo
-    (40, 51),  # constants around 40-90
-    (150, 4),  # 150+
-]
-
-class SpiralaCoordinator(DataUpdateCoordinator[dict[str, Any]]):
-    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
+_MISSING = object()
+
+class SpiralaCoordinator(DataUpdateCoordinator[Snapshot]):
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry, unit: tuple[str, int, int] | None = None) -> None:
         self.hass = hass
         self.entry = entry
         data = {**entry.data, **entry.options}
-        self.host = data["host"]
-        self.port = data.get("port")
-        self.unit_id = data.get("unit_id")
+        self.transport = data.get("transport", TRANSPORT_TCP)
+        if unit is None and self.transport == TRANSPORT_SERIAL:
+            # A serial port has no TCP port; 0 keeps the unique ID layout
+            self.host = data["device"]
+            self.port = 0
+            self.unit_id = data.get("unit_id")
+            self.storage_id = entry.entry_id
+        elif unit is None:
+            self.host = data["host"]
+            self.port = data.get("port")
+            self.unit_id = data.get("unit_id")
+            self.storage_id = entry.entry_id
+        else:
+            # One unit of a cascade entry; the options are shared by all units
+            self.host, self.port, self.unit_id = unit
+            self.storage_id = f"{entry.entry_id}.{self.host}-{self.port}-{self.unit_id}"
+        self.device_name = DEVICE_NAME
+        self.via_device: tuple[str, str] | None = None
+        # A cascade polls and flushes all its units from one timer each
+        self.own_timers = unit is None
         self.scan_secs = data.get("scan_interval", DEFAULT_SCAN_SECS)
-        self.client = AsyncModbusTcpClient(self.host, port=self.port)
-        self._serial: str | None = None
-        super().__init__(hass, _LOGGER, name=DOMAIN, update_interval=timedelta(seconds=self.scan_secs))
+        self.idle_scan_secs = max(self.scan_secs, data.get("idle_scan_interval", DEFAULT_IDLE_SCAN_SECS))
+        # Units behind the same gateway share one client and request queue
+        self.connection = async_acquire_connection(
+            hass, self.host, self.port, self.transport,
+            **({} if self.transport == TRANSPORT_TCP else {
+                "baudrate": data.get("baudrate", DEFAULT_BAUDRATE),
+                "parity": data.get("parity", "N"),
+                "stopbits": data.get("stopbits", 1),
+            }),
+        )
+        self.connection.add_unit(self.unit_id, data.get("frame_delay_ms", DEFAULT_FRAME_DELAY_MS) / 1000)
+        max_count, gap = plan_defaults(data)
+        self.planner = ReadPlanner(
+            spans_by_tier(),
+            max_count=data.get("max_regs_per_read", max_count),
+            gap=data.get("read_gap", gap),
+            auto_tune=data.get("auto_tune_gap", True),
+        )
+        # Seconds between reads per tier; 0 for the slow tier means only after a write
+        self.tier_secs = {
+            POLL_TIER_FAST: 0,
+            POLL_TIER_MEDIUM: data.get("medium_scan_interval", DEFAULT_MEDIUM_SCAN_SECS),
+            POLL_TIER_SLOW: data.get("slow_scan_interval", DEFAULT_SLOW_SCAN_SECS),
+        }
+        self._tier_due: dict[str, float] = {}
+        self._tier_by_addr = tier_by_address()
+        # Keys whose registers are polled: the internal keys plus those entities
+        # listen to; None (every register) until the first entity listens
+        self.polled_keys: frozenset[str] | None = None
+        self._listeners_changed = False
+        # Register map of the default model until the identity says otherwise
+        self.points = {p.key: p for p in REGISTERS}
+        self.decoder = DecodePlan()
+        self._keys = list(self.decoder.index)
+        self._serial_slot = self.decoder.index["serial_number"]
+        self._model_slot = self.decoder.index["model"]
+        self.identity = IdentityReader(self)
+        self._device_info: DeviceInfo | None = None
+        self._device_info_key: Any = _MISSING
+        # Change-only publishing: last published value/time per slot
+        self.max_silence = data.get("max_silence", DEFAULT_MAX_SILENCE_SECS)
+        self._published: list[Any] = [_MISSING] * len(self._keys)
+        self._published_at: list[float] = [0.0] * len(self._keys)
+        self._changed_keys: set[str] | None = None
+        self._published_success: bool | None = None
+        self.publish_stats = {"polls": 0, "changed_keys": 0, "suppressed_writes": 0}
+        # Raw registers as last read or written, for the register services
+        self.register_cache = RegisterCache()
+        # Debounced writes: latest value per address until the next flush
+        self._pending_writes: dict[int, int] = {}
+        # Flushed writes until their read-back is in, so a poll in between
+        # does not show the old value again
+        self._inflight_writes: dict[int, int] = {}
+        self._unsub_write_flush: CALLBACK_TYPE | None = None
+        # Failure handling: consecutive polls without a single good read, and
+        # the wall-clock time each slot was last read successfully
+        self.failed_polls_unavailable = data.get("failed_polls_unavailable", DEFAULT_FAILED_POLLS_UNAVAILABLE)
+        self._failed_polls = 0
+        # While unavailable: clock time of the next probe read
+        self._probe_at = 0.0
+        self._retries_left = 0
+        self.slot_updated: list[float | None] = [None] * len(self._keys)
+        self.stats = PollStats(FRAME_BYTES_TCP if self.transport == TRANSPORT_TCP else FRAME_BYTES_RTU)
+        # Full-rate telemetry kept outside the recorder, mapped to a file in .storage
+        self.history_enabled = data.get("enable_history", True)
+        self.history = TelemetryHistory()
+        self._history_slots = [self.decoder.index[key] for key in HISTORY_KEYS]
+        self._unsub_history_flush: CALLBACK_TYPE | None = None
+        self.metrics = MetricsEngine(self.decoder.index)
+        # Status transitions, appended to a rotating binary file in .storage
+        self.journal_enabled = data.get("enable_journal", True)
+        self.journal = TransitionJournal(self.decoder.index, self.points.values())
+        self._journal_lock = asyncio.Lock()
+        # Hourly statistics imported into the recorder
+        self.long_term = LongTermStatistics(
+            hass, self.decoder.index, f"{self.host}-{self.port}-{self.unit_id}",
+            f"{self.device_name} {self.unit_id}", self.points.values(),
+        )
+        # Optional per-poll export of the snapshot to an external sink
+        self.exporter = async_create_exporter(
+            hass, data, self._keys, {"host": self.host, "port": self.port, "unit": self.unit_id}
+        )
+        # Startup cache; the feature flags the entity set was built from
+        self._store: Store[dict[str, Any]] = Store(hass, CACHE_VERSION, f"{DOMAIN}.{self.storage_id}")
+        self._cache_saved_at = 0.0
+        self._flag_slots = [self.decoder.index[key] for key in FEATURE_KEYS]
+        self._setup_flags: list[Any] | None = None
+        self.started_from_cache = False
+        # Time source for poll tiers and max silence; benchmarks replace it with a simulated clock
+        self.clock: Callable[[], float] = time.monotonic
+        # Scheduler: ticks on a fixed grid of loop times, one poll on the bus at a time
+        self._contactor_slot = self.decoder.index["io_contactor"]
+        self._next_tick: float | None = None
+        self._poll_task: asyncio.Task | None = None
+        self._refresh_pending = False
+        self.scanner = RegisterScanner(self)
+        super().__init__(
+            hass, _LOGGER, name=DOMAIN,
+            update_interval=timedelta(seconds=self.idle_scan_secs) if self.own_timers else None,
+        )
 
-    async def async_config_entry_first_refresh(self):
-        await self.client.connect()
-        # Try to read and cache serial once at startup
+    async def async_setup_history(self) -> None:
+        path = self.hass.config.path(".storage", f"{DOMAIN}.{self.storage_id}.history")
         try:
-            rr = await self.client.read_holding_registers(170, count=8, device_id=self.unit_id)
-            if not rr.isError() and getattr(rr, "registers", None):
-                self._serial = _decode_ascii(rr.registers, False)
-                self._model = f"WW-{self._serial[0]}"
-        except ModbusException as exc:
-           _LOGGER.debug("Serial read failed on startup: %s", exc)
+            await self.hass.async_add_executor_job(self.history.open, path)
+        except OSError as exc:
+            _LOGGER.warning("Cannot open history file %s, keeping history in memory: %s", path, exc)
+            return
+        if not self.own_timers:
+            return
+        self._unsub_history_flush = async_track_time_interval(
+            self.hass, self.async_flush_history, timedelta(seconds=HISTORY_FLUSH_SECS)
+        )
+
+    async def async_flush_history(self, _now=None) -> None:
+        await self.hass.async_add_executor_job(self.history.flush)
+
+    async def async_setup_journal(self) -> None:
+        path = self.hass.config.path(".storage", f"{DOMAIN}.{self.storage_id}.journal")
+        try:
+            await self.hass.async_add_executor_job(self.journal.open, path)
+        except OSError as exc:
+            _LOGGER.warning("Cannot open transition journal %s: %s", path, exc)
+
+    async def async_flush_journal(self) -> None:
+        """Write the buffered transitions, in order."""
+        async with self._journal_lock:
+            try:
+                while self.journal.pending:
+                    await self.hass.async_add_executor_job(self.journal.write, self.journal.take())
+            except OSError as exc:
+                _LOGGER.warning("Cannot write transition journal: %s", exc)
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Shared by all entities; rebuilt only when the identity changes."""
+        identity = self.identity.identity
+        if identity is not self._device_info_key:
+            serial = self.identity.serial or "unknown"
+            self._device_info_key = identity
+            self._device_info = DeviceInfo(
+                identifiers={(DOMAIN, serial)},
+                manufacturer=MANUFACTURER,
+                model=self.identity.model or "unknown",
+                name=self.device_name,
+                suggested_area="Technická místnost",
+                serial_number=serial,
+            )
+            if identity is not None and identity.firmware:
+                self._device_info["sw_version"] = identity.firmware
+            if identity is not None and identity.hardware:
+                self._device_info["hw_version"] = identity.hardware
+            if self.via_device is not None:
+                self._device_info["via_device"] = self.via_device
+        return self._device_info
+
+    async def async_setup(self) -> None:
+        """Get data for the platforms: from the cache if there is one, else from the device.
+
+        With a cached snapshot setup does not wait for the gateway; the
+        first poll runs in the background and the entities pick it up.
+        """
+        if self.history_enabled:
+            await self.async_setup_history()
+        if self.journal_enabled:
+            await self.async_setup_journal()
+        try:
+            await self.long_term.async_setup()
+        except Exception:  # noqa: BLE001 - statistics are optional, polling is not
+            _LOGGER.warning("Cannot read the last long-term statistics, not importing any", exc_info=True)
+        if await self.async_load_cache():
+            self.hass.async_create_background_task(self.async_refresh(), f"{DOMAIN} revalidate cache")
+        else:
+            await self.async_config_entry_first_refresh()
+        self._setup_flags = self._feature_flags()
+
+    async def async_load_cache(self) -> bool:
+        try:
+            cache = await self._store.async_load()
+        except (OSError, ValueError) as exc:
+            _LOGGER.warning("Cannot load cached data: %s", exc)
+            return False
+        if cache:
+            # The identity is worth keeping even without a snapshot
+            self.identity.restore(cache)
+            self._use_schema(self.identity.model)
+        if not cache or not cache.get("values"):
+            return False
+        snapshot = self.decoder.new_snapshot()
+        index = self.decoder.index
+        for key, value in cache["values"].items():
+            slot = index.get(key)
+            if slot is not None:
+                snapshot.values[slot] = value
+        self.data = snapshot
+        self.started_from_cache = True
+        _LOGGER.debug("Starting %s from data cached at %s", self.identity.serial, cache.get("saved_at"))
+        return True
+
+    @callback
+    def _async_save_cache(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._cache_saved_at < CACHE_SAVE_SECS:
+            return
+        self._cache_saved_at = now
+        self._store.async_delay_save(self._cache_data, 1)
+
+    def _cache_data(self) -> dict[str, Any]:
+        return {
+            **self.identity.as_dict(),
+            "saved_at": time.time(),
+            "values": self.data.as_dict() if self.data is not None else {},
+        }
+
+    def _feature_flags(self) -> list[Any] | None:
+        if self.data is None:
+            return None
+        return [self.data[slot] for slot in self._flag_slots]
+
+    @callback
+    def _async_check_feature_flags(self) -> None:
+        """Reload once fresh feature flags differ from the ones the entities were built from."""
+        flags = self._feature_flags()
+        if self._setup_flags is None or flags == self._setup_flags or None in flags:
+            return
+        _LOGGER.info("Feature flags changed (%s -> %s), reloading to update entities", self._setup_flags, flags)
+        self._setup_flags = flags
+        self._async_save_cache(force=True)
+        self.hass.config_entries.async_schedule_reload(self.entry.entry_id)
+
+    async def async_config_entry_first_refresh(self):
+        if not await self.connection.connect():
+            # The first poll fails too and setup is retried by HA
+            return await super().async_config_entry_first_refresh()
+        # Identity first, so the first poll already uses the model's register map
+        await self._async_update_identity()
         return await super().async_config_entry_first_refresh()
 
-    async def _async_update_data(self) -> dict[str, Any]:
-        data: dict[str, Any] = {}
+    async def _async_update_identity(self) -> None:
+        if await self.identity.async_update():
+            self._use_schema(self.identity.model)
+
+    def _use_schema(self, model: str | None) -> None:
+        """Switch to the register map of `model`; slots stay the same for every model."""
+        points = schema_for(model)
+        if points is self.decoder.fields:
+            return
+        _LOGGER.debug("Using the register map of %s", model)
+        self.points = {p.key: p for p in points}
+        self.decoder = DecodePlan(points)
+        self.planner.set_spans(spans_by_tier(points, self.polled_keys))
+        self._tier_by_addr = tier_by_address(points)
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE, context: Any = None) -> Callable[[], None]:
+        """Listen for updates; the registers behind `context` are polled while anyone listens."""
+        remove = super().async_add_listener(update_callback, context)
+        if context is None:
+            return remove
+        self._listeners_changed = True
+
+        @callback
+        def remove_listener() -> None:
+            remove()
+            self._listeners_changed = True
+
+        return remove_listener
+
+    def _update_polled_keys(self) -> None:
+        """Re-plan the reads for the keys listened to now.
+
+        Entities listen with their key as context, so entities that are
+        disabled, or not created for the unit's options and feature flags,
+        cost no registers. The history, journal, statistics and metrics add
+        their inputs only while they are on. Keys that start being polled are
+        read on the next poll whatever their tier.
+        """
+        self._listeners_changed = False
+        if self.exporter is not None:
+            # Export records carry every value
+            return
+        listened = {context for _, context in self._listeners.values()}
+        internal = internal_keys(
+            history=self.history_enabled,
+            journal=self.journal_enabled,
+            # Stays off without the recorder
+            statistics=self.long_term.enabled,
+            # Only metric sensors use the derived values besides io_contactor
+            metrics=not listened.isdisjoint(METRIC_KEYS),
+        )
+        keys = internal.union(listened).intersection(self.points)
+        if keys == self.polled_keys:
+            return
+        for key in keys - (self.polled_keys or keys):
+            self._tier_due.pop(self.points[key].tier, None)
+        self.polled_keys = keys
+        self.planner.set_spans(spans_by_tier(self.points.values(), keys))
+        _LOGGER.debug(
+            "Polling %s of %s values, %s registers per poll", len(keys), len(self.points),
+            self.planner.registers_per_poll,
+        )
+
+    def _due_tiers(self, now: float) -> list[str]:
+        # A tier without a due time has never been read or was invalidated by a write
+        return [
+            tier for tier in self.tier_secs
+            if tier == POLL_TIER_FAST or now >= self._tier_due.get(tier, now)
+        ]
+
+    def _schedule_tiers(self, tiers: list[str], now: float) -> None:
+        for tier in tiers:
+            secs = self.tier_secs[tier]
+            self._tier_due[tier] = now + secs if secs > 0 else float("inf")
+
+    @property
+    def polling(self) -> bool:
+        return self._poll_task is not None
+
+    @property
+    def compressor_running(self) -> bool:
+        return self.data is not None and bool(self.data[self._contactor_slot])
+
+    @callback
+    def _schedule_refresh(self) -> None:
+        """Schedule the next poll on a fixed grid instead of after the last one.
+
+        HA counts the interval from the end of a poll, so a 1 s scan drifts by
+        the poll time. Here ticks stay on the grid; a poll that overran skips
+        the ticks it missed rather than firing them back to back.
+        """
+        if self.update_interval is None:
+            return
+        if self.config_entry and self.config_entry.pref_disable_polling:
+            return
+        self._async_unsub_refresh()
+        interval = self.scan_secs if self.compressor_running else self.idle_scan_secs
+        if self.update_interval.total_seconds() != interval:
+            self.update_interval = timedelta(seconds=interval)
+        now = self.hass.loop.time()
+        tick = self._next_tick
+        if tick is None:
+            tick = now + interval
+        elif tick > now:
+            # A refresh outside the grid cancelled this tick; keep it unless
+            # that poll was so recent that the tick would just repeat it
+            if tick - now < interval / 2:
+                tick += interval
+        else:
+            tick += interval
+            if tick <= now:
+                missed = int((now - tick) // interval) + 1
+                self.stats.skipped_ticks += missed
+                tick += missed * interval
+        self._next_tick = tick
+        self._unsub_refresh = self.hass.loop.call_at(tick, self._async_tick).cancel
+
+    @callback
+    def _async_tick(self) -> None:
+        self.hass.async_create_task(self._handle_refresh_interval())
+
+    async def async_wait_quiet(self) -> None:
+        """Until a request outside the poll path fits before the next tick.
+
+        Waits out a poll on the bus and a tick due sooner than a few round
+        trips; without a scheduled tick (polling disabled) it returns at once.
+        """
+        loop = self.hass.loop
+        while True:
+            if self._poll_task is not None:
+                await asyncio.wait([self._poll_task])
+                continue
+            if self._unsub_refresh is None or self._next_tick is None:
+                return
+            p95 = self.stats.rtt.percentile(95)
+            need = max(0.25, 3 * p95 / 1000) if p95 is not None else 0.5
+            left = self._next_tick - loop.time()
+            if left >= need:
+                return
+            # Let the tick fire; its poll is then waited out above
+            await asyncio.sleep(max(left, 0) + 0.05)
+
+    async def async_request_refresh(self) -> None:
+        """User refresh: poll now, or right after the poll already on the bus."""
+        if self._poll_task is not None:
+            self._refresh_pending = True
+            self.stats.merged_refreshes += 1
+            return
+        await self.async_refresh()
+
+    async def _async_update_data(self) -> Snapshot:
+        # Never two polls at once: a refresh during a poll shares its result
+        if self._poll_task is None:
+            self._poll_task = self.hass.async_create_task(self._async_timed_poll())
+            self._poll_task.add_done_callback(self._poll_done)
+        else:
+            self.stats.merged_refreshes += 1
+        return await asyncio.shield(self._poll_task)
+
+    def _poll_done(self, _task: asyncio.Task) -> None:
+        self._poll_task = None
+        if self._refresh_pending:
+            # A refresh was requested during the poll: run it before the next tick
+            self._refresh_pending = False
+            self.hass.async_create_task(self.async_refresh())
+
+    async def _async_timed_poll(self) -> Snapshot:
+        t0 = time.monotonic()
+        try:
+            snapshot = await self._async_poll()
+        finally:
+            elapsed = time.monotonic() - t0
+            interval = self.update_interval
+            self.stats.record_poll(elapsed, interval.total_seconds() if interval else self.scan_secs)
+        if self.exporter is not None:
+            self._export(snapshot, elapsed)
+        return snapshot
+
+    def _export(self, snapshot: Snapshot, elapsed: float) -> None:
+        """Queue the poll for export; the change mask covers the keys published this poll."""
+        index = self.decoder.index
+        mask = 0
+        for key in self._changed_keys or ():
+            slot = index.get(key)
+            if slot is not None:
+                mask |= 1 << slot
+        self.exporter.submit(time.time(), elapsed, mask, snapshot.values)
+
+    async def _async_poll(self) -> Snapshot:
+        # The snapshot is updated in place; registers of tiers that are not due keep their values
+        snapshot = self.data if self.data is not None else self.decoder.new_snapshot()
+        values = snapshot.values
+        decoded: list[int] = []
         unit = self.unit_id
+        now = self.clock()
+        if self._listeners_changed:
+            self._update_polled_keys()
+        tiers = self._due_tiers(now)
+        plan = self.planner.plan_for(tiers)
+        probe = self._failed_polls >= self.failed_polls_unavailable
+        if probe:
+            if now < self._probe_at:
+                # Circuit open and no probe due: leave the bus alone
+                raise UpdateFailed(
+                    f"No response from {self.host}:{self.port} unit {unit}, "
+                    f"probing again in {self._probe_at - now:.0f} s"
+                )
+            # Probe with a single read instead of the whole plan
+            plan = plan[:1]
+        self.stats.last_poll_registers = sum(count for _, count in plan)
+        self._retries_left = POLL_RETRY_BUDGET
+        good = failed = 0
+        connected = True
         try:
-            for start, count in REG_BATCHES:
-                rr = await self.client.read_holding_registers(start, count=count, device_id=unit)
-                if rr.isError():
+            for start, count in plan:
+                rr = await self._async_read(start, count)
+                if rr is None or rr.isError():
+                    # Keep the last good values of this range
                     _LOGGER.debug("Read error at %s len %s: %s", start, count, rr)
+                    failed += 1
                     continue
-                for i in range(count):
-                    data[start + i] = rr.registers[i]
-
-            # 32-bit assemble
-            for name, hi_addr in COUNTER_REGS32.items():
-                hi = data.get(hi_addr, 0)
-                lo = data.get(hi_addr + 1, 0)
-                data[name] = (hi << 16) | lo
-
-            # Friendly aliases/scaling
-            for k, addr in TEMP_REGS.items():
-                raw = data.get(addr)
-                data[k] = None if raw is None else raw / 256.0
-            for k, addr in STATUS_REGS.items():
-                data[k] = data.get(addr)
-            for k, addr in PERCENT_REGS.items():
-                data[k] = data.get(addr)
-            for k, addr in SETPOINT_REGS.items():
-                raw = data.get(addr)
-                data[k] = None if raw is None else raw / 256.0
-            for k, addr in DIFF_REGS.items():
-                data[k] = data.get(addr)
-            for k, addr in MODE_TOGGLE_REGS.items():
-                data[k] = data.get(addr)
-            for k, addr in FEATURE_FLAGS.items():
-                data[k] = data.get(addr)
-
-        except ModbusException as exc:
-            _LOGGER.warning("Modbus exception: %s", exc)
-          # Ensure serial is present for consumers; lazy-read if startup read failed
-        
-        if self._serial is None:
+                good += 1
+                decoded.extend(op[0] for op in self.decoder.decode(start, rr.registers, values))
+        except ModbusConnectionError as exc:
+            _LOGGER.debug("Poll of %s:%s aborted: %s", self.host, self.port, exc)
+            connected = False
+
+        if not good:
+            self._failed_polls += 1
+            opened = self._failed_polls - self.failed_polls_unavailable
+            if opened >= 0:
+                self._probe_at = now + min(PROBE_MAX_SECS, PROBE_MIN_SECS * 2 ** min(opened, 16))
+            if self.data is None or self._failed_polls >= self.failed_polls_unavailable:
+                raise UpdateFailed(
+                    f"No response from {self.host}:{self.port} unit {unit} "
+                    f"({self._failed_polls} failed polls)"
+                )
+        else:
+            if probe:
+                _LOGGER.info("Unit %s at %s:%s is responding again", unit, self.host, self.port)
+            self._failed_polls = 0
+            if not failed and not probe:
+                self._schedule_tiers(tiers, now)
+        wall = time.time()
+        for slot in decoded:
+            self.slot_updated[slot] = wall
+        metrics_changed: set[str] = set()
+        if good:
+            if self.history_enabled:
+                self.history.add(wall, [values[slot] for slot in self._history_slots])
+            metrics_changed = self.metrics.update(now, values)
+            self.long_term.add(wall, values)
+            if self.journal_enabled and self.journal.update(wall, now, values):
+                self.hass.async_create_background_task(self.async_flush_journal(), f"{DOMAIN} journal")
+
+        # Keep showing writes that are queued or not read back yet
+        for addr, value in (*self._inflight_writes.items(), *self._pending_writes.items()):
+            decoded.extend(op[0] for op in self.decoder.decode(addr, [value], values))
+
+        # Confirms a cached identity once; a missing one is retried with backoff
+        if connected:
+            await self._async_update_identity()
+        serial, model = self.identity.serial, self.identity.model
+        identity_changed = (values[self._serial_slot], values[self._model_slot]) != (serial, model)
+        values[self._serial_slot] = serial
+        values[self._model_slot] = model
+        decoded += (self._serial_slot, self._model_slot)
+        self.publish_stats["polls"] += 1
+        self._changed_keys = self._diff(values, decoded, self.clock()) | metrics_changed
+        if good:
+            self._async_save_cache(force=identity_changed)
+            self._async_check_feature_flags()
+        return snapshot
+
+    async def _async_read(self, start: int, count: int):
+        """One planned read, retried from the poll's shared budget.
+
+        Returns None when the read timed out for good; exception responses
+        are returned as-is since repeating them will not help. A lost
+        connection raises ModbusConnectionError to abort the rest of the poll.
+        """
+        while True:
             try:
-                rr = await self.client.read_holding_registers(170, count=8, device_id=self.unit_id)
-                if not rr.isError() and getattr(rr, "registers", None):
-                    self._serial = _decode_ascii(rr.registers, False)
-            except ModbusException as exc:
-                _LOGGER.debug("Serial read failed in update: %s", exc)
-        data["serial_number"] = self._serial
-        data["model"] = self._model
-        return data
+                rr, rtt = await self._async_request_read(start, count)
+            except ModbusConnectionError:
+                raise
+            except (ModbusError, asyncio.TimeoutError) as exc:
+                if self._retries_left <= 0:
+                    _LOGGER.debug("Read at %s len %s failed: %s", start, count, exc)
+                    return None
+                self._retries_left -= 1
+                continue
+            self.planner.record(count, rtt)
+            return rr
+
+    async def _async_request_read(self, start: int, count: int):
+        """Read through the shared connection, recording I/O statistics."""
+        try:
+            rr, rtt = await self.connection.read_holding_registers(self.unit_id, start, count)
+        except ModbusConnectionError:
+            self.stats.connection_errors += 1
+            raise
+        except (ModbusError, asyncio.TimeoutError):
+            self.stats.timeouts += 1
+            raise
+        self.stats.record_read(start, count, rtt, rr)
+        if not rr.isError():
+            self.register_cache.store(start, rr.registers, self.clock())
+        return rr, rtt
+
+    async def _async_request_write(self, start: int, values: list[int]):
+        # Unknown until the write is confirmed
+        self.register_cache.invalidate(start, len(values))
+        try:
+            if len(values) == 1:
+                rr, rtt = await self.connection.write_register(self.unit_id, start, values[0])
+            else:
+                rr, rtt = await self.connection.write_registers(self.unit_id, start, values)
+        except ModbusConnectionError:
+            self.stats.connection_errors += 1
+            raise
+        except (ModbusError, asyncio.TimeoutError):
+            self.stats.timeouts += 1
+            raise
+        self.stats.record_write(len(values), rtt, rr)
+        if not rr.isError():
+            self.register_cache.store(start, values, self.clock())
+        return rr
+
+    def _diff(self, values: list[Any], slots: list[int], now: float) -> set[str]:
+        """Keys whose value should be published, updating the published snapshot.
+
+        A key is republished after `max_silence` seconds even when its value
+        is unchanged or moved by less than its deadband.
+        """
+        published = self._published
+        published_at = self._published_at
+        deadbands = self.decoder.deadbands
+        keys = self._keys
+        max_silence = self.max_silence
+        changed: set[str] = set()
+        for slot in slots:
+            value = values[slot]
+            old = published[slot]
+            if old is _MISSING or now - published_at[slot] >= max_silence:
+                pass
+            elif value == old:
+                continue
+            elif deadbands[slot] and value is not None and old is not None:
+                if abs(value - old) < deadbands[slot]:
+                    continue
+            changed.add(keys[slot])
+            published[slot] = value
+            published_at[slot] = now
+        self.publish_stats["changed_keys"] += len(changed)
+        return changed
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Notify only the entities whose key changed in the last poll.
+
+        Entities register with their data key as listener context; listeners
+        without a context and availability changes always get notified.
+        """
+        changed = self._changed_keys
+        self._changed_keys = None
+        if changed is None or self.last_update_success != self._published_success:
+            self._published_success = self.last_update_success
+            super().async_update_listeners()
+            return
+        for update_callback, context in list(self._listeners.values()):
+            if context is None or context in changed:
+                update_callback()
+            else:
+                self.publish_stats["suppressed_writes"] += 1
+
+    @callback
+    def _async_publish(self, slots) -> None:
+        """Push values changed outside a poll (optimistic or read-back) to entities."""
+        if self.data is None:
+            return
+        self._changed_keys = self._diff(self.data.values, slots, self.clock())
+        self.async_update_listeners()
 
     async def async_write_register(self, address: int, value: int) -> None:
-        await self.client.write_register(address, value, device_id=self.unit_id)
+        """Queue a register write and show the value optimistically.
+
+        The write goes out after WRITE_DEBOUNCE_SECS together with any other
+        pending writes and is confirmed by reading the registers back.
+        """
+        self._pending_writes[address] = value
+        if self.data is not None:
+            ops = self.decoder.decode(address, [value], self.data.values)
+            self._async_publish([op[0] for op in ops])
+        if self._unsub_write_flush is None:
+            self._unsub_write_flush = async_call_later(
+                self.hass, WRITE_DEBOUNCE_SECS, self._async_flush_writes
+            )
+
+    async def _async_flush_writes(self, _now=None) -> None:
+        self._unsub_write_flush = None
+        pending, self._pending_writes = self._pending_writes, {}
+        self._inflight_writes.update(pending)
+        for start, values in _contiguous_runs(pending):
+            try:
+                await self._async_write_run(start, values)
+            finally:
+                for addr, value in zip(range(start, start + len(values)), values):
+                    if self._inflight_writes.get(addr) == value:
+                        del self._inflight_writes[addr]
+
+    async def _async_write_run(self, start: int, values: list[int]) -> tuple[bool, list[int] | None]:
+        """Write adjacent registers and read them back.
+
+        Returns whether the unit accepted the write and the registers read
+        back (None when that failed). The read-back is decoded into the
+        snapshot and published.
+        """
+        written = False
+        try:
+            rr = await self._async_request_write(start, values)
+            if rr.isError() and len(values) > 1:
+                # Not every firmware speaks FC16; fall back to single writes
+                _LOGGER.debug("Multi-register write at %s failed (%s), writing singly", start, rr)
+                results = [await self._async_request_write(start + i, [value]) for i, value in enumerate(values)]
+                rr = next((r for r in results if r.isError()), results[-1])
+            if rr.isError():
+                _LOGGER.warning("Write to register %s failed: %s", start, rr)
+            written = not rr.isError()
+            rr, _ = await self._async_request_read(start, len(values))
+        except (ModbusError, asyncio.TimeoutError) as exc:
+            _LOGGER.warning("Write to register %s failed: %s", start, exc)
+            rr = None
+        if rr is None or rr.isError():
+            # Read-back failed: have the next poll re-read the written registers
+            for addr in range(start, start + len(values)):
+                self._tier_due.pop(self._tier_by_addr.get(addr), None)
+            return written, None
+        if self.data is not None:
+            snapshot = self.data.values
+            slots = [op[0] for op in self.decoder.decode(start, rr.registers, snapshot)]
+            # A value queued while this one was on the wire stays shown until it is written
+            for addr in range(start, start + len(values)):
+                if addr in self._pending_writes:
+                    slots.extend(op[0] for op in self.decoder.decode(addr, [self._pending_writes[addr]], snapshot))
+            self._async_publish(slots)
+        return written, rr.registers
+
+    async def async_read_registers(self, start: int, count: int, max_age: float) -> dict[str, Any]:
+        """Raw registers, from the cache when all were seen within `max_age` seconds.
+
+        Otherwise the registers that are not fresh are read from the unit in
+        one request through the shared queue. Raises ModbusError when
+        the unit rejects or does not answer that read.
+        """
+        span = first = self.register_cache.stale(start, count, self.clock() - max_age)
+        # A write may invalidate registers of the range while the read is out:
+        # read those again once; after that their value and age are unknown
+        for _ in range(2):
+            if span is None:
+                break
+            rr, _ = await self._async_request_read(*span)
+            if rr.isError():
+                raise ModbusError(f"Read of {span[1]} registers at {span[0]} failed: {rr}")
+            span = self.register_cache.stale(start, count, -math.inf)
+        values, seen = self.register_cache.read(start, count)
+        return {
+            "address": start,
+            "registers": values,
+            "age": round(max(0.0, self.clock() - seen), 3) if math.isfinite(seen) else None,
+            "cached": first is None,
+        }
+
+    async def async_write_registers(self, start: int, values: list[int]) -> dict[str, Any]:
+        """Write registers right away and return them as read back.
+
+        Bypasses the write debounce; queued entity writes still go out with
+        their own flush. Raises ModbusError when the unit rejects the write.
+        """
+        written, registers = await self._async_write_run(start, values)
+        if not written:
+            raise ModbusError(f"Write of {len(values)} registers at {start} failed")
+        return {"address": start, "registers": registers}
 
     async def async_close(self):
-        self.client.close()
+        await self.scanner.async_close()
+        if self.exporter is not None:
+            await self.exporter.async_close()
+        if self._unsub_write_flush is not None:
+            self._unsub_write_flush()
+            self._unsub_write_flush = None
+        if self._poll_task is not None:
+            await asyncio.wait([self._poll_task])
+        if self._pending_writes:
+            await self._async_flush_writes()
+        if self._unsub_history_flush is not None:
+            self._unsub_history_flush()
+            self._unsub_history_flush = None
+        await self.hass.async_add_executor_job(self.history.close)
+        self.journal.stop(time.time(), self.clock())
+        await self.async_flush_journal()
+        await self.hass.async_add_executor_job(self.journal.close)
+        if self.data is not None:
+            await self._store.async_save(self._cache_data())
+        async_release_connection(self.hass, self.connection)
 
 # --- helpers ---
-def _decode_ascii(registers: list[int], swap_bytes: bool = False) -> str:
-    _LOGGER.info(f"Raw serial {registers}")
-
-    b = bytearray()
-    for reg in registers:
-        hi = (reg >> 8) & 0xFF
-        lo = reg & 0xFF
-        if swap_bytes:
-            hi, lo = lo, hi
-        b.append(hi)
-        b.append(lo)
-    # keep printable ASCII only; strip NULs/spaces
-    s = "".join(chr(x) for x in b if 32 <= x <= 126).strip()
-    return s
\ No newline at end of file
+def _contiguous_runs(writes: dict[int, int]) -> list[tuple[int, list[int]]]:
+    """Group address->value writes into (start, values) runs of adjacent addresses."""
+    runs: list[tuple[int, list[int]]] = []
+    for addr in sorted(writes):
+        if runs and runs[-1][0] + len(runs[-1][1]) == addr:
+            runs[-1][1].append(writes[addr])
+        else:
+            runs.append((addr, [writes[addr]]))
+    return runs
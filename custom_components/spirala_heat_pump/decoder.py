@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from typing import Any, Iterator
+
+from .registers import REGISTERS, Point
+
+# Values not decoded from the polled registers but carried in the snapshot
+EXTRA_KEYS = ("serial_number", "model")
+
+ENUMS = {p.key: p.enum for p in REGISTERS if p.enum}
+
+
+class Snapshot:
+    """Decoded values in a fixed slot order; entities read them by index."""
+
+    __slots__ = ("index", "values")
+
+    def __init__(self, index: dict[str, int]) -> None:
+        self.index = index
+        self.values: list[Any] = [None] * len(index)
+
+    def __getitem__(self, slot: int) -> Any:
+        return self.values[slot]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        slot = self.index.get(key)
+        return default if slot is None else self.values[slot]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.index)
+
+    def as_dict(self) -> dict[str, Any]:
+        values = self.values
+        return {key: values[slot] for key, slot in self.index.items()}
+
+
+class DecodePlan:
+    """Register-to-slot decode table, compiled once per coordinator.
+
+    Per read (start, count) the points fully contained in it are resolved
+    to `(slot, offset, words, scale, signed, mask)` ops and cached, so a
+    response decodes straight into the snapshot without any key lookups.
+    """
+
+    def __init__(self, points: tuple[Point, ...] = REGISTERS) -> None:
+        self.fields = points
+        keys = [p.key for p in points] + list(EXTRA_KEYS)
+        self.index = {key: slot for slot, key in enumerate(keys)}
+        self.deadbands = [p.deadband for p in points] + [0.0] * len(EXTRA_KEYS)
+        self._ops: dict[tuple[int, int], tuple[tuple, ...]] = {}
+
+    def new_snapshot(self) -> Snapshot:
+        return Snapshot(self.index)
+
+    def ops_for(self, start: int, count: int) -> tuple[tuple, ...]:
+        ops = self._ops.get((start, count))
+        if ops is None:
+            end = start + count
+            ops = self._ops[(start, count)] = tuple(
+                (slot, f.addr - start, f.words, f.scale, f.signed, f.mask)
+                for slot, f in enumerate(self.fields)
+                if start <= f.addr and f.addr + f.words <= end
+            )
+        return ops
+
+    def decode(self, start: int, registers: list[int], values: list[Any]) -> tuple[tuple, ...]:
+        """Decode one read response into `values`; returns the ops applied."""
+        ops = self.ops_for(start, len(registers))
+        for slot, off, words, scale, signed, mask in ops:
+            raw = registers[off] if words == 1 else (registers[off] << 16) | registers[off + 1]
+            if signed and raw >> (16 * words - 1):
+                raw -= 1 << (16 * words)
+            if mask:
+                values[slot] = bool(raw & mask)
+            elif scale != 1.0:
+                values[slot] = raw * scale
+            else:
+                values[slot] = raw
+        return ops
@@ -3,13 +3,51 @@ from __future__ import annotations
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
 
-from .const import DOMAIN
+from .cascade import SpiralaCascade
+from .const import DOMAIN, POLL_TIER_FAST
+from .coordinator import SpiralaCoordinator
 
 async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry):
-    coordinator = hass.data[DOMAIN][entry.entry_id]
+    runtime = hass.data[DOMAIN][entry.entry_id]
+    if isinstance(runtime, SpiralaCascade):
+        return {"units": [_unit_diagnostics(coordinator) for coordinator in runtime.coordinators]}
+    return _unit_diagnostics(runtime)
+
+def _unit_diagnostics(coordinator: SpiralaCoordinator):
     return {
+        "transport": coordinator.transport,
         "host": coordinator.host,
         "port": coordinator.port,
         "unit_id": coordinator.unit_id,
-        "last_data": coordinator.data,
+        "identity": {**coordinator.identity.as_dict(), "confirmed": coordinator.identity.confirmed,
+                     "reads": coordinator.identity.reads},
+        "last_data": coordinator.data.as_dict() if coordinator.data else None,
+        "publish_stats": coordinator.publish_stats,
+        "export": coordinator.exporter.stats if coordinator.exporter is not None else None,
+        "journal_records": coordinator.journal.records,
+        "long_term_statistics": {
+            "enabled": coordinator.long_term.enabled,
+            "rows": coordinator.long_term.rows,
+            "backfilled_hours": coordinator.long_term.backfilled,
+        },
+        "register_cache": {
+            "addresses": coordinator.register_cache.size,
+            "hits": coordinator.register_cache.hits,
+            "misses": coordinator.register_cache.misses,
+        },
+        "connection_state": coordinator.connection.state,
+        "reconnects": coordinator.connection.reconnects,
+        "io_stats": coordinator.stats.as_dict(),
+        "read_plan": {
+            "gap": coordinator.planner.gap,
+            "reads": coordinator.planner.plan,
+            "registers_per_poll": {
+                tier: sum(count for _, count in coordinator.planner.plan_for([POLL_TIER_FAST, tier]))
+                for tier in coordinator.tier_secs
+            },
+            "polled_keys": sorted(coordinator.polled_keys) if coordinator.polled_keys is not None else "all",
+        },
+        "value_updated": {
+            key: ts for key, ts in zip(coordinator.decoder.index, coordinator.slot_updated)
+        },
     }
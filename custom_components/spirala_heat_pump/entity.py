@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .cascade import SpiralaCascade
+from .const import DOMAIN
+from .coordinator import SpiralaCoordinator
+from .registers import Point
+
+_MISSING = object()
+
+
+class SpiralaEntity(CoordinatorEntity[SpiralaCoordinator]):
+    """Base of all Spirala entities.
+
+    Binds the snapshot slot and enum table of `key` once, caches the
+    decoded value until the raw value in the slot changes, and shares the
+    coordinator's DeviceInfo.
+    """
+
+    _attr_has_entity_name = True
+
+    def __init__(self, coordinator: SpiralaCoordinator, unique_suffix: str, key: str | None = None,
+                 context: Any = None) -> None:
+        super().__init__(coordinator, context=context)
+        self._key = key
+        self._slot = coordinator.decoder.index.get(key) if key is not None else None
+        point = coordinator.points.get(key) if key is not None else None
+        self._convert = point.enum.get if point is not None and point.enum else None
+        self._raw: Any = _MISSING
+        self._decoded: Any = None
+        self._attr_unique_id = f"{coordinator.host}-{coordinator.port}-{coordinator.unit_id}-{unique_suffix}"
+
+    @property
+    def decoded_value(self) -> Any:
+        raw = self.coordinator.data[self._slot]
+        if raw is not self._raw and raw != self._raw:
+            self._raw = raw
+            convert = self._convert
+            self._decoded = convert(raw) if convert is not None and raw is not None else raw
+        return self._decoded
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        return self.coordinator.device_info
+
+
+def platform_points(coordinator: SpiralaCoordinator, platform: str) -> list[Point]:
+    """Points exposed on `platform` whose entry option and feature flag allow it."""
+    options = {**coordinator.entry.data, **coordinator.entry.options}
+    data = coordinator.data
+    return [
+        p for p in coordinator.points.values()
+        if p.platform == platform
+        and (p.requires is None or options.get(*p.requires))
+        and (p.flag is None or (data is not None and data.get(p.flag)))
+    ]
+
+
+def entry_coordinators(hass: HomeAssistant, entry: ConfigEntry) -> list[SpiralaCoordinator]:
+    """The coordinator of a single-unit entry, or those of every unit of a cascade."""
+    runtime = hass.data[DOMAIN][entry.entry_id]
+    return runtime.coordinators if isinstance(runtime, SpiralaCascade) else [runtime]
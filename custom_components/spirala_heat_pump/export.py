@@ -0,0 +1,381 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import struct
+from collections import deque
+from typing import TYPE_CHECKING, Any
+from urllib.parse import urlsplit
+
+from .const import (
+    DOMAIN, EXPORT_FORMATS, EXPORT_QUEUE_MAX, EXPORT_BATCH_MAX, EXPORT_FLUSH_SECS,
+    EXPORT_SEND_TIMEOUT_SECS, EXPORT_RETRY_SECS, EXPORT_MEASUREMENT,
+)
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+
+# --- encoders ---
+# msgpack and CBOR are written here for the handful of types a snapshot
+# holds (None, bool, int, float, str, bytes, list, dict), so the exporter
+# needs no extra requirement
+
+def _msgpack(obj: Any, out: bytearray) -> None:
+    if obj is None:
+        out.append(0xC0)
+    elif obj is True or obj is False:
+        out.append(0xC3 if obj else 0xC2)
+    elif isinstance(obj, int):
+        if 0 <= obj < 0x80 or -32 <= obj < 0:
+            out += struct.pack(">b" if obj < 0 else ">B", obj)
+        elif obj >= 0:
+            for tag, fmt, limit in ((0xCC, ">B", 1 << 8), (0xCD, ">H", 1 << 16), (0xCE, ">I", 1 << 32),
+                                    (0xCF, ">Q", 1 << 64)):
+                if obj < limit:
+                    out.append(tag)
+                    out += struct.pack(fmt, obj)
+                    return
+            raise ValueError(f"Integer too large for msgpack: {obj}")
+        else:
+            for tag, fmt, limit in ((0xD0, ">b", 1 << 7), (0xD1, ">h", 1 << 15), (0xD2, ">i", 1 << 31),
+                                    (0xD3, ">q", 1 << 63)):
+                if obj >= -limit:
+                    out.append(tag)
+                    out += struct.pack(fmt, obj)
+                    return
+            raise ValueError(f"Integer too small for msgpack: {obj}")
+    elif isinstance(obj, float):
+        out.append(0xCB)
+        out += struct.pack(">d", obj)
+    elif isinstance(obj, str):
+        raw = obj.encode()
+        _msgpack_head(out, len(raw), 0xA0, 32, (0xD9, 0xDA, 0xDB))
+        out += raw
+    elif isinstance(obj, (bytes, bytearray)):
+        _msgpack_head(out, len(obj), None, 0, (0xC4, 0xC5, 0xC6))
+        out += obj
+    elif isinstance(obj, (list, tuple)):
+        _msgpack_head(out, len(obj), 0x90, 16, (None, 0xDC, 0xDD))
+        for item in obj:
+            _msgpack(item, out)
+    elif isinstance(obj, dict):
+        _msgpack_head(out, len(obj), 0x80, 16, (None, 0xDE, 0xDF))
+        for key, value in obj.items():
+            _msgpack(key, out)
+            _msgpack(value, out)
+    else:
+        raise TypeError(f"Cannot encode {type(obj).__name__}")
+
+
+def _msgpack_head(out: bytearray, n: int, fix: int | None, fix_limit: int,
+                  tags: tuple[int | None, int, int]) -> None:
+    if fix is not None and n < fix_limit:
+        out.append(fix | n)
+    elif tags[0] is not None and n < 1 << 8:
+        out += struct.pack(">BB", tags[0], n)
+    elif n < 1 << 16:
+        out += struct.pack(">BH", tags[1], n)
+    else:
+        out += struct.pack(">BI", tags[2], n)
+
+
+def _cbor(obj: Any, out: bytearray) -> None:
+    if obj is None:
+        out.append(0xF6)
+    elif obj is True or obj is False:
+        out.append(0xF5 if obj else 0xF4)
+    elif isinstance(obj, int):
+        _cbor_head(out, 0, obj) if obj >= 0 else _cbor_head(out, 1, -1 - obj)
+    elif isinstance(obj, float):
+        out.append(0xFB)
+        out += struct.pack(">d", obj)
+    elif isinstance(obj, str):
+        raw = obj.encode()
+        _cbor_head(out, 3, len(raw))
+        out += raw
+    elif isinstance(obj, (bytes, bytearray)):
+        _cbor_head(out, 2, len(obj))
+        out += obj
+    elif isinstance(obj, (list, tuple)):
+        _cbor_head(out, 4, len(obj))
+        for item in obj:
+            _cbor(item, out)
+    elif isinstance(obj, dict):
+        _cbor_head(out, 5, len(obj))
+        for key, value in obj.items():
+            _cbor(key, out)
+            _cbor(value, out)
+    else:
+        raise TypeError(f"Cannot encode {type(obj).__name__}")
+
+
+def _cbor_head(out: bytearray, major: int, n: int) -> None:
+    major <<= 5
+    if n < 24:
+        out.append(major | n)
+    elif n < 1 << 8:
+        out += struct.pack(">BB", major | 24, n)
+    elif n < 1 << 16:
+        out += struct.pack(">BH", major | 25, n)
+    elif n < 1 << 32:
+        out += struct.pack(">BI", major | 26, n)
+    elif n < 1 << 64:
+        out += struct.pack(">BQ", major | 27, n)
+    else:
+        raise ValueError(f"Integer out of range for CBOR: {n}")
+
+
+def encode_msgpack(obj: Any) -> bytes:
+    out = bytearray()
+    _msgpack(obj, out)
+    return bytes(out)
+
+
+def encode_cbor(obj: Any) -> bytes:
+    out = bytearray()
+    _cbor(obj, out)
+    return bytes(out)
+
+
+def _escape_tag(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace(",", "\\,").replace("=", "\\=").replace(" ", "\\ ")
+
+
+def _line_value(value: Any) -> str | None:
+    if value is None:
+        return None
+    if value is True or value is False:
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return f"{value}i"
+    if isinstance(value, float):
+        return repr(value) if value == value and abs(value) != float("inf") else None
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def encode_line(tags: dict[str, Any], keys: list[str], rows: list[tuple]) -> bytes:
+    """InfluxDB line protocol, one line per poll; None values are left out."""
+    head = ",".join([EXPORT_MEASUREMENT] + [f"{_escape_tag(k)}={_escape_tag(v)}" for k, v in tags.items()])
+    lines = []
+    for t, poll_ms, mask, values in rows:
+        fields = [f'changed="{mask.hex()}"'] if poll_ms is None else [f"poll_ms={poll_ms!r}", f'changed="{mask.hex()}"']
+        for key, value in zip(keys, values):
+            text = _line_value(value)
+            if text is not None:
+                fields.append(f"{key}={text}")
+        lines.append(f"{head} {','.join(fields)} {int(t * 1e9)}\n")
+    return "".join(lines).encode()
+
+
+# --- sinks ---
+
+class UdpSink:
+    """One datagram per batch."""
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self._transport: asyncio.DatagramTransport | None = None
+
+    async def async_send(self, payload: bytes) -> None:
+        if self._transport is None or self._transport.is_closing():
+            self._transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+                asyncio.DatagramProtocol, remote_addr=(self.host, self.port)
+            )
+        self._transport.sendto(payload)
+
+    async def async_close(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+
+class UnixSink:
+    """A Unix stream socket; reconnects on the next batch after an error."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._writer: asyncio.StreamWriter | None = None
+
+    async def async_send(self, payload: bytes) -> None:
+        if self._writer is None or self._writer.is_closing():
+            _, self._writer = await asyncio.open_unix_connection(self.path)
+        try:
+            self._writer.write(payload)
+            await self._writer.drain()
+        except OSError:
+            self._writer.close()
+            self._writer = None
+            raise
+
+    async def async_close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class FileSink:
+    """Appends every batch to a file, in the executor."""
+
+    def __init__(self, hass: HomeAssistant, path: str) -> None:
+        self.hass = hass
+        self.path = path
+
+    def _append(self, payload: bytes) -> None:
+        with open(self.path, "ab") as fh:
+            fh.write(payload)
+
+    async def async_send(self, payload: bytes) -> None:
+        await self.hass.async_add_executor_job(self._append, payload)
+
+    async def async_close(self) -> None:
+        return None
+
+
+class MqttSink:
+    """Publishes every batch to a topic through Home Assistant's MQTT integration."""
+
+    def __init__(self, hass: HomeAssistant, topic: str) -> None:
+        self.hass = hass
+        self.topic = topic
+
+    async def async_send(self, payload: bytes) -> None:
+        from homeassistant.components import mqtt
+
+        await mqtt.async_publish(self.hass, self.topic, payload)
+
+    async def async_close(self) -> None:
+        return None
+
+
+def make_sink(hass: HomeAssistant, target: str):
+    """Sink for `udp://host:port`, `unix:///path`, `file:///path` or `mqtt://topic`."""
+    url = urlsplit(target)
+    if url.scheme == "udp" and url.hostname and url.port:
+        return UdpSink(url.hostname, url.port)
+    if url.scheme == "unix" and url.path:
+        return UnixSink(url.path)
+    if url.scheme == "file" and url.path:
+        return FileSink(hass, url.path)
+    if url.scheme == "mqtt" and (url.netloc + url.path).strip("/"):
+        return MqttSink(hass, (url.netloc + url.path).strip("/"))
+    raise ValueError(f"Unsupported export target {target!r}")
+
+
+class SnapshotExporter:
+    """Sends one compact record per poll to an external sink, off the poll path.
+
+    `submit` only appends to a bounded queue; when it is full the oldest
+    record is dropped and counted. A background task sends batches of up
+    to EXPORT_BATCH_MAX records, at the latest EXPORT_FLUSH_SECS after the
+    first one queued. A failed or slow send (EXPORT_SEND_TIMEOUT_SECS) puts
+    the batch back and pauses, so a slow sink only ever costs queue space.
+
+    A record is (time, poll ms, change mask, values) with the values in
+    `keys` order and the mask a little-endian bit field over the same
+    order. msgpack and CBOR batches are `{"tags", "keys", "rows"}` maps;
+    line protocol is one line per record.
+    """
+
+    def __init__(self, hass: HomeAssistant, sink, fmt: str, keys: list[str], tags: dict[str, Any]) -> None:
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format {fmt}")
+        self.hass = hass
+        self.sink = sink
+        self.format = fmt
+        self.keys = keys
+        self.tags = tags
+        self.stats = {"records": 0, "sent": 0, "dropped": 0, "batches": 0, "errors": 0, "bytes": 0}
+        self._queue: deque[tuple] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def submit(self, t: float, poll_secs: float | None, mask: int, values: list[Any]) -> None:
+        """Queue the record of one poll; never waits."""
+        queue = self._queue
+        if len(queue) >= EXPORT_QUEUE_MAX:
+            queue.popleft()
+            self.stats["dropped"] += 1
+        queue.append((
+            t, None if poll_secs is None else round(poll_secs * 1000, 1),
+            mask.to_bytes((len(self.keys) + 7) // 8, "little"), list(values),
+        ))
+        self.stats["records"] += 1
+        if self._task is None:
+            self._task = self.hass.async_create_background_task(self._run(), f"{DOMAIN} export")
+        if len(queue) >= EXPORT_BATCH_MAX:
+            self._wakeup.set()
+
+    def encode(self, rows: list[tuple]) -> bytes:
+        if self.format == "line":
+            return encode_line(self.tags, self.keys, rows)
+        batch = {"tags": self.tags, "keys": self.keys, "rows": [list(row) for row in rows]}
+        return encode_msgpack(batch) if self.format == "msgpack" else encode_cbor(batch)
+
+    async def _run(self) -> None:
+        queue = self._queue
+        while True:
+            if len(queue) < EXPORT_BATCH_MAX:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), EXPORT_FLUSH_SECS)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+            if queue and not await self._send_batch():
+                await asyncio.sleep(EXPORT_RETRY_SECS)
+
+    async def _send_batch(self) -> bool:
+        queue = self._queue
+        rows = [queue.popleft() for _ in range(min(EXPORT_BATCH_MAX, len(queue)))]
+        payload = self.encode(rows)
+        try:
+            await asyncio.wait_for(self.sink.async_send(payload), EXPORT_SEND_TIMEOUT_SECS)
+        except asyncio.CancelledError:
+            queue.extendleft(reversed(rows))
+            raise
+        except Exception as exc:  # noqa: BLE001 - any sink failure only delays the export
+            self.stats["errors"] += 1
+            if self.stats["errors"] == 1:
+                _LOGGER.warning("Snapshot export failed, retrying: %s", exc)
+            else:
+                _LOGGER.debug("Snapshot export failed: %s", exc)
+            # Back in front, as far as the bound allows
+            queue.extendleft(reversed(rows))
+            while len(queue) > EXPORT_QUEUE_MAX:
+                queue.popleft()
+                self.stats["dropped"] += 1
+            return False
+        self.stats["sent"] += len(rows)
+        self.stats["batches"] += 1
+        self.stats["bytes"] += len(payload)
+        return True
+
+    async def async_close(self) -> None:
+        """Stop the sender after one last attempt at what is queued."""
+        if self._task is not None:
+            # A batch being sent goes back to the queue when the task is cancelled
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        while self._queue and await self._send_batch():
+            pass
+        await self.sink.async_close()
+
+
+def async_create_exporter(hass: HomeAssistant, options: dict[str, Any], keys: list[str],
+                          tags: dict[str, Any]) -> SnapshotExporter | None:
+    """Exporter configured by the entry options, or None when exporting is off or misconfigured."""
+    fmt = options.get("export_format", "off")
+    if fmt == "off":
+        return None
+    try:
+        sink = make_sink(hass, options.get("export_target", ""))
+        return SnapshotExporter(hass, sink, fmt, keys, tags)
+    except ValueError as exc:
+        _LOGGER.error("Snapshot export disabled: %s", exc)
+        return None
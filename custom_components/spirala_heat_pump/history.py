@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import logging
+import math
+import mmap
+import os
+import zlib
+from array import array
+from typing import Any, Iterable
+
+from .const import HISTORY_KEYS, HISTORY_LEVELS
+
+_LOGGER = logging.getLogger(__name__)
+
+_MAGIC = 0x53504952  # "SPIR"
+_VERSION = 1
+# magic, version, layout checksum; each ring then has its own (head, count)
+_HEADER = 3
+_RING_HEADER = 2
+_NAN = math.nan
+
+
+class _Ring:
+    """Fixed number of rows of doubles in a shared buffer, oldest overwritten first.
+
+    Rows are `[t, v1..vK]` for raw samples and `[t, min1, max1, mean1, ...]`
+    for buckets.
+    """
+
+    __slots__ = ("res", "cap", "stride", "base")
+
+    def __init__(self, res: int, cap: int, stride: int, base: int) -> None:
+        self.res = res
+        self.cap = cap
+        self.stride = stride
+        self.base = base
+
+    @property
+    def size(self) -> int:
+        return _RING_HEADER + self.cap * self.stride
+
+    def append(self, buf: memoryview, row: array) -> None:
+        head, count = int(buf[self.base]), int(buf[self.base + 1])
+        off = self.base + _RING_HEADER + head * self.stride
+        buf[off:off + self.stride] = row
+        buf[self.base] = (head + 1) % self.cap
+        buf[self.base + 1] = min(count + 1, self.cap)
+
+    def rows(self, buf: memoryview) -> Iterable[memoryview]:
+        head, count = int(buf[self.base]), int(buf[self.base + 1])
+        data = self.base + _RING_HEADER
+        for i in range(head - count, head):
+            off = data + (i % self.cap) * self.stride
+            yield buf[off:off + self.stride]
+
+    def covers(self, buf: memoryview, start: float) -> bool:
+        """Whether no row at or after `start` has been overwritten yet."""
+        head, count = int(buf[self.base]), int(buf[self.base + 1])
+        if count < self.cap:
+            return True
+        return buf[self.base + _RING_HEADER + head * self.stride] <= start
+
+
+class TelemetryHistory:
+    """Per-key ring buffers of recent telemetry with min/max/mean downsampling.
+
+    Every poll lands in the raw ring and in the open bucket of each coarser
+    resolution. All rings live in one block of doubles of fixed size,
+    in memory until `open()` maps it onto a file, after which the history
+    survives restarts. Only the partly filled buckets are lost.
+    """
+
+    def __init__(self, keys: tuple[str, ...] = HISTORY_KEYS,
+                 levels: tuple[tuple[int, int], ...] = HISTORY_LEVELS) -> None:
+        self.keys = keys
+        self.rings: list[_Ring] = []
+        base = _HEADER
+        for res, cap in levels:
+            ring = _Ring(res, cap, 1 + len(keys) * (3 if res else 1), base)
+            self.rings.append(ring)
+            base += ring.size
+        self.doubles = base
+        self._checksum = float(zlib.crc32(repr((keys, levels)).encode()))
+        # Open bucket per downsampled ring: start, then min/max/sum/count per key
+        self._acc: list[list[Any]] = [[None, [], [], [], []] for ring in self.rings if ring.res]
+        self._mmap: mmap.mmap | None = None
+        self._buf = memoryview(bytearray(8 * self.doubles)).cast("d")
+        self._init_header()
+
+    def _init_header(self) -> None:
+        self._buf[0:_HEADER] = array("d", (_MAGIC, _VERSION, self._checksum))
+
+    @property
+    def nbytes(self) -> int:
+        return 8 * self.doubles
+
+    def open(self, path: str) -> None:
+        """Map the history onto `path`, keeping its contents if the layout matches."""
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fresh = os.fstat(fd).st_size != self.nbytes
+            if fresh:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, self.nbytes)
+            mm = mmap.mmap(fd, self.nbytes)
+        finally:
+            os.close(fd)
+        buf = memoryview(mm).cast("d")
+        if not fresh and tuple(buf[0:_HEADER]) != (_MAGIC, _VERSION, self._checksum):
+            _LOGGER.info("History file %s has a different layout, starting over", path)
+            fresh = True
+            mm[:] = bytes(self.nbytes)
+        self._release()
+        self._mmap, self._buf = mm, buf
+        if fresh:
+            self._init_header()
+
+    def flush(self) -> None:
+        if self._mmap is not None:
+            self._mmap.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self._release()
+        self._buf = memoryview(bytearray(8 * self.doubles)).cast("d")
+        self._init_header()
+
+    def _release(self) -> None:
+        if self._mmap is not None:
+            self._buf.release()
+            self._mmap.close()
+            self._mmap = None
+
+    def add(self, t: float, values: list[float | None]) -> None:
+        """Record one sample per key (None when the key has no value)."""
+        buf = self._buf
+        raw = array("d", [t])
+        raw.extend(_NAN if v is None else v for v in values)
+        acc_iter = iter(self._acc)
+        for ring in self.rings:
+            if not ring.res:
+                ring.append(buf, raw)
+                continue
+            acc = next(acc_iter)
+            start = t - t % ring.res
+            if acc[0] != start:
+                if acc[0] is not None:
+                    ring.append(buf, _bucket_row(acc))
+                n = len(values)
+                acc[:] = [start, [math.inf] * n, [-math.inf] * n, [0.0] * n, [0] * n]
+            _, mins, maxs, sums, counts = acc
+            for i, v in enumerate(values):
+                if v is None:
+                    continue
+                if v < mins[i]:
+                    mins[i] = v
+                if v > maxs[i]:
+                    maxs[i] = v
+                sums[i] += v
+                counts[i] += 1
+
+    def window(self, start: float, end: float, keys: Iterable[str] | None = None,
+               resolution: int | None = None) -> dict[str, Any]:
+        """Rows between `start` and `end` as one array per column.
+
+        Without a resolution the finest ring that still holds everything
+        since `start` is used. Raw rows give one value array per key, bucket rows
+        a min/max/mean triple of arrays.
+        """
+        buf = self._buf
+        if resolution is None:
+            ring = next((r for r in self.rings if r.covers(buf, start)), self.rings[-1])
+        else:
+            ring = next((r for r in self.rings if r.res == resolution), None)
+            if ring is None:
+                raise ValueError(f"No history at resolution {resolution}")
+        wanted = [(i, key) for i, key in enumerate(self.keys) if keys is None or key in keys]
+        times: list[float] = []
+        columns: dict[str, Any] = {
+            key: [] if not ring.res else {"min": [], "max": [], "mean": []} for _, key in wanted
+        }
+        for row in ring.rows(buf):
+            t = row[0]
+            if t < start or t > end:
+                continue
+            times.append(round(t, 3))
+            for i, key in wanted:
+                if not ring.res:
+                    columns[key].append(_round(row[1 + i]))
+                    continue
+                col = columns[key]
+                off = 1 + 3 * i
+                col["min"].append(_round(row[off]))
+                col["max"].append(_round(row[off + 1]))
+                col["mean"].append(_round(row[off + 2]))
+        return {"resolution": ring.res, "t": times, **columns}
+
+
+def _bucket_row(acc: list[Any]) -> array:
+    start, mins, maxs, sums, counts = acc
+    row = array("d", [start])
+    for lo, hi, total, n in zip(mins, maxs, sums, counts):
+        row.extend((lo, hi, total / n) if n else (_NAN, _NAN, _NAN))
+    return row
+
+
+def _round(value: float) -> float | None:
+    return None if value != value else round(value, 2)
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import struct
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from .connection import ModbusError
+from .const import IDENTITY_RETRY_MIN_SECS, IDENTITY_RETRY_MAX_SECS
+
+if TYPE_CHECKING:
+    from .coordinator import SpiralaCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+# The identity block, read in one request
+IDENTITY_ADDR = 170
+IDENTITY_COUNT = 8
+# (field, word offset, words) of the ASCII fields in the block. Firmware and
+# hardware revision are not located yet (registers.UNLOCATED); once they
+# are, they are one more entry here if they fit in the block
+IDENTITY_LAYOUT = (("serial", 0, 8),)
+
+_NON_PRINTABLE = bytes(b for b in range(256) if not 32 <= b <= 126)
+
+
+class Identity(NamedTuple):
+    serial: str
+    model: str | None
+    firmware: str | None = None
+    hardware: str | None = None
+
+
+def decode_ascii(registers: list[int]) -> str:
+    """Registers as ASCII, high byte first, without NULs, padding or other non-printables."""
+    raw = struct.pack(f">{len(registers)}H", *registers)
+    return raw.translate(None, _NON_PRINTABLE).decode("ascii").strip()
+
+
+def parse_identity(registers: list[int]) -> Identity | None:
+    """Identity from the registers of the identity block; None without a serial number."""
+    fields = {
+        name: decode_ascii(registers[offset:offset + words]) or None
+        for name, offset, words in IDENTITY_LAYOUT
+    }
+    serial = fields.pop("serial")
+    if not serial:
+        return None
+    # The model series is the first character of the serial number
+    return Identity(serial, f"WW-{serial[0]}", **fields)
+
+
+class IdentityReader:
+    """Serial number, model and revisions of one unit, read once and remembered.
+
+    The identity comes from the entry's startup cache when there is one and
+    is then confirmed by a single read of the identity block on the first
+    good poll. Without an identity, reads are retried with exponential
+    backoff (IDENTITY_RETRY_MIN_SECS..IDENTITY_RETRY_MAX_SECS) rather than on
+    every poll. A blank or garbled identity block is retried the same way and
+    never replaces a known identity.
+    """
+
+    def __init__(self, coordinator: SpiralaCoordinator) -> None:
+        self.coordinator = coordinator
+        self.identity: Identity | None = None
+        self.confirmed = False
+        self.reads = 0
+        self._failures = 0
+        self._retry_at = 0.0
+
+    @property
+    def serial(self) -> str | None:
+        return self.identity.serial if self.identity is not None else None
+
+    @property
+    def model(self) -> str | None:
+        return self.identity.model if self.identity is not None else None
+
+    def restore(self, data: dict[str, Any]) -> None:
+        """Take the identity saved in the startup cache, unconfirmed."""
+        if data.get("serial"):
+            self.identity = Identity(
+                data["serial"], data.get("model"), data.get("firmware"), data.get("hardware")
+            )
+
+    def as_dict(self) -> dict[str, Any]:
+        identity = self.identity
+        return dict(identity._asdict()) if identity is not None else {"serial": None, "model": None}
+
+    async def async_update(self) -> bool:
+        """Read the identity block if it is due; returns True when the identity changed."""
+        if self.confirmed or self.coordinator.clock() < self._retry_at:
+            return False
+        self.reads += 1
+        try:
+            rr, _ = await self.coordinator._async_request_read(IDENTITY_ADDR, IDENTITY_COUNT)
+        except (ModbusError, asyncio.TimeoutError) as exc:
+            self._back_off(exc)
+            return False
+        if rr.isError():
+            self._back_off(rr)
+            return False
+        identity = parse_identity(rr.registers)
+        if identity is None:
+            self._back_off("no serial number")
+            return False
+        self.confirmed = True
+        self._failures = 0
+        if identity == self.identity:
+            return False
+        if self.identity is not None:
+            _LOGGER.warning(
+                "Unit %s at %s now reports serial %s (was %s)",
+                self.coordinator.unit_id, self.coordinator.host, identity.serial, self.identity.serial,
+            )
+        self.identity = identity
+        return True
+
+    def _back_off(self, reason: Any) -> None:
+        self._failures += 1
+        delay = min(IDENTITY_RETRY_MAX_SECS, IDENTITY_RETRY_MIN_SECS * 2 ** (self._failures - 1))
+        self._retry_at = self.coordinator.clock() + delay
+        _LOGGER.debug("Identity read failed (%s), retrying in %s s", reason, delay)
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import logging
+import os
+import random
+import struct
+import threading
+import time
+from typing import Any, Iterable, Iterator
+
+from .const import JOURNAL_KEYS, JOURNAL_MAX_BYTES, JOURNAL_FILES, JOURNAL_QUERY_LIMIT
+from .registers import REGISTERS, Point
+
+_LOGGER = logging.getLogger(__name__)
+
+_MAGIC = b"SPJR"
+_VERSION = 1
+# magic, version, record size, creation (wall) time
+_HEADER = struct.Struct("<4sHHd")
+# wall time, monotonic time, channel, flags, old value, new value, run
+_RECORD = struct.Struct("<ddBBHHH")
+# Records per read when scanning a file
+_CHUNK = 1024
+# The first value of a channel after startup; `old` is unknown
+_F_START = 1
+# State of a channel at the head of a rotated file, not a change
+_F_SNAPSHOT = 2
+# Channel of the record written when the journal is closed; every state is unknown after it
+_STOP = 0xFF
+
+
+class TransitionJournal:
+    """Append-only binary log of the changes of a few status registers.
+
+    Each change of a JOURNAL_KEYS value is one fixed-size record with the
+    wall and monotonic time, the old and the new value. Changes are
+    buffered on the event loop (`update`) and written, rotated and queried
+    in the executor. A file rotates at `max_bytes` and `files` of them are
+    kept; each new file starts with the state of every channel, so a query
+    finds the state at its start within one file. Durations between records
+    of the same run use the monotonic time, so clock steps do not skew them.
+    """
+
+    def __init__(self, index: dict[str, int], points: Iterable[Point] = REGISTERS,
+                 keys: tuple[str, ...] = JOURNAL_KEYS, max_bytes: int = JOURNAL_MAX_BYTES,
+                 files: int = JOURNAL_FILES) -> None:
+        points = {p.key: p for p in points}
+        self.keys = keys
+        self._slots = [index[key] for key in keys]
+        self._enums = [points[key].enum for key in keys]
+        self._bits = [[(p.key, p.mask) for p in points.values() if p.word == key] for key in keys]
+        self.max_bytes = max(max_bytes, _HEADER.size + _RECORD.size * (len(keys) + 1))
+        self.files = max(1, files)
+        self.path: str | None = None
+        self.records = 0
+        # Tells the records of this process from those of earlier runs
+        self._run = random.getrandbits(16)
+        self._last: list[int | None] = [None] * len(keys)
+        self._pending = bytearray()
+        # Executor side: the file and the state as of the records written to it
+        self._lock = threading.Lock()
+        self._fd: int | None = None
+        self._state: list[int | None] = [None] * len(keys)
+        self._last_written: tuple[float, float, int] | None = None
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._pending)
+
+    def update(self, wall: float, mono: float, values: list[Any]) -> int:
+        """Buffer a record per channel whose value changed; returns their number."""
+        changes = 0
+        last = self._last
+        for ch, slot in enumerate(self._slots):
+            value = values[slot]
+            if value is None:
+                continue
+            value = int(value) & 0xFFFF
+            old = last[ch]
+            if value == old:
+                continue
+            flags, old = (_F_START, value) if old is None else (0, old)
+            self._pending += _RECORD.pack(wall, mono, ch, flags, old, value, self._run)
+            last[ch] = value
+            changes += 1
+        return changes
+
+    def stop(self, wall: float, mono: float) -> None:
+        """Buffer the record that ends every state, e.g. before shutdown."""
+        self._pending += _RECORD.pack(wall, mono, _STOP, 0, 0, 0, self._run)
+        self._last = [None] * len(self.keys)
+
+    def take(self) -> bytes:
+        data = bytes(self._pending)
+        self._pending.clear()
+        return data
+
+    def _file(self, k: int) -> str:
+        return self.path if k == 0 else f"{self.path}.{k}"
+
+    def paths(self) -> list[str]:
+        """Journal files, oldest first."""
+        return [self._file(k) for k in reversed(range(self.files))]
+
+    def open(self, path: str) -> None:
+        with self._lock:
+            self.path = path
+            self._open_current()
+
+    def _open_current(self) -> None:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        size = os.fstat(fd).st_size
+        header = os.pread(fd, _HEADER.size, 0) if size >= _HEADER.size else b""
+        if header and _HEADER.unpack(header)[:3] == (_MAGIC, _VERSION, _RECORD.size):
+            # Drop a record torn by a crash
+            end = size - (size - _HEADER.size) % _RECORD.size
+            if end != size:
+                os.ftruncate(fd, end)
+        else:
+            if size:
+                _LOGGER.info("Journal %s has a different layout, starting over", self.path)
+            os.ftruncate(fd, 0)
+            os.write(fd, _HEADER.pack(_MAGIC, _VERSION, _RECORD.size, time.time()))
+        self._fd = fd
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def write(self, data: bytes) -> None:
+        """Append buffered records, rotating the file once it is full."""
+        with self._lock:
+            if self._fd is None or not data:
+                return
+            os.write(self._fd, data)
+            for wall, mono, ch, _flags, _old, new, run in _RECORD.iter_unpack(data):
+                self.records += 1
+                self._last_written = (wall, mono, run)
+                if ch == _STOP:
+                    self._state = [None] * len(self.keys)
+                else:
+                    self._state[ch] = new
+            if os.fstat(self._fd).st_size >= self.max_bytes:
+                self._rotate()
+
+    def _rotate(self) -> None:
+        os.close(self._fd)
+        self._fd = None
+        for k in range(self.files - 1, 0, -1):
+            if os.path.exists(self._file(k - 1)):
+                os.replace(self._file(k - 1), self._file(k))
+        if self.files == 1:
+            os.remove(self.path)
+        self._open_current()
+        wall, mono, run = self._last_written
+        os.write(self._fd, b"".join(
+            _RECORD.pack(wall, mono, ch, _F_SNAPSHOT, value, value, run)
+            for ch, value in enumerate(self._state) if value is not None
+        ))
+
+    def query(self, start: float, end: float, keys: Iterable[str] | None = None,
+              limit: int = JOURNAL_QUERY_LIMIT) -> dict[str, Any]:
+        """Transitions between `start` and `end` (wall times) and the seconds spent per state.
+
+        Files are binary-searched for `start` and read in chunks, so only
+        the window and, for the state at its start, the records just before
+        it are read. Durations are per enum value, or per bit for the IO and
+        relay words (seconds the bit was set).
+        """
+        wanted = [ch for ch, key in enumerate(self.keys) if keys is None or key in keys]
+        with self._lock:
+            fds = []
+            for path in self.paths() if self.path is not None else ():
+                try:
+                    fds.append(os.open(path, os.O_RDONLY))
+                except FileNotFoundError:
+                    continue
+            try:
+                return self._query(fds, start, end, wanted, limit)
+            finally:
+                for fd in fds:
+                    os.close(fd)
+
+    def _query(self, fds: list[int], start: float, end: float, wanted: list[int], limit: int) -> dict[str, Any]:
+        counts = [_count(fd) for fd in fds]
+        # First record at or after `start`; wall time only goes back on clock steps
+        pos = (len(fds), 0)
+        for fi, fd in enumerate(fds):
+            if counts[fi] and _read(fd, counts[fi] - 1, 1)[0][0] >= start:
+                pos = (fi, _bisect(fd, counts[fi], start))
+                break
+
+        state: dict[int, int | None] = {}
+        for wall, mono, ch, flags, old, new, run in _backward(fds, counts, *pos):
+            if ch == _STOP:
+                break
+            if ch in wanted and ch not in state:
+                state[ch] = new
+                if len(state) == len(wanted):
+                    break
+        since = {ch: (start, None, None) for ch in wanted}
+        durations: dict[int, dict[str, float]] = {ch: {} for ch in wanted}
+        transitions: list[dict[str, Any]] = []
+        truncated = False
+        for wall, mono, ch, flags, old, new, run in _forward(fds, counts, *pos):
+            if wall > end:
+                break
+            if ch == _STOP:
+                for c in wanted:
+                    self._add(durations[c], c, state.get(c), since[c], wall, mono, run)
+                    state[c] = None
+                    since[c] = (wall, mono, run)
+                continue
+            if ch not in durations:
+                continue
+            if flags & _F_SNAPSHOT and state.get(ch) is not None:
+                continue
+            self._add(durations[ch], ch, state.get(ch), since[ch], wall, mono, run)
+            state[ch] = new
+            since[ch] = (wall, mono, run)
+            if flags & _F_SNAPSHOT:
+                continue
+            if len(transitions) < limit:
+                transitions.append(self._transition(ch, None if flags & _F_START else old, new, wall))
+            else:
+                truncated = True
+        for ch in wanted:
+            self._add(durations[ch], ch, state.get(ch), since[ch], end, None, None)
+        return {
+            "start": round(start, 3),
+            "end": round(end, 3),
+            "transitions": transitions,
+            "truncated": truncated,
+            "durations": {
+                self.keys[ch]: {name: round(secs, 1) for name, secs in durations[ch].items()} for ch in wanted
+            },
+        }
+
+    def _name(self, ch: int, value: int | None) -> Any:
+        enum = self._enums[ch]
+        return enum.get(value, value) if enum and value is not None else value
+
+    def _transition(self, ch: int, old: int | None, new: int, wall: float) -> dict[str, Any]:
+        item = {"t": round(wall, 3), "key": self.keys[ch], "from": self._name(ch, old), "to": self._name(ch, new)}
+        bits = self._bits[ch]
+        if bits:
+            before = old or 0
+            item["set"] = [key for key, mask in bits if new & mask and not before & mask]
+            item["cleared"] = [key for key, mask in bits if before & mask and not new & mask]
+        return item
+
+    def _add(self, durations: dict[str, float], ch: int, value: int | None,
+             since: tuple[float, float | None, int | None], wall: float, mono: float | None, run: int | None) -> None:
+        if value is None:
+            return
+        s_wall, s_mono, s_run = since
+        secs = mono - s_mono if s_mono is not None and mono is not None and s_run == run else wall - s_wall
+        if secs <= 0:
+            return
+        bits = self._bits[ch]
+        names = [key for key, mask in bits if value & mask] if bits else [str(self._name(ch, value))]
+        for name in names:
+            durations[name] = durations.get(name, 0.0) + secs
+
+
+def _count(fd: int) -> int:
+    return max(0, (os.fstat(fd).st_size - _HEADER.size) // _RECORD.size)
+
+
+def _read(fd: int, i: int, n: int) -> list[tuple]:
+    data = os.pread(fd, n * _RECORD.size, _HEADER.size + i * _RECORD.size)
+    return list(_RECORD.iter_unpack(data[:len(data) - len(data) % _RECORD.size]))
+
+
+def _bisect(fd: int, n: int, t: float) -> int:
+    """Index of the first record of the file at or after wall time `t`."""
+    lo, hi = 0, n
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _read(fd, mid, 1)[0][0] < t:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _forward(fds: list[int], counts: list[int], fi: int, i: int) -> Iterator[tuple]:
+    while fi < len(fds):
+        while i < counts[fi]:
+            chunk = _read(fds[fi], i, min(_CHUNK, counts[fi] - i))
+            yield from chunk
+            i += len(chunk)
+        fi, i = fi + 1, 0
+
+
+def _backward(fds: list[int], counts: list[int], fi: int, i: int) -> Iterator[tuple]:
+    if fi == len(fds):
+        fi, i = fi - 1, counts[-1] if counts else 0
+    while fi >= 0:
+        while i > 0:
+            n = min(_CHUNK, i)
+            i -= n
+            yield from reversed(_read(fds[fi], i, n))
+        fi -= 1
+        if fi >= 0:
+            i = counts[fi]
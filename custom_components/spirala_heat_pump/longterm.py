@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Iterable
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import slugify
+
+from .const import (
+    DOMAIN, STATISTICS_COUNTER_KEYS, STATISTICS_MEAN_KEYS, STATISTICS_BACKFILL_MAX_HOURS,
+)
+from .registers import REGISTERS, Point
+
+_LOGGER = logging.getLogger(__name__)
+
+_HOUR = 3600
+
+
+class LongTermStatistics:
+    """Hourly statistics of the counters and temperatures, imported into the recorder.
+
+    Every good poll feeds the open hour: min/max/mean per temperature and the
+    last value per counter. When a poll lands in the next hour, the closed
+    hour becomes one row per statistic (counters as state and a running
+    sum), imported in one batch with the recorder's external statistics.
+    The sums continue from the last rows in the recorder. Hours missed while
+    HA or the unit was down are backfilled by spreading the counter delta
+    across them linearly; temperatures have no rows for those hours.
+    """
+
+    def __init__(self, hass: HomeAssistant, index: dict[str, int], object_id: str, name: str,
+                 points: Iterable[Point] = REGISTERS) -> None:
+        self.hass = hass
+        points = {p.key: p for p in points}
+        object_id = slugify(object_id)
+        self._counters = [
+            _Counter(key, index[key], self._metadata(object_id, name, points[key], True))
+            for key in STATISTICS_COUNTER_KEYS
+        ]
+        self._means = [
+            (index[key], self._metadata(object_id, name, points[key], False)) for key in STATISTICS_MEAN_KEYS
+        ]
+        # min, max, sum, count per temperature in the open hour
+        self._acc: list[list[float]] = [[] for _ in self._means]
+        self._hour: float | None = None
+        self.enabled = False
+        self.rows = 0
+        self.backfilled = 0
+
+    @staticmethod
+    def _metadata(object_id: str, name: str, point: Point, has_sum: bool) -> dict[str, Any]:
+        return {
+            "has_mean": not has_sum,
+            "has_sum": has_sum,
+            "name": f"{name} {point.key.replace('_', ' ')}",
+            "source": DOMAIN,
+            "statistic_id": f"{DOMAIN}:{object_id}_{point.key}",
+            "unit_of_measurement": point.unit,
+        }
+
+    async def async_setup(self) -> None:
+        """Continue the counter sums from the recorder; stays off without one."""
+        if "recorder" not in self.hass.config.components:
+            return
+        from homeassistant.components.recorder import get_instance
+        from homeassistant.components.recorder.statistics import get_last_statistics
+
+        recorder = get_instance(self.hass)
+        for counter in self._counters:
+            statistic_id = counter.metadata["statistic_id"]
+            last = await recorder.async_add_executor_job(
+                get_last_statistics, self.hass, 1, statistic_id, False, {"state", "sum"}
+            )
+            rows = last.get(statistic_id)
+            if rows and rows[0].get("state") is not None:
+                row = rows[0]
+                counter.hour, counter.state, counter.sum = row["start"], row["state"], row["sum"] or 0.0
+        self.enabled = True
+
+    def add(self, wall: float, values: list[Any]) -> None:
+        """Feed one good poll at wall time `wall`."""
+        if not self.enabled:
+            return
+        hour = wall - wall % _HOUR
+        if self._hour is not None and hour != self._hour:
+            self._close_hour()
+        if hour != self._hour:
+            self._hour = hour
+            self._acc = [[] for _ in self._means]
+        for acc, (slot, _) in zip(self._acc, self._means):
+            value = values[slot]
+            if value is None:
+                continue
+            if not acc:
+                acc += (value, value, value, 1)
+                continue
+            if value < acc[0]:
+                acc[0] = value
+            if value > acc[1]:
+                acc[1] = value
+            acc[2] += value
+            acc[3] += 1
+        for counter in self._counters:
+            value = values[counter.slot]
+            if value is not None:
+                if counter.hour is not None and hour - counter.hour > _HOUR:
+                    self._backfill(counter, hour, wall, value)
+                counter.value = value
+
+    def _backfill(self, counter: _Counter, hour: float, wall: float, value: float) -> None:
+        """Rows for the hours between the last imported one and `hour`, from the counter delta."""
+        first = counter.hour + _HOUR
+        hours = int((hour - first) // _HOUR)
+        if value < counter.state:
+            return
+        if hours > STATISTICS_BACKFILL_MAX_HOURS:
+            _LOGGER.debug("Not backfilling %s hours of %s", hours, counter.metadata["statistic_id"])
+            return
+        # The last row's state is the value at the end of its hour
+        base = counter.state
+        rate = (value - base) / (wall - first)
+        for i in range(hours):
+            counter.append(first + i * _HOUR, base + rate * (i + 1) * _HOUR)
+        self.backfilled += hours
+
+    def _close_hour(self) -> None:
+        start = self._hour
+        for acc, (_, metadata) in zip(self._acc, self._means):
+            if acc:
+                lo, hi, total, n = acc
+                self._import(metadata, [{"start": _utc(start), "min": lo, "max": hi, "mean": total / n}])
+        for counter in self._counters:
+            if counter.value is not None and (counter.hour is None or start > counter.hour):
+                counter.append(start, counter.value)
+            if counter.pending:
+                self._import(counter.metadata, counter.pending)
+                counter.pending = []
+
+    def _import(self, metadata: dict[str, Any], rows: list[dict[str, Any]]) -> None:
+        from homeassistant.components.recorder.statistics import async_add_external_statistics
+
+        self.rows += len(rows)
+        async_add_external_statistics(self.hass, metadata, rows)
+
+
+class _Counter:
+    """State of one counter statistic: the last row and the rows not imported yet."""
+
+    __slots__ = ("key", "slot", "metadata", "hour", "state", "sum", "value", "pending")
+
+    def __init__(self, key: str, slot: int, metadata: dict[str, Any]) -> None:
+        self.key = key
+        self.slot = slot
+        self.metadata = metadata
+        self.hour: float | None = None
+        self.state: float | None = None
+        self.sum = 0.0
+        self.value: float | None = None
+        self.pending: list[dict[str, Any]] = []
+
+    def append(self, hour: float, state: float) -> None:
+        if self.state is not None:
+            # A drop is a counter reset; the new value is all growth
+            self.sum += state - self.state if state >= self.state else state
+        self.hour, self.state = hour, state
+        self.pending.append({"start": _utc(hour), "state": round(state, 3), "sum": round(self.sum, 3)})
+
+
+def _utc(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, timezone.utc)
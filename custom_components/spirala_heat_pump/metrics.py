@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import math
+from typing import Any
+
+from .const import ACTIVE_CIRCUIT_ENUM, NOT_RUNNING_ENUM
+
+# Horizon of the rolling starts/hour and duty cycle
+RATE_WINDOW_SECS = 3600.0
+# Weight of the newest cycle in the average cycle duration (~ last 10 cycles)
+CYCLE_ALPHA = 0.2
+# Longer gaps between polls (outage, restart) are not attributed to any state
+MAX_GAP_SECS = 120.0
+
+CIRCUIT_TIME_KEYS = {value: f"time_circuit_{name}" for value, name in ACTIVE_CIRCUIT_ENUM.items()}
+REASON_TIME_KEYS = {value: f"time_not_running_{name}" for value, name in NOT_RUNNING_ENUM.items()}
+# Snapshot values the metrics are derived from
+INPUT_KEYS = ("supply_temp", "return_temp", "io_contactor", "active_circuit", "not_running_reason")
+# Totals survive restarts through the sensors' restored state
+TOTAL_KEYS = (*CIRCUIT_TIME_KEYS.values(), *REASON_TIME_KEYS.values())
+METRIC_KEYS = ("delta_t", "starts_per_hour", "duty_cycle", "avg_cycle_minutes", *TOTAL_KEYS)
+
+
+class MetricsEngine:
+    """Derived values updated once per poll with constant state per metric.
+
+    Starts/hour and duty cycle are exponentially weighted over
+    RATE_WINDOW_SECS with a bias correction, so they are usable right after
+    startup. Starts and cycles come from edges of `io_contactor`; the
+    counters are only read at the medium tier rate. Times are seconds
+    internally and published in hours.
+    """
+
+    def __init__(self, index: dict[str, int]) -> None:
+        self._supply = index["supply_temp"]
+        self._return = index["return_temp"]
+        self._contactor = index["io_contactor"]
+        self._circuit = index["active_circuit"]
+        self._reason = index["not_running_reason"]
+        self._last: float | None = None
+        self._running: bool | None = None
+        self._cycle_start: float | None = None
+        self._weight = 0.0
+        self._starts = 0.0
+        self._duty = 0.0
+        self._avg_cycle: float | None = None
+        self._totals = dict.fromkeys(TOTAL_KEYS, 0.0)
+        self.values: dict[str, Any] = dict.fromkeys(METRIC_KEYS)
+
+    def restore(self, key: str, value: float) -> None:
+        """Seed a total (hours) or the average cycle (minutes) from a restored state."""
+        if key in self._totals:
+            self._totals[key] = value * 3600
+        elif key == "avg_cycle_minutes":
+            self._avg_cycle = value * 60
+        self.values[key] = value
+
+    def update(self, now: float, values: list[Any]) -> set[str]:
+        """Fold one poll in; returns the metrics whose published value changed."""
+        running = values[self._contactor]
+        dt = 0.0 if self._last is None else now - self._last
+        self._last = now
+        started = False
+        if running is not None and self._running is not None and running != self._running:
+            if running:
+                started = True
+                self._cycle_start = now
+            elif self._cycle_start is not None:
+                cycle = now - self._cycle_start
+                avg = self._avg_cycle
+                self._avg_cycle = cycle if avg is None else avg + CYCLE_ALPHA * (cycle - avg)
+                self._cycle_start = None
+        if running is not None:
+            self._running = running
+
+        if 0 < dt <= MAX_GAP_SECS:
+            decay = math.exp(-dt / RATE_WINDOW_SECS)
+            self._weight = self._weight * decay + (1 - decay)
+            self._duty = self._duty * decay + (1 - decay) * bool(self._running)
+            self._starts = self._starts * decay + started
+            key = CIRCUIT_TIME_KEYS.get(values[self._circuit])
+            if key is not None:
+                self._totals[key] += dt
+            key = REASON_TIME_KEYS.get(values[self._reason])
+            if key is not None:
+                self._totals[key] += dt
+        elif started:
+            self._starts += 1
+
+        supply, ret = values[self._supply], values[self._return]
+        out = {
+            "delta_t": None if supply is None or ret is None else round(supply - ret, 1),
+            "avg_cycle_minutes": None if self._avg_cycle is None else round(self._avg_cycle / 60, 1),
+        }
+        if self._weight:
+            out["starts_per_hour"] = round(self._starts * 3600 / RATE_WINDOW_SECS / self._weight, 2)
+            out["duty_cycle"] = round(100 * self._duty / self._weight, 1)
+        for key, secs in self._totals.items():
+            out[key] = round(secs / 3600, 2)
+
+        published = self.values
+        changed = {key for key, value in out.items() if published[key] != value}
+        published.update(out)
+        return changed
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import logging
+import math
+from typing import Any, Collection, Iterable, Mapping
+
+from .const import (
+    MAX_REGS_PER_READ, DEFAULT_MAX_REGS_PER_READ, DEFAULT_READ_GAP, TRANSPORT_TCP, DEFAULT_BAUDRATE,
+    RTU_TURNAROUND_SECS, RTU_MAX_FRAME_SECS, HISTORY_KEYS, JOURNAL_KEYS, STATISTICS_COUNTER_KEYS,
+    STATISTICS_MEAN_KEYS,
+)
+from .metrics import INPUT_KEYS as METRIC_INPUT_KEYS
+from .registers import FEATURE_KEYS, REGISTERS, Point
+
+_LOGGER = logging.getLogger(__name__)
+
+# Minimum number of samples before the RTT model is trusted for tuning
+_MIN_SAMPLES = 8
+# Exponential forgetting for the RTT fit so it follows gateway/bus changes
+_DECAY = 0.98
+
+# Values polled whatever entities exist: the feature flags, and io_contactor,
+# which sets the scan rate
+INTERNAL_KEYS = frozenset((*FEATURE_KEYS, "io_contactor"))
+
+
+def spans_by_tier(points: Iterable[Point] = REGISTERS,
+                  keys: Collection[str] | None = None) -> dict[str, list[tuple[int, int]]]:
+    """Polled registers as (address, width) spans grouped by poll tier.
+
+    With `keys`, only the registers backing those keys; a bit needs its word.
+    """
+    points = tuple(points)
+    if keys is not None:
+        keys = {*keys, *(p.word for p in points if p.word is not None and p.key in keys)}
+    spans: dict[str, list[tuple[int, int]]] = {}
+    for p in points:
+        # Bits come with their word; 32-bit values must come back in a single read
+        if p.word is None and (keys is None or p.key in keys):
+            spans.setdefault(p.tier, []).append((p.addr, p.words))
+    return spans
+
+
+def tier_by_address(points: Iterable[Point] = REGISTERS) -> dict[int, str]:
+    return {
+        p.addr + i: p.tier
+        for p in points if p.word is None
+        for i in range(p.words)
+    }
+
+
+def internal_keys(history: bool = True, journal: bool = True, statistics: bool = True,
+                  metrics: bool = True) -> frozenset[str]:
+    """INTERNAL_KEYS plus the inputs of the coordinator's own consumers that are on.
+
+    The telemetry history, the transition journal, the long-term statistics
+    and the metrics read their inputs every poll, so each one that is off
+    takes its registers out of the fast plan.
+    """
+    keys = set(INTERNAL_KEYS)
+    if history:
+        keys.update(HISTORY_KEYS)
+    if journal:
+        keys.update(JOURNAL_KEYS)
+    if statistics:
+        keys.update(STATISTICS_COUNTER_KEYS, STATISTICS_MEAN_KEYS)
+    if metrics:
+        keys.update(METRIC_INPUT_KEYS)
+    return frozenset(keys)
+
+
+def rtu_char_secs(baudrate: int) -> float:
+    """Wire time of one RTU character: start, 8 data, parity or second stop bit."""
+    return 11 / baudrate
+
+
+def rtu_silent_secs(baudrate: int) -> float:
+    """Bus silence between RTU frames: 3.5 characters, fixed above 19200 baud."""
+    return 3.5 * rtu_char_secs(baudrate) if baudrate <= 19200 else 0.00175
+
+
+def rtu_read_secs(baudrate: int, count: int) -> float:
+    """Wire time of a read of `count` registers: request, response and both silences."""
+    return (8 + 5 + 2 * count) * rtu_char_secs(baudrate) + 2 * rtu_silent_secs(baudrate)
+
+
+def plan_defaults(data: Mapping[str, Any]) -> tuple[int, int]:
+    """Default (max registers per read, read gap) for the link of an entry.
+
+    Over TCP these are the fixed defaults. On an RTU bus a read is capped
+    to RTU_MAX_FRAME_SECS of response on the wire, and a hole is bridged
+    while its registers cost less wire time than another request's framing,
+    silences and turnaround; the RTT fit refines the gap from there.
+    """
+    if data.get("transport", TRANSPORT_TCP) == TRANSPORT_TCP:
+        return DEFAULT_MAX_REGS_PER_READ, DEFAULT_READ_GAP
+    baudrate = data.get("baudrate", DEFAULT_BAUDRATE)
+    char = rtu_char_secs(baudrate)
+    max_count = max(1, min(int((RTU_MAX_FRAME_SECS / char - 5) // 2), MAX_REGS_PER_READ))
+    overhead = rtu_read_secs(baudrate, 0) + RTU_TURNAROUND_SECS
+    return max_count, min(math.floor(overhead / (2 * char)), max_count)
+
+
+def plan_reads(spans: Iterable[tuple[int, int]], max_count: int, gap: int) -> list[tuple[int, int]]:
+    """Merge spans into the fewest contiguous (start, count) reads.
+
+    A hole of up to `gap` unmapped registers is read through rather than
+    paying for another round trip. No read exceeds `max_count` registers.
+    """
+    reads: list[tuple[int, int]] = []
+    start = end = None
+    for addr, width in sorted(set(spans)):
+        if start is not None and addr + width <= end:
+            continue
+        if start is not None and addr - end <= gap and max(end, addr + width) - start <= max_count:
+            end = max(end, addr + width)
+            continue
+        if start is not None:
+            reads.append((start, end - start))
+        start, end = addr, addr + width
+    if start is not None:
+        reads.append((start, end - start))
+    return reads
+
+
+class ReadPlanner:
+    """Builds read plans per set of due poll tiers and tunes the gap threshold.
+
+    Request time is modelled as `overhead + per_reg * count` with an
+    exponentially weighted least-squares fit. Bridging a hole is worth it
+    while the registers it drags in cost less than one extra request, so
+    the gap threshold is `overhead / per_reg`.
+    """
+
+    def __init__(self, spans: dict[str, Iterable[tuple[int, int]]], max_count: int = MAX_REGS_PER_READ,
+                 gap: int = 0, auto_tune: bool = True) -> None:
+        self.spans = {tier: list(tier_spans) for tier, tier_spans in spans.items()}
+        self.max_count = max(1, min(max_count, MAX_REGS_PER_READ))
+        self.gap = max(0, gap)
+        self.auto_tune = auto_tune
+        self._n = self._sx = self._sy = self._sxx = self._sxy = 0.0
+        self._plans: dict[frozenset[str], list[tuple[int, int]]] = {}
+
+    def set_spans(self, spans: dict[str, Iterable[tuple[int, int]]]) -> None:
+        self.spans = {tier: list(tier_spans) for tier, tier_spans in spans.items()}
+        self._plans.clear()
+
+    def plan_for(self, tiers: Iterable[str]) -> list[tuple[int, int]]:
+        """Reads covering every register of the given tiers, merged into one plan."""
+        key = frozenset(tiers)
+        plan = self._plans.get(key)
+        if plan is None:
+            spans = [span for tier in key for span in self.spans.get(tier, ())]
+            plan = self._plans[key] = plan_reads(spans, self.max_count, self.gap)
+        return plan
+
+    @property
+    def plan(self) -> list[tuple[int, int]]:
+        return self.plan_for(self.spans)
+
+    def record(self, count: int, rtt: float) -> bool:
+        """Feed one measured request; returns True when the plan changed."""
+        d = _DECAY
+        self._n = self._n * d + 1.0
+        self._sx = self._sx * d + count
+        self._sy = self._sy * d + rtt
+        self._sxx = self._sxx * d + count * count
+        self._sxy = self._sxy * d + count * rtt
+        if not self.auto_tune or self._n < _MIN_SAMPLES:
+            return False
+        gap = self._fitted_gap()
+        if gap is None or gap == self.gap:
+            return False
+        old = self.plan
+        self.gap = gap
+        self._plans.clear()
+        if self.plan == old:
+            return False
+        _LOGGER.debug("Read plan retuned (gap=%s): %s", gap, self.plan)
+        return True
+
+    def _fitted_gap(self) -> int | None:
+        n = self._n
+        var = self._sxx - self._sx * self._sx / n
+        if var <= 1e-9:
+            # All requests had the same size; overhead and per-register cost can't be separated
+            return None
+        per_reg = (self._sxy - self._sx * self._sy / n) / var
+        overhead = (self._sy - per_reg * self._sx) / n
+        if per_reg <= 0 or overhead <= 0:
+            return None
+        return int(min(overhead / per_reg, self.max_count))
+
+    @property
+    def registers_per_poll(self) -> int:
+        return sum(count for _, count in self.plan)
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import math
+from array import array
+from typing import Iterator
+
+# Registers per page; pages are allocated when an address in them is first seen
+_PAGE = 256
+_NEVER = -math.inf
+
+
+class RegisterCache:
+    """Raw value of every register read from or written to the unit, with when it was seen.
+
+    Address-indexed pages of 16-bit values and monotonic times, so a full
+    register sweep stays well under a megabyte and storing a read is a
+    slice assignment per page. Everything the unit answered is kept:
+    polls, identity reads, write read-backs and register scans.
+    """
+
+    def __init__(self) -> None:
+        self._pages: dict[int, tuple[array, array]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def size(self) -> int:
+        """Addresses the cache has room for."""
+        return len(self._pages) * _PAGE
+
+    def _segments(self, start: int, count: int) -> Iterator[tuple[int, int, int, int]]:
+        """(page, offset in page, length, offset in range) of each page a range touches."""
+        i = 0
+        while i < count:
+            page, off = divmod(start + i, _PAGE)
+            n = min(_PAGE - off, count - i)
+            yield page, off, n, i
+            i += n
+
+    def store(self, start: int, registers: list[int], t: float) -> None:
+        for page, off, n, i in self._segments(start, len(registers)):
+            entry = self._pages.get(page)
+            if entry is None:
+                entry = self._pages[page] = (array("H", bytes(2 * _PAGE)), array("d", [_NEVER]) * _PAGE)
+            values, times = entry
+            values[off:off + n] = array("H", registers[i:i + n])
+            times[off:off + n] = array("d", [t]) * n
+
+    def invalidate(self, start: int, count: int) -> None:
+        for page, off, n, _ in self._segments(start, count):
+            entry = self._pages.get(page)
+            if entry is not None:
+                entry[1][off:off + n] = array("d", [_NEVER]) * n
+
+    def stale(self, start: int, count: int, since: float) -> tuple[int, int] | None:
+        """The smallest (start, count) covering the registers not seen since `since`, if any.
+
+        Registers never seen, or invalidated by a write, are stale whatever `since` is.
+        """
+        first = last = None
+        for page, off, n, i in self._segments(start, count):
+            entry = self._pages.get(page)
+            if entry is None:
+                first = start + i if first is None else first
+                last = start + i + n - 1
+                continue
+            times = entry[1]
+            for j in range(n):
+                t = times[off + j]
+                if t < since or t == _NEVER:
+                    first = start + i + j if first is None else first
+                    last = start + i + j
+        if first is None:
+            self.hits += 1
+            return None
+        self.misses += 1
+        return first, last - first + 1
+
+    def read(self, start: int, count: int) -> tuple[list[int | None], float]:
+        """Cached values of a range (None where never seen) and when its oldest register was seen."""
+        values: list[int | None] = []
+        oldest = math.inf
+        for page, off, n, _ in self._segments(start, count):
+            entry = self._pages.get(page)
+            if entry is None:
+                values += [None] * n
+                oldest = _NEVER
+                continue
+            page_values, times = entry
+            values += [
+                page_values[j] if times[j] != _NEVER else None for j in range(off, off + n)
+            ]
+            oldest = min(oldest, min(times[off:off + n]))
+        return values, oldest
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+from typing import Any, Iterable, NamedTuple
+
+from .const import (
+    POLL_TIER_FAST, POLL_TIER_MEDIUM, POLL_TIER_SLOW, POLL_TIERS, TEMP_DEADBAND,
+    ERROR_ENUM, NOT_RUNNING_ENUM, ACTIVE_CIRCUIT_ENUM, THERMOSTAT_ENUM,
+)
+
+_TEMP = 1 / 256
+
+
+class Point(NamedTuple):
+    """One value of the register map and how it is polled, decoded and shown.
+
+    A point with `word` is one bit of that (16-bit) point's register and has
+    its own snapshot slot. `platform` is the entity platform it is exposed
+    on, if any; `requires` is an (entry option, default) pair and `flag` a
+    feature flag in the snapshot that must both be truthy for the entity to
+    be created. Unit, device class and icon are plain strings so the
+    schema loads without Home Assistant.
+    """
+
+    key: str
+    addr: int
+    words: int = 1
+    scale: float = 1.0
+    signed: bool = False
+    tier: str = POLL_TIER_FAST
+    group: str = ""
+    word: str | None = None
+    bit: int | None = None
+    enum: dict[int, str] | None = None
+    writable: bool = False
+    minimum: float | None = None
+    maximum: float | None = None
+    step: float | None = None
+    platform: str | None = None
+    unit: str | None = None
+    device_class: str | None = None
+    icon: str | None = None
+    deadband: float = 0.0
+    requires: tuple[str, bool] | None = None
+    flag: str | None = None
+
+    @property
+    def mask(self) -> int:
+        return 0 if self.bit is None else 1 << self.bit
+
+
+def _temp(key: str, addr: int) -> Point:
+    return Point(key, addr, scale=_TEMP, group="temperature", platform="sensor", unit="°C",
+                 device_class="temperature", icon="mdi:thermometer", deadband=TEMP_DEADBAND)
+
+
+def _setpoint(key: str, addr: int, **kw: Any) -> Point:
+    return Point(key, addr, scale=_TEMP, tier=POLL_TIER_SLOW, group="setpoint", writable=True,
+                 minimum=0, maximum=80, step=0.5, platform="number", unit="°C", icon="mdi:thermometer", **kw)
+
+
+def _diff(key: str, addr: int, minimum: float, maximum: float, **kw: Any) -> Point:
+    return Point(key, addr, tier=POLL_TIER_SLOW, group="diff", writable=True, minimum=minimum,
+                 maximum=maximum, step=1, platform="number", unit="°C", **kw)
+
+
+def _bits(word: str, addr: int, bits: Iterable[tuple[str, int, str | None]]) -> list[Point]:
+    return [
+        Point(key, addr, group="bit", word=word, bit=bit, platform="binary_sensor", flag=flag)
+        for key, bit, flag in bits
+    ]
+
+
+_CIRCUIT_2 = ("has_circuit_2", False)
+# Feature flags of the unit itself; points behind them are neither exposed nor polled without it
+_HAS_CIRCUIT_2 = "has_circuit_2"
+_HAS_DHW = "enable_dhw"
+
+# Register map (from Spirála Modbus sheet). Slot order follows this list.
+REGISTERS: tuple[Point, ...] = (
+    _temp("tank_temp_1", 0),
+    _temp("tank_temp_2", 1),
+    _temp("dhw_tank_temp", 2),
+    # _temp("outdoor_temp", 3),  sentinel -51/-52/-53 = invalid/missing
+    _temp("supply_temp", 10),
+    _temp("return_temp", 11),
+    _setpoint("setpoint_1", 18),
+    _setpoint("setpoint_2", 19, requires=_CIRCUIT_2, flag=_HAS_CIRCUIT_2),
+    _setpoint("setpoint_dhw", 20, flag=_HAS_DHW),
+    Point("error_code", 27, group="status", enum=ERROR_ENUM, platform="sensor", icon="mdi:alert"),
+    Point("not_running_reason", 28, group="status", enum=NOT_RUNNING_ENUM, platform="sensor",
+          icon="mdi:pause-octagon"),
+    Point("io_state", 29, group="status"),
+    Point("relay_state", 30, group="status"),
+    Point("active_circuit", 31, group="status", enum=ACTIVE_CIRCUIT_ENUM, platform="sensor",
+          device_class="enum", icon="mdi:selection-ellipse-arrow-inside"),
+    Point("injector_valve_pct", 32, group="percent", unit="%"),
+    Point("cold_pump_pct", 33, group="percent", unit="%"),
+    _diff("diff_circuit_1", 44, 1, 25),
+    _diff("diff_circuit_2", 81, 0, 25, requires=_CIRCUIT_2, flag=_HAS_CIRCUIT_2),
+    _diff("diff_dhw", 52, 1, 25, flag=_HAS_DHW),
+    _diff("setpoint_circuit_1_hours_rotation", 71, 1, 125),
+    Point("thermostat_mode_1", 41, tier=POLL_TIER_SLOW, group="mode", enum=THERMOSTAT_ENUM, writable=True,
+          platform="select"),
+    Point("thermostat_mode_2", 151, tier=POLL_TIER_SLOW, group="mode", enum=THERMOSTAT_ENUM, writable=True,
+          platform="select", requires=_CIRCUIT_2, flag=_HAS_CIRCUIT_2),
+    Point("cooling_enable", 56, tier=POLL_TIER_SLOW, group="mode", writable=True, platform="switch",
+          requires=("enable_cooling", True)),
+    Point("dhw_enable", 40, tier=POLL_TIER_SLOW, group="mode", writable=True, platform="switch",
+          requires=("enable_dhw", True), flag=_HAS_DHW),
+    Point("enable_dhw", 87, tier=POLL_TIER_SLOW, group="feature"),
+    Point("has_passive_cooling", 88, tier=POLL_TIER_SLOW, group="feature"),
+    Point("has_separate_cooling_circuit", 89, tier=POLL_TIER_SLOW, group="feature"),
+    Point("has_circuit_2", 90, tier=POLL_TIER_SLOW, group="feature"),
+    # 32-bit counters, high word first; both words must come back in one read
+    Point("starts_count", 36, words=2, tier=POLL_TIER_MEDIUM, group="counter", platform="sensor",
+          icon="mdi:counter"),
+    Point("runtime_hours", 38, words=2, tier=POLL_TIER_MEDIUM, group="counter", platform="sensor",
+          unit="h", icon="mdi:clock-outline"),
+    *_bits("io_state", 29, (
+        ("io_hdo", 0, None),
+        ("io_preso_evap", 1, None),
+        ("io_preso_cond", 2, None),
+        ("io_control_1", 3, None),
+        ("io_control_2", 4, _HAS_CIRCUIT_2),
+        ("io_contactor", 5, None),
+        ("io_valve", 6, None),
+    )),
+    *_bits("relay_state", 30, (
+        ("relay_pump_circuit2", 0, _HAS_CIRCUIT_2),
+        ("relay_dhw", 1, _HAS_DHW),
+        ("relay_bivalence", 2, None),
+        ("relay_radiators", 3, None),
+        ("relay_primary_pump", 4, None),
+        # ("relay_fault", 5, None),
+        ("relay_cooling", 6, None),
+        ("relay_pump_circuit1", 7, None),
+    )),
+)
+
+# Parameters known to exist whose address is not known yet (see the
+# scan_registers service): key -> unit of the raw value
+UNLOCATED = {
+    "pump_overrun": "seconds",       # pump overrun after compressor stop
+    "anti_cycle_time": "minutes",    # min time between compressor starts
+    "pump_min_run": "seconds",       # min circulation pump runtime
+    "pump_post_defrost": "seconds",  # circulation after defrost
+    "firmware_version": "ascii",     # identity, see identity.IDENTITY_LAYOUT
+    "hardware_revision": "ascii",
+}
+
+# Per-model changes to points, by the model derived from the serial number
+# ("WW-" + first character). Only fields of existing points can change, so
+# every model has the same snapshot slots, e.g.
+#   "WW-B": {"setpoint_dhw": {"maximum": 65}},
+MODEL_OVERRIDES: dict[str, dict[str, dict[str, Any]]] = {}
+
+
+def validate(points: Iterable[Point]) -> tuple[Point, ...]:
+    """Check a schema for duplicate keys, registers out of range or overlapping, and bad bit layouts."""
+    points = tuple(points)
+    keys: dict[str, Point] = {}
+    owner: dict[int, str] = {}
+    bits: set[tuple[str, int]] = set()
+    for p in points:
+        if p.key in keys:
+            raise ValueError(f"Duplicate register point {p.key}")
+        keys[p.key] = p
+        if p.words < 1 or not 0 <= p.addr <= p.addr + p.words <= 65536:
+            raise ValueError(f"{p.key}: registers {p.addr}..{p.addr + p.words - 1} out of range")
+        if p.tier not in POLL_TIERS:
+            raise ValueError(f"{p.key}: unknown poll tier {p.tier}")
+        if p.writable and p.words != 1:
+            raise ValueError(f"{p.key}: only single registers can be written")
+        if p.platform == "number" and (p.minimum is None or p.maximum is None):
+            raise ValueError(f"{p.key}: numbers need minimum and maximum")
+        if p.word is not None:
+            continue
+        for addr in range(p.addr, p.addr + p.words):
+            if addr in owner:
+                raise ValueError(f"{p.key} overlaps {owner[addr]} at register {addr}")
+            owner[addr] = p.key
+    for p in points:
+        if p.word is None:
+            continue
+        word = keys.get(p.word)
+        if word is None or word.word is not None or word.addr != p.addr:
+            raise ValueError(f"{p.key}: bit of unknown word {p.word}")
+        if p.bit is None or not 0 <= p.bit < 16 * word.words or (p.word, p.bit) in bits:
+            raise ValueError(f"{p.key}: bad or duplicate bit {p.bit} of {p.word}")
+        bits.add((p.word, p.bit))
+    return points
+
+
+def schema_for(model: str | None) -> tuple[Point, ...]:
+    """The register map of a model: REGISTERS with its overrides applied."""
+    return _MODEL_SCHEMAS.get(model or "", REGISTERS)
+
+
+def _apply(points: tuple[Point, ...], overrides: dict[str, dict[str, Any]]) -> tuple[Point, ...]:
+    known = {p.key for p in points}
+    unknown = set(overrides) - known
+    if unknown:
+        raise ValueError(f"Overrides for unknown points {sorted(unknown)}")
+    return validate(p._replace(**overrides[p.key]) if p.key in overrides else p for p in points)
+
+
+# Validated once at import; a broken map fails loudly instead of decoding garbage
+validate(REGISTERS)
+_MODEL_SCHEMAS = {model: _apply(REGISTERS, overrides) for model, overrides in MODEL_OVERRIDES.items()}
+
+# Addresses by key for tools and the simulator
+ADDRESSES = {p.key: p.addr for p in REGISTERS}
+FEATURE_KEYS = tuple(p.key for p in REGISTERS if p.group == "feature")
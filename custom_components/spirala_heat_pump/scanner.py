@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.helpers.storage import Store
+
+from .connection import ModbusConnectionError, ModbusError
+from .const import DOMAIN, SCAN_VERSION, SCAN_MAX_CHUNK, SCAN_GAP_SECS, SCAN_WATCH_SECS
+from .identity import IDENTITY_ADDR, IDENTITY_COUNT
+from .planner import tier_by_address
+
+if TYPE_CHECKING:
+    from .coordinator import SpiralaCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+# Modbus exception code for an address the device does not implement
+_ILLEGAL_ADDRESS = 2
+_IDENTITY = range(IDENTITY_ADDR, IDENTITY_ADDR + IDENTITY_COUNT)
+# Attempts at a read answered with another exception (busy, device failure)
+_ATTEMPTS = 3
+# Registers changing in more than this share of snapshots are telemetry
+_TELEMETRY_SHARE = 0.25
+# Raw value per unit of a value typed in a mark: plain, tenths, 1/256 °C, minutes as seconds
+_SCALES = (1, 10, 256, 60)
+
+
+class RegisterScanner:
+    """Finds and characterises the holding registers the integration does not map.
+
+    `sweep` reads a range in chunks that double after a good read and are
+    bisected around illegal-address exceptions, so an isolated hole costs a
+    few requests rather than one per register of the chunk. `snapshot` reads every register found so
+    far and keeps per-register statistics, from which a register is told
+    apart as constant, configuration, counter or telemetry. `mark` is a
+    snapshot labelled with a change just made on the device panel; the
+    registers that changed with it are candidates for that parameter.
+
+    Every request waits for a quiet bus: no poll in flight, the next tick
+    far enough away and at least SCAN_GAP_SECS since the previous scanner
+    request. The results are stored per config entry and only thrown away
+    when the device reports a different serial number.
+    """
+
+    def __init__(self, coordinator: SpiralaCoordinator) -> None:
+        self.coordinator = coordinator
+        self._store: Store[dict[str, Any]] = Store(
+            coordinator.hass, SCAN_VERSION, f"{DOMAIN}.{coordinator.storage_id}.scan"
+        )
+        self._known = set(tier_by_address()) | set(_IDENTITY)
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self._last_request = 0.0
+        self._watch: asyncio.Task | None = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self.serial: str | None = None
+        self.invalid: set[int] = set()
+        # address -> first, last, min, max, changes, up, down, marked
+        self.registers: dict[int, list[int]] = {}
+        self.snapshots = 0
+        self.marks: list[dict[str, Any]] = []
+        self.requests = 0
+
+    async def async_load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        data = await self._store.async_load()
+        serial = self.coordinator.identity.serial
+        if not data:
+            self.serial = serial
+            return
+        if serial is not None and data.get("serial") not in (None, serial):
+            _LOGGER.info("Discarding register scan of %s, device is now %s", data.get("serial"), serial)
+            self.serial = serial
+            return
+        self.serial = data.get("serial") or serial
+        self.invalid = {addr for start, end in data.get("invalid", []) for addr in range(start, end)}
+        self.registers = {int(addr): stats for addr, stats in data.get("registers", {}).items()}
+        self.snapshots = data.get("snapshots", 0)
+        self.marks = data.get("marks", [])
+
+    def _data(self) -> dict[str, Any]:
+        return {
+            "serial": self.serial,
+            "invalid": _ranges(self.invalid),
+            "registers": {str(addr): stats for addr, stats in sorted(self.registers.items())},
+            "snapshots": self.snapshots,
+            "marks": self.marks,
+        }
+
+    async def async_clear(self) -> None:
+        self.stop_watch()
+        self._reset()
+        self.serial = self.coordinator.identity.serial
+        await self._store.async_remove()
+
+    async def async_sweep(self, start: int, end: int, rescan: bool = False) -> dict[str, Any]:
+        """Classify every register in [start, end) not classified yet."""
+        await self.async_load()
+        async with self._lock:
+            todo = [
+                addr for addr in range(start, end)
+                if rescan or (addr not in self.invalid and addr not in self.registers)
+            ]
+            requests = self.requests
+            found = 0
+            try:
+                for run_start, run_end in _ranges(todo):
+                    found += await self._sweep_run(run_start, run_end)
+            finally:
+                # A dropped connection partway keeps what was swept; a new sweep goes on from there
+                await self._store.async_save(self._data())
+        _LOGGER.info(
+            "Swept registers %s-%s: %s readable, %s requests", start, end - 1, found, self.requests - requests
+        )
+        return self.report()
+
+    async def _sweep_run(self, start: int, end: int) -> int:
+        max_chunk = min(SCAN_MAX_CHUNK, self.coordinator.planner.max_count)
+        chunk = max_chunk
+        addr = start
+        found = 0
+        while addr < end:
+            count = min(chunk, end - addr)
+            registers = await self._read(addr, count)
+            if registers is not None:
+                for i, value in enumerate(registers):
+                    self.invalid.discard(addr + i)
+                    self._record(addr + i, value)
+                found += count
+                addr += count
+                chunk = min(chunk * 2, max_chunk)
+            elif count > 1:
+                # Something in the chunk is not readable: bisect down to it
+                chunk = count // 2
+            else:
+                self.invalid.add(addr)
+                self.registers.pop(addr, None)
+                addr += 1
+                # Holes tend to be runs; grow again only after a good read
+                chunk = 1
+        return found
+
+    async def async_snapshot(self, marked: bool = False) -> dict[int, tuple[int, int]]:
+        """Read every readable register; returns the changes as address -> (old, new)."""
+        await self.async_load()
+        changed: dict[int, tuple[int, int]] = {}
+        async with self._lock:
+            max_chunk = min(SCAN_MAX_CHUNK, self.coordinator.planner.max_count)
+            for run_start, run_end in _ranges(self.registers):
+                for addr in range(run_start, run_end, max_chunk):
+                    count = min(max_chunk, run_end - addr)
+                    registers = await self._read(addr, count)
+                    if registers is None:
+                        continue
+                    for i, value in enumerate(registers):
+                        old = self._record(addr + i, value, marked)
+                        if old is not None:
+                            changed[addr + i] = (old, value)
+            self.snapshots += 1
+        self._store.async_delay_save(self._data, 60)
+        return changed
+
+    async def async_mark(self, label: str, value: float | None = None) -> dict[str, Any]:
+        """Snapshot after a change on the panel and keep the registers that followed it."""
+        changed = await self.async_snapshot(marked=True)
+        candidates = []
+        for addr, (old, new) in sorted(changed.items()):
+            if self._kind(self.registers[addr]) == "telemetry":
+                continue
+            entry: dict[str, Any] = {"address": addr, "old": old, "new": new}
+            if value is not None:
+                entry["scale"] = next((scale for scale in _SCALES if new == round(value * scale)), None)
+            candidates.append(entry)
+        if value is not None:
+            # Registers holding the typed value first
+            candidates.sort(key=lambda c: c["scale"] is None)
+        mark = {"t": round(time.time(), 1), "label": label, "value": value, "candidates": candidates}
+        self.marks.append(mark)
+        await self._store.async_save(self._data())
+        return mark
+
+    def start_watch(self, duration: float, interval: float = SCAN_WATCH_SECS) -> None:
+        """Snapshot every `interval` seconds for `duration` seconds in the background."""
+        self.stop_watch()
+        self._watch = self.coordinator.hass.async_create_background_task(
+            self._async_watch(duration, interval), f"{DOMAIN} register watch"
+        )
+
+    def stop_watch(self) -> None:
+        if self._watch is not None:
+            self._watch.cancel()
+            self._watch = None
+
+    async def _async_watch(self, duration: float, interval: float) -> None:
+        loop = asyncio.get_running_loop()
+        end = loop.time() + duration
+        try:
+            while loop.time() < end:
+                started = loop.time()
+                await self.async_snapshot()
+                await asyncio.sleep(max(0.0, interval - (loop.time() - started)))
+        except ModbusError as exc:
+            _LOGGER.warning("Register watch stopped: %s", exc)
+        finally:
+            if self._watch is asyncio.current_task():
+                self._watch = None
+        await self._store.async_save(self._data())
+
+    async def _read(self, address: int, count: int) -> list[int] | None:
+        """Registers, or None when the device rejects the range or does not answer."""
+        conn = self.coordinator.connection
+        for _ in range(_ATTEMPTS):
+            await self._async_wait_turn()
+            self.requests += 1
+            try:
+                rr, _ = await conn.read_holding_registers(self.coordinator.unit_id, address, count)
+            except ModbusConnectionError:
+                raise
+            except (ModbusError, asyncio.TimeoutError) as exc:
+                # Some gateways drop requests for missing registers instead of answering
+                _LOGGER.debug("Scan read at %s len %s failed: %s", address, count, exc)
+                return None
+            finally:
+                self._last_request = asyncio.get_running_loop().time()
+            if not rr.isError():
+                self.coordinator.register_cache.store(address, rr.registers, self.coordinator.clock())
+                return rr.registers
+            if getattr(rr, "exception_code", None) == _ILLEGAL_ADDRESS:
+                return None
+        return None
+
+    async def _async_wait_turn(self) -> None:
+        loop = asyncio.get_running_loop()
+        wait = SCAN_GAP_SECS - (loop.time() - self._last_request)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        await self.coordinator.async_wait_quiet()
+
+    def _record(self, address: int, value: int, marked: bool = False) -> int | None:
+        """Fold a read value in; returns the previous value when it changed."""
+        stats = self.registers.get(address)
+        if stats is None:
+            self.registers[address] = [value, value, value, value, 0, 0, 0, 0]
+            return None
+        old = stats[1]
+        if value == old:
+            return None
+        stats[1] = value
+        stats[2] = min(stats[2], value)
+        stats[3] = max(stats[3], value)
+        stats[4] += 1
+        stats[5 if value > old else 6] += 1
+        stats[7] += marked
+        return old
+
+    def _kind(self, stats: list[int]) -> str:
+        changes, up, down, marked = stats[4:8]
+        if not changes:
+            return "constant"
+        if changes == marked:
+            return "config"
+        if down == 0 and up >= 2:
+            return "counter"
+        if self.snapshots >= 4 and changes > self.snapshots * _TELEMETRY_SHARE:
+            return "telemetry"
+        return "config"
+
+    def report(self) -> dict[str, Any]:
+        """Candidate register map of the readable registers the integration does not map."""
+        labels: dict[int, list[str]] = {}
+        for mark in self.marks:
+            for candidate in mark["candidates"]:
+                labels.setdefault(candidate["address"], []).append(mark["label"])
+        candidates = [
+            {
+                "address": addr, "kind": self._kind(stats), "value": stats[1],
+                "min": stats[2], "max": stats[3], "changes": stats[4],
+                **({"marks": labels[addr]} if addr in labels else {}),
+            }
+            for addr, stats in sorted(self.registers.items())
+            if addr not in self._known
+        ]
+        return {
+            "serial": self.serial,
+            "readable": len(self.registers),
+            "mapped": len(self._known & set(self.registers)),
+            "invalid": _ranges(self.invalid),
+            "snapshots": self.snapshots,
+            "watching": self._watch is not None,
+            "requests": self.requests,
+            "candidates": candidates,
+            "marks": self.marks,
+        }
+
+    async def async_close(self) -> None:
+        self.stop_watch()
+        if self._loaded:
+            await self._store.async_save(self._data())
+
+
+def _ranges(addresses) -> list[list[int]]:
+    """Sorted addresses as [start, end) runs."""
+    runs: list[list[int]] = []
+    for addr in sorted(addresses):
+        if runs and runs[-1][1] == addr:
+            runs[-1][1] += 1
+        else:
+            runs.append([addr, addr + 1])
+    return runs
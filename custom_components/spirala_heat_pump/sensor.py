@@ -1,81 +1,237 @@
 from __future__ import annotations
 
-from homeassistant.components.sensor import SensorEntity
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Callable
 
-from homeassistant.const import UnitOfTemperature
-from homeassistant.components.sensor import SensorEntity, SensorDeviceClass
-from homeassistant.helpers.device_registry import DeviceInfo
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
-
-from .const import (
-    DOMAIN, TEMP_REGS, ACTIVE_CIRCUIT_ENUM, ERROR_ENUM, NOT_RUNNING_ENUM, MANUFACTURER, MODEL, DEVICE_NAME
+from homeassistant.const import EntityCategory, PERCENTAGE, UnitOfInformation, UnitOfTemperature, UnitOfTime
+from homeassistant.components.sensor import (
+    RestoreSensor, SensorEntity, SensorEntityDescription, SensorDeviceClass, SensorStateClass,
 )
+
+from homeassistant.core import callback
+
+from .cascade import SpiralaCascade
+from .const import DOMAIN
 from .coordinator import SpiralaCoordinator
+from .entity import SpiralaEntity, entry_coordinators, platform_points
+from .metrics import CIRCUIT_TIME_KEYS, REASON_TIME_KEYS
+from .registers import REGISTERS, Point
 
-SENSOR_DESCRIPTORS = []
-for key in TEMP_REGS.keys():
-    SENSOR_DESCRIPTORS.append({
-        "key": key,
-        "name": f"Spirala {key.replace('_', ' ').title()}",
-        "unit": UnitOfTemperature.CELSIUS,
-        "icon": "mdi:thermometer",
-        "device_class": SensorDeviceClass.TEMPERATURE,
-    })
-
-SENSOR_DESCRIPTORS += [
-    {"key": "starts_count", "name": "Spirala Starts Count", "unit": None, "icon": "mdi:counter"},
-    {"key": "runtime_hours", "name": "Spirala Runtime Hours", "unit": "h", "icon": "mdi:clock-outline"},
-    {"key": "error_code", "name": "Spirala Error", "unit": None, "icon": "mdi:alert"},
-    {"key": "not_running_reason", "name": "Spirala Not Running", "unit": None, "icon": "mdi:pause-octagon"},
-    {"key": "active_circuit", "name": "Spirala Active Circuit", "unit": None, "icon": "mdi:selection-ellipse-arrow-inside", "device_class": SensorDeviceClass.ENUM, "options": list(ACTIVE_CIRCUIT_ENUM.values())},
-    # {"key": "io_state", "name": "Spirala IO State", "unit": None, "icon": "mdi:gpio"},
-    # {"key": "relay_state", "name": "Spirala Relay State", "unit": None, "icon": "mdi:toggle-switch"},
-]
-
-class SpiralaSensor(CoordinatorEntity[SpiralaCoordinator], SensorEntity):
-    _attr_has_entity_name = True
 
-    def __init__(self, coordinator: SpiralaCoordinator, d: dict) -> None:
-        super().__init__(coordinator)
-        self._key = d["key"]
-        self._attr_unique_id = f"{coordinator.host}-{coordinator.port}-{coordinator.unit_id}-sensor-{self._key}"
-        self._attr_has_entity_name = True
-        self._attr_icon = d.get("icon")
-        self._attr_device_class = d.get("device_class")
-        self._attr_translation_key = d["key"]
-        if d.get("device_class") != SensorDeviceClass.ENUM:
-            self._attr_native_unit_of_measurement = d.get("unit")
-            # Enum sensors: no unit, but provide options
-        else:
-            self._attr_options = d.get("options", [])
-        # self._attr_native_value =
+@dataclass(frozen=True, kw_only=True)
+class SpiralaSensorDescription(SensorEntityDescription):
+    """Description of the stat, metric and cascade sensors.
+
+    One class for all three: every frozen description subclass costs a
+    few milliseconds of import time to build.
+    """
+
+    # Coordinator (stat) or cascade value
+    value: Callable[[Any], Any] | None = None
+    # Restore the last state into the metrics engine (metric)
+    restore: bool = False
+    # The unit values the aggregate follows (cascade)
+    keys: tuple[str, ...] = ()
 
 
+# Poll-path instrumentation, disabled by default
+STAT_DESCRIPTIONS = (
+    SpiralaSensorDescription(
+        key="poll_duration", native_unit_of_measurement=UnitOfTime.MILLISECONDS, icon="mdi:timer-outline",
+        state_class=SensorStateClass.MEASUREMENT, value=lambda c: c.stats.last_poll_ms),
+    SpiralaSensorDescription(
+        key="poll_registers", icon="mdi:format-list-numbered",
+        state_class=SensorStateClass.MEASUREMENT, value=lambda c: c.stats.last_poll_registers),
+    SpiralaSensorDescription(
+        key="modbus_rtt_p95", native_unit_of_measurement=UnitOfTime.MILLISECONDS, icon="mdi:timer-outline",
+        state_class=SensorStateClass.MEASUREMENT, value=lambda c: c.stats.rtt.percentile(95)),
+    SpiralaSensorDescription(
+        key="poll_overruns", icon="mdi:timer-alert-outline",
+        state_class=SensorStateClass.TOTAL_INCREASING, value=lambda c: c.stats.poll_overruns),
+    SpiralaSensorDescription(
+        key="modbus_requests", icon="mdi:swap-horizontal",
+        state_class=SensorStateClass.TOTAL_INCREASING, value=lambda c: c.stats.requests),
+    SpiralaSensorDescription(
+        key="modbus_timeouts", icon="mdi:timer-off-outline",
+        state_class=SensorStateClass.TOTAL_INCREASING, value=lambda c: c.stats.timeouts),
+    SpiralaSensorDescription(
+        key="modbus_exception_responses", icon="mdi:alert-circle-outline",
+        state_class=SensorStateClass.TOTAL_INCREASING, value=lambda c: c.stats.exception_responses),
+    SpiralaSensorDescription(
+        key="modbus_reconnects", icon="mdi:lan-connect",
+        state_class=SensorStateClass.TOTAL_INCREASING, value=lambda c: c.connection.reconnects),
+    SpiralaSensorDescription(
+        key="modbus_bytes", native_unit_of_measurement=UnitOfInformation.BYTES, icon="mdi:counter",
+        device_class=SensorDeviceClass.DATA_SIZE, state_class=SensorStateClass.TOTAL_INCREASING,
+        value=lambda c: c.stats.bytes_sent + c.stats.bytes_received),
+)
+
+# Derived from the poll stream by metrics.py
+METRIC_DESCRIPTIONS = (
+    SpiralaSensorDescription(
+        key="delta_t", native_unit_of_measurement=UnitOfTemperature.KELVIN, icon="mdi:thermometer-lines",
+        state_class=SensorStateClass.MEASUREMENT),
+    SpiralaSensorDescription(
+        key="starts_per_hour", native_unit_of_measurement="1/h", icon="mdi:counter",
+        state_class=SensorStateClass.MEASUREMENT),
+    SpiralaSensorDescription(
+        key="duty_cycle", native_unit_of_measurement=PERCENTAGE, icon="mdi:percent",
+        state_class=SensorStateClass.MEASUREMENT),
+    SpiralaSensorDescription(
+        key="avg_cycle_minutes", native_unit_of_measurement=UnitOfTime.MINUTES, icon="mdi:timer-outline",
+        device_class=SensorDeviceClass.DURATION, state_class=SensorStateClass.MEASUREMENT, restore=True),
+    *(
+        SpiralaSensorDescription(
+            key=key, native_unit_of_measurement=UnitOfTime.HOURS, icon="mdi:timer-sand",
+            device_class=SensorDeviceClass.DURATION, state_class=SensorStateClass.TOTAL_INCREASING, restore=True,
+            # One per not-running reason is a lot of entities; only the circuit times are on by default
+            entity_registry_enabled_default=key in CIRCUIT_TIME_KEYS.values())
+        for key in (*CIRCUIT_TIME_KEYS.values(), *REASON_TIME_KEYS.values())
+    ),
+)
+
+# Cascade aggregates
+CASCADE_DESCRIPTIONS = (
+    SpiralaSensorDescription(
+        key="cascade_starts_total", icon="mdi:counter", state_class=SensorStateClass.TOTAL_INCREASING,
+        keys=("starts_count",), value=lambda k: k.total("starts_count")),
+    SpiralaSensorDescription(
+        key="cascade_runtime_total", native_unit_of_measurement=UnitOfTime.HOURS, icon="mdi:clock-outline",
+        device_class=SensorDeviceClass.DURATION, state_class=SensorStateClass.TOTAL_INCREASING,
+        keys=("runtime_hours",), value=lambda k: k.total("runtime_hours")),
+    SpiralaSensorDescription(
+        key="cascade_units_running", icon="mdi:heat-pump", state_class=SensorStateClass.MEASUREMENT,
+        keys=("io_contactor",), value=lambda k: k.units_running),
+    SpiralaSensorDescription(
+        key="cascade_units_faulted", icon="mdi:alert", state_class=SensorStateClass.MEASUREMENT,
+        keys=("error_code",), value=lambda k: k.units_faulted),
+)
+
+
+def point_description(point: Point) -> SensorEntityDescription:
+    device_class = SensorDeviceClass(point.device_class) if point.device_class else None
+    return SensorEntityDescription(
+        key=point.key, translation_key=point.key, icon=point.icon, device_class=device_class,
+        # Enum sensors: no unit, but provide options
+        native_unit_of_measurement=point.unit if device_class != SensorDeviceClass.ENUM else None,
+        options=list(point.enum.values()) if device_class == SensorDeviceClass.ENUM else None,
+    )
+
+
+# Register sensors of the base map; points a model overrides get their own
+POINT_DESCRIPTIONS = {p.key: point_description(p) for p in REGISTERS if p.platform == "sensor"}
+_BASE_POINTS = {p.key: p for p in REGISTERS}
+
+
+class SpiralaSensor(SpiralaEntity, SensorEntity):
+    def __init__(self, coordinator: SpiralaCoordinator, point: Point) -> None:
+        super().__init__(coordinator, f"sensor-{point.key}", point.key, context=point.key)
+        self.entity_description = (
+            POINT_DESCRIPTIONS[point.key] if _BASE_POINTS.get(point.key) is point else point_description(point)
+        )
+
     @property
     def native_value(self):
-        val = self.coordinator.data.get(self._key)
-        if self._key == "error_code":
-            return ERROR_ENUM.get(val) if val is not None else None
-        if self._key == "not_running_reason":
-            return NOT_RUNNING_ENUM.get(val) if val is not None else None
-        if self._key == "active_circuit":
-            return ACTIVE_CIRCUIT_ENUM.get(val) if val is not None else None
-        return val
+        # Enum keys (error_code, not_running_reason, active_circuit) resolve to their text
+        return self.decoded_value
+
+class SpiralaStatSensor(SpiralaEntity, SensorEntity):
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    entity_description: SpiralaSensorDescription
+
+    def __init__(self, coordinator: SpiralaCoordinator, description: SpiralaSensorDescription) -> None:
+        # No listener context: statistics change on every poll
+        super().__init__(coordinator, f"sensor-{description.key}")
+        self.entity_description = description
+        self._value = description.value
+        self._attr_translation_key = description.key
 
     @property
-    def device_info(self) -> DeviceInfo:
-        serial = self.coordinator.data.get("serial_number") or "unknown"
-        model = self.coordinator.data.get("model") or "unknown"
-        return DeviceInfo(
-            identifiers={(DOMAIN, serial)},
-            manufacturer=MANUFACTURER,
-            model=model,
-            name=DEVICE_NAME,
-            suggested_area="Technická místnost",
-            serial_number=serial,
-        )
+    def available(self) -> bool:
+        # Keep reporting while the device is unreachable; that is when these matter
+        return True
+
+    @property
+    def native_value(self):
+        return self._value(self.coordinator)
+
+class SpiralaMetricSensor(SpiralaEntity, RestoreSensor):
+    entity_description: SpiralaSensorDescription
+
+    def __init__(self, coordinator: SpiralaCoordinator, description: SpiralaSensorDescription) -> None:
+        super().__init__(coordinator, f"sensor-{description.key}", description.key, context=description.key)
+        self.entity_description = description
+        self._attr_translation_key = description.key
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        if not self.entity_description.restore:
+            return
+        last = await self.async_get_last_sensor_data()
+        if last is not None and isinstance(last.native_value, (int, float)):
+            self.coordinator.metrics.restore(self._key, float(last.native_value))
+
+    @property
+    def native_value(self):
+        return self.coordinator.metrics.values[self._key]
+
+class SpiralaCascadeSensor(SensorEntity):
+    """Aggregate over the units of a cascade.
+
+    Follows only the unit values it is computed from and writes its state
+    at most once per loop iteration, however many units report at once.
+    """
+
+    _attr_has_entity_name = True
+    _attr_should_poll = False
+
+    def __init__(self, cascade: SpiralaCascade, description: SpiralaSensorDescription) -> None:
+        self.entity_description = description
+        self._cascade = cascade
+        self._keys = description.keys
+        self._value = description.value
+        self._write_handle: asyncio.Handle | None = None
+        self._attr_unique_id = f"cascade-{cascade.entry.entry_id}-{description.key}"
+        self._attr_translation_key = description.key
+        self._attr_device_info = cascade.device_info
+
+    async def async_added_to_hass(self) -> None:
+        for coordinator in self._cascade.coordinators:
+            for key in self._keys:
+                self.async_on_remove(coordinator.async_add_listener(self._handle_unit_update, key))
+
+    async def async_will_remove_from_hass(self) -> None:
+        if self._write_handle is not None:
+            self._write_handle.cancel()
+            self._write_handle = None
+
+    @callback
+    def _handle_unit_update(self) -> None:
+        if self._write_handle is None:
+            self._write_handle = self.hass.loop.call_soon(self._async_write)
+
+    @callback
+    def _async_write(self) -> None:
+        self._write_handle = None
+        self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        return any(c.last_update_success for c in self._cascade.coordinators)
+
+    @property
+    def native_value(self):
+        return self._value(self._cascade)
 
 async def async_setup_entry(hass, entry, async_add_entities):
-    coordinator: SpiralaCoordinator = hass.data[DOMAIN][entry.entry_id]
-    ents = [SpiralaSensor(coordinator, d) for d in SENSOR_DESCRIPTORS]
+    ents = []
+    for coordinator in entry_coordinators(hass, entry):
+        ents += [SpiralaSensor(coordinator, p) for p in platform_points(coordinator, "sensor")]
+        ents += [SpiralaStatSensor(coordinator, d) for d in STAT_DESCRIPTIONS]
+        ents += [SpiralaMetricSensor(coordinator, d) for d in METRIC_DESCRIPTIONS]
+    runtime = hass.data[DOMAIN][entry.entry_id]
+    if isinstance(runtime, SpiralaCascade):
+        ents += [SpiralaCascadeSensor(runtime, d) for d in CASCADE_DESCRIPTIONS]
     async_add_entities(ents)
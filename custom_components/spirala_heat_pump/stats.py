@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import deque
+from typing import Any
+
+# Upper bucket bounds in milliseconds; the last bucket is open-ended
+RTT_BUCKETS_MS = (5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+# Recent samples kept per histogram for percentiles
+ROLLING_SAMPLES = 200
+
+# Modbus PDU sizes; a frame adds the 7 byte MBAP header (TCP) or the unit
+# address and CRC (RTU, FRAME_BYTES_RTU)
+FRAME_BYTES_TCP = 7
+FRAME_BYTES_RTU = 3
+_READ_REQUEST_BYTES = 5
+_READ_RESPONSE_BASE = 2
+_WRITE_SINGLE_BYTES = 5
+_WRITE_MULTI_BASE = 6
+_WRITE_RESPONSE_BYTES = 5
+_EXCEPTION_BYTES = 2
+
+
+class Histogram:
+    """Fixed-bucket latency histogram plus a bounded window for percentiles."""
+
+    __slots__ = ("buckets", "count", "total", "min", "max", "recent")
+
+    def __init__(self) -> None:
+        self.buckets = [0] * (len(RTT_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: float | None = None
+        self.max: float | None = None
+        self.recent: deque[float] = deque(maxlen=ROLLING_SAMPLES)
+
+    def add(self, ms: float) -> None:
+        self.buckets[bisect_left(RTT_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+        self.recent.append(ms)
+
+    def percentile(self, pct: float) -> float | None:
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def as_dict(self) -> dict[str, Any]:
+        labels = [f"<={b}ms" for b in RTT_BUCKETS_MS] + [f">{RTT_BUCKETS_MS[-1]}ms"]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 2) if self.count else None,
+            "min_ms": self.min,
+            "max_ms": self.max,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "buckets": dict(zip(labels, self.buckets)),
+        }
+
+
+class PollStats:
+    """I/O counters and latency histograms of one coordinator."""
+
+    def __init__(self, frame_bytes: int = FRAME_BYTES_TCP) -> None:
+        self.frame_bytes = frame_bytes
+        self.batch_rtt: dict[str, Histogram] = {}
+        self.rtt = Histogram()
+        self.poll_time = Histogram()
+        self.requests = 0
+        self.timeouts = 0
+        self.exception_responses = 0
+        self.connection_errors = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.polls = 0
+        self.poll_overruns = 0
+        self.skipped_ticks = 0
+        self.merged_refreshes = 0
+        self.last_poll_ms: float | None = None
+        # Registers the last poll planned to read; it depends on the entities in use
+        self.last_poll_registers: int | None = None
+
+    def record_read(self, start: int, count: int, rtt: float, rr) -> None:
+        ms = rtt * 1000
+        label = f"{start}+{count}"
+        hist = self.batch_rtt.get(label)
+        if hist is None:
+            hist = self.batch_rtt[label] = Histogram()
+        hist.add(ms)
+        self.rtt.add(ms)
+        self.requests += 1
+        self.bytes_sent += self.frame_bytes + _READ_REQUEST_BYTES
+        if rr.isError():
+            self.exception_responses += 1
+            self.bytes_received += self.frame_bytes + _EXCEPTION_BYTES
+        else:
+            self.bytes_received += self.frame_bytes + _READ_RESPONSE_BASE + 2 * count
+
+    def record_write(self, count: int, rtt: float, rr) -> None:
+        self.rtt.add(rtt * 1000)
+        self.requests += 1
+        self.bytes_sent += self.frame_bytes + (_WRITE_SINGLE_BYTES if count == 1 else _WRITE_MULTI_BASE + 2 * count)
+        if rr.isError():
+            self.exception_responses += 1
+            self.bytes_received += self.frame_bytes + _EXCEPTION_BYTES
+        else:
+            self.bytes_received += self.frame_bytes + _WRITE_RESPONSE_BYTES
+
+    def record_poll(self, seconds: float, interval: float) -> None:
+        ms = seconds * 1000
+        self.polls += 1
+        self.last_poll_ms = round(ms, 1)
+        self.poll_time.add(ms)
+        if seconds > interval:
+            self.poll_overruns += 1
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "timeouts": self.timeouts,
+            "exception_responses": self.exception_responses,
+            "connection_errors": self.connection_errors,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "polls": self.polls,
+            "poll_overruns": self.poll_overruns,
+            "skipped_ticks": self.skipped_ticks,
+            "merged_refreshes": self.merged_refreshes,
+            "last_poll_ms": self.last_poll_ms,
+            "last_poll_registers": self.last_poll_registers,
+            "poll_time": self.poll_time.as_dict(),
+            "rtt": self.rtt.as_dict(),
+            "batch_rtt": {label: hist.as_dict() for label, hist in self.batch_rtt.items()},
+        }
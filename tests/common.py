@@ -0,0 +1,271 @@
+"""Helpers shared by the tests: a Home Assistant core, a coordinator, a fake unit, decoders."""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import os
+import socket
+import struct
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, AsyncIterator
+
+from homeassistant.core import HomeAssistant
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@contextlib.asynccontextmanager
+async def running_hass(config_dir) -> AsyncIterator[HomeAssistant]:
+    os.makedirs(os.path.join(config_dir, ".storage"), exist_ok=True)
+    hass = HomeAssistant(str(config_dir))
+    try:
+        yield hass
+    finally:
+        await hass.async_block_till_done()
+        await hass.async_stop(force=True)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Clock:
+    """The coordinator's clock, moved by hand so tiers and probes are due when the test says."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, registers: list[int] | None = None, error: bool = False) -> None:
+        self.registers = registers or []
+        self.error = error
+
+    def isError(self) -> bool:
+        return self.error
+
+    def __repr__(self) -> str:
+        return "FakeResponse(error)" if self.error else f"FakeResponse({self.registers})"
+
+
+class FakeConnection:
+    """Stands in for SpiralaConnection: a register image and the requests sent on the wire.
+
+    `requests` logs ("read", start, count), ("write", addr, [value]) and
+    ("write_multiple", start, values). Without `fc16` multi-register writes
+    are rejected; `stored` maps an address to the value the unit keeps
+    whatever is written (a clamped setpoint); reads starting at an address
+    in `fail_reads` return an exception response. While `hold` is set,
+    writes wait for it.
+    """
+
+    def __init__(self, registers: list[int]) -> None:
+        self.registers = list(registers)
+        self.requests: list[tuple[str, int, Any]] = []
+        self.fc16 = True
+        self.stored: dict[int, int] = {}
+        self.fail_reads: set[int] = set()
+        self.hold: asyncio.Event | None = None
+        # What the coordinator releases on close
+        self.host, self.port, self.refs = "fake", 0, 1
+
+    def close(self) -> None:
+        pass
+
+    async def read_holding_registers(self, unit_id: int, address: int, count: int):
+        self.requests.append(("read", address, count))
+        if address in self.fail_reads:
+            return FakeResponse(error=True), 0.001
+        return FakeResponse(self.registers[address:address + count]), 0.001
+
+    async def _store(self, address: int, values: list[int]) -> None:
+        if self.hold is not None:
+            await self.hold.wait()
+        for addr, value in enumerate(values, address):
+            self.registers[addr] = self.stored.get(addr, value)
+
+    async def write_register(self, unit_id: int, address: int, value: int):
+        self.requests.append(("write", address, [value]))
+        await self._store(address, [value])
+        return FakeResponse([value]), 0.001
+
+    async def write_registers(self, unit_id: int, address: int, values: list[int]):
+        self.requests.append(("write_multiple", address, list(values)))
+        if not self.fc16:
+            return FakeResponse(error=True), 0.001
+        await self._store(address, values)
+        return FakeResponse(), 0.001
+
+
+@contextlib.asynccontextmanager
+async def polling(config_dir, port: int = 0, connection: FakeConnection | None = None, **options):
+    """A coordinator for unit 1 at `port`, or on `connection`, with a hand-moved clock."""
+    from spirala_heat_pump import connection as connection_mod
+    from spirala_heat_pump.coordinator import SpiralaCoordinator
+
+    async with running_hass(config_dir) as hass:
+        entry = SimpleNamespace(
+            entry_id="test", options=options, data={"host": "127.0.0.1", "port": port, "unit_id": 1}
+        )
+        coordinator = SpiralaCoordinator(hass, entry)
+        coordinator.config_entry = None
+        coordinator.clock = Clock()
+        if connection is not None:
+            # The shared connection was never connected; nothing to close
+            connection_mod.async_release_connection(hass, coordinator.connection)
+            coordinator.connection = connection
+        try:
+            yield coordinator
+        finally:
+            await coordinator.async_close()
+
+
+# Reference decoders, written from the specs rather than from export.py
+
+def decode_msgpack(data: bytes) -> list[Any]:
+    """Every object in `data`, one after the other."""
+    pos = 0
+
+    def take(n: int) -> bytes:
+        nonlocal pos
+        pos += n
+        return data[pos - n:pos]
+
+    def unpack(fmt: str) -> Any:
+        return struct.unpack(fmt, take(struct.calcsize(fmt)))[0]
+
+    def read() -> Any:
+        b = take(1)[0]
+        if b <= 0x7F:
+            return b
+        if b >= 0xE0:
+            return b - 0x100
+        if 0x80 <= b <= 0x8F:
+            return {read(): read() for _ in range(b & 0x0F)}
+        if 0x90 <= b <= 0x9F:
+            return [read() for _ in range(b & 0x0F)]
+        if 0xA0 <= b <= 0xBF:
+            return take(b & 0x1F).decode()
+        fixed = {0xC0: None, 0xC2: False, 0xC3: True}
+        if b in fixed:
+            return fixed[b]
+        ints = {0xCC: ">B", 0xCD: ">H", 0xCE: ">I", 0xCF: ">Q", 0xD0: ">b", 0xD1: ">h", 0xD2: ">i",
+                0xD3: ">q", 0xCA: ">f", 0xCB: ">d"}
+        if b in ints:
+            return unpack(ints[b])
+        sizes = {0xC4: ">B", 0xC5: ">H", 0xC6: ">I", 0xD9: ">B", 0xDA: ">H", 0xDB: ">I",
+                 0xDC: ">H", 0xDD: ">I", 0xDE: ">H", 0xDF: ">I"}
+        n = unpack(sizes[b])
+        if b in (0xC4, 0xC5, 0xC6):
+            return take(n)
+        if b in (0xD9, 0xDA, 0xDB):
+            return take(n).decode()
+        if b in (0xDC, 0xDD):
+            return [read() for _ in range(n)]
+        return {read(): read() for _ in range(n)}
+
+    out = []
+    while pos < len(data):
+        out.append(read())
+    return out
+
+
+def decode_cbor(data: bytes) -> list[Any]:
+    """Every data item in `data`, one after the other (definite lengths only)."""
+    pos = 0
+
+    def take(n: int) -> bytes:
+        nonlocal pos
+        pos += n
+        return data[pos - n:pos]
+
+    def read() -> Any:
+        b = take(1)[0]
+        major, info = b >> 5, b & 0x1F
+        if major == 7:
+            if info == 27:
+                return struct.unpack(">d", take(8))[0]
+            if info == 26:
+                return struct.unpack(">f", take(4))[0]
+            return {20: False, 21: True, 22: None}[info]
+        if info < 24:
+            n = info
+        else:
+            n = int.from_bytes(take(1 << (info - 24)), "big")
+        if major == 0:
+            return n
+        if major == 1:
+            return -1 - n
+        if major == 2:
+            return take(n)
+        if major == 3:
+            return take(n).decode()
+        if major == 4:
+            return [read() for _ in range(n)]
+        if major == 5:
+            return {read(): read() for _ in range(n)}
+        raise ValueError(f"Unsupported CBOR major type {major}")
+
+    out = []
+    while pos < len(data):
+        out.append(read())
+    return out
+
+
+def _split(text: str, sep: str) -> list[str]:
+    """Split on `sep` outside quotes and backslash escapes."""
+    parts, cur, quoted, i = [], "", False, 0
+    while i < len(text):
+        ch = text[i]
+        if ch == "\\" and i + 1 < len(text):
+            cur += text[i:i + 2]
+            i += 2
+            continue
+        if ch == '"':
+            quoted = not quoted
+        if ch == sep and not quoted:
+            parts.append(cur)
+            cur = ""
+        else:
+            cur += ch
+        i += 1
+    parts.append(cur)
+    return parts
+
+
+def _unescape(text: str) -> str:
+    out, i = "", 0
+    while i < len(text):
+        if text[i] == "\\" and i + 1 < len(text):
+            i += 1
+        out += text[i]
+        i += 1
+    return out
+
+
+def decode_line(data: bytes) -> list[tuple[str, dict[str, str], dict[str, Any], int]]:
+    """(measurement, tags, fields, ns timestamp) per InfluxDB line protocol line."""
+    out = []
+    for line in data.decode().splitlines():
+        head, fields_text, ts = _split(line, " ")
+        measurement, *tag_parts = _split(head, ",")
+        tags = {_unescape(k): _unescape(v) for k, v in (_split(part, "=") for part in tag_parts)}
+        fields: dict[str, Any] = {}
+        for part in _split(fields_text, ","):
+            key, raw = part.split("=", 1)
+            if raw.startswith('"'):
+                fields[key] = _unescape(raw[1:-1])
+            elif raw in ("true", "false"):
+                fields[key] = raw == "true"
+            elif raw.endswith("i"):
+                fields[key] = int(raw[:-1])
+            else:
+                fields[key] = float(raw)
+        out.append((measurement, tags, fields, int(ts)))
+    return out
@@ -0,0 +1,12 @@
+"""Puts the integration and the tools (simulator, _pkg) on sys.path."""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "custom_components"), str(ROOT / "tools")]
+
+# The real package first, so tools/_pkg.load() imports its modules instead
+# of registering a bare package
+import spirala_heat_pump  # noqa: E402,F401
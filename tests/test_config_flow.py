@@ -0,0 +1,178 @@
+"""Config flow: single, serial and cascade entries, unit lists and units configured twice."""
+from __future__ import annotations
+
+import asyncio
+import socket
+
+import pytest
+from homeassistant import config_entries
+from homeassistant.data_entry_flow import AbortFlow, FlowResultType
+
+from common import running_hass
+from spirala_heat_pump import config_flow
+from spirala_heat_pump.config_flow import (
+    STEP_CASCADE_DATA_SCHEMA, STEP_SERIAL_DATA_SCHEMA, STEP_USER_DATA_SCHEMA, SpiralaConfigFlow, parse_units,
+)
+from spirala_heat_pump.const import DEFAULT_PORT, DEFAULT_UNIT_ID, DOMAIN, TRANSPORT_RTU_OVER_TCP, TRANSPORT_SERIAL
+
+KNOWN_HOSTS = {"10.0.0.5", "10.0.0.6", "gw.local"}
+
+
+@pytest.fixture(autouse=True)
+def _resolver(monkeypatch):
+    def gethostbyname(host: str) -> str:
+        if host not in KNOWN_HOSTS:
+            raise socket.gaierror(host)
+        return host
+
+    monkeypatch.setattr(config_flow.socket, "gethostbyname", gethostbyname)
+
+
+def test_parse_units():
+    assert parse_units("60, 61", "10.0.0.5", 502) == [["10.0.0.5", 502, 60], ["10.0.0.5", 502, 61]]
+    assert parse_units("10.0.0.5:503/60; 10.0.0.6, 7", "gw.local", 502) == [
+        ["10.0.0.5", 503, 60], ["10.0.0.6", 502, DEFAULT_UNIT_ID], ["gw.local", 502, 7],
+    ]
+    # Empty items are skipped
+    assert parse_units(" 1,, 2 ,", "gw.local", 502) == [["gw.local", 502, 1], ["gw.local", 502, 2]]
+    # Units on a serial port have port 0
+    assert parse_units("1, 2", "/dev/ttyUSB0", 0) == [["/dev/ttyUSB0", 0, 1], ["/dev/ttyUSB0", 0, 2]]
+    # The same unit written two ways is still one unit
+    assert parse_units("1, gw.local:502/2", "gw.local", 502)[1] == ["gw.local", 502, 2]
+
+
+@pytest.mark.parametrize("text, host", [
+    ("60", "10.0.0.5"),                     # one unit is not a cascade
+    ("", "10.0.0.5"),
+    ("60, 60", "10.0.0.5"),                 # the same unit twice
+    ("60, 10.0.0.5/60", "10.0.0.5"),
+    ("60, 248", "10.0.0.5"),                # unit IDs are 0..247
+    ("10.0.0.5:0/1, 2", "10.0.0.5"),        # ports are 1..65535
+    ("10.0.0.5:70000/1, 2", "10.0.0.5"),
+    ("10.0.0.5:http/1, 2", "10.0.0.5"),
+    ("10.0.0.5/x, 2", "10.0.0.5"),
+    ("1, 2", None),                         # bare unit IDs without a default host
+    ("/1, 10.0.0.5/2", None),
+])
+def test_parse_units_rejects(text, host):
+    with pytest.raises(ValueError):
+        parse_units(text, host, 502)
+
+
+def _entry(data: dict, unique_id: str) -> config_entries.ConfigEntry:
+    return config_entries.ConfigEntry(
+        version=1, minor_version=1, domain=DOMAIN, title="existing", data=data,
+        source=config_entries.SOURCE_USER, unique_id=unique_id,
+    )
+
+
+async def _flow(hass, *entries: config_entries.ConfigEntry) -> SpiralaConfigFlow:
+    if hass.config_entries is None:
+        hass.config_entries = config_entries.ConfigEntries(hass, {})
+    for entry in entries:
+        hass.config_entries._entries[entry.entry_id] = entry
+    flow = SpiralaConfigFlow()
+    flow.hass, flow.handler, flow.flow_id = hass, DOMAIN, "flow"
+    flow.context = {"source": config_entries.SOURCE_USER}
+    return flow
+
+
+def test_single_entry(tmp_path):
+    async def run():
+        async with running_hass(tmp_path) as hass:
+            flow = await _flow(hass)
+            result = await flow.async_step_user()
+            assert result["type"] == FlowResultType.MENU
+            assert result["menu_options"] == ["single", "serial", "cascade"]
+
+            result = await flow.async_step_single(STEP_USER_DATA_SCHEMA({"host": "nowhere"}))
+            assert result["type"] == FlowResultType.FORM and result["errors"] == {"host": "cannot_connect"}
+            data = STEP_USER_DATA_SCHEMA({"host": "10.0.0.5", "unit_id": 3})
+            result = await flow.async_step_single(data)
+            assert result["type"] == FlowResultType.CREATE_ENTRY
+            assert result["data"] == data and data["port"] == DEFAULT_PORT
+            assert flow.unique_id == f"10.0.0.5:{DEFAULT_PORT}:3"
+
+    asyncio.run(run())
+
+
+def test_serial_entry(tmp_path):
+    async def run():
+        device = tmp_path / "ttyUSB0"
+        async with running_hass(tmp_path) as hass:
+            flow = await _flow(hass)
+            result = await flow.async_step_serial(STEP_SERIAL_DATA_SCHEMA({"device": str(device)}))
+            assert result["type"] == FlowResultType.FORM and result["errors"] == {"device": "no_device"}
+            device.touch()
+            result = await flow.async_step_serial(STEP_SERIAL_DATA_SCHEMA({"device": str(device), "unit_id": 2}))
+            assert result["type"] == FlowResultType.CREATE_ENTRY
+            assert result["data"]["transport"] == TRANSPORT_SERIAL and result["data"]["device"] == str(device)
+            assert flow.unique_id == f"{device}:0:2"
+
+    asyncio.run(run())
+
+
+def test_cascade_entry(tmp_path):
+    async def run():
+        async with running_hass(tmp_path) as hass:
+            flow = await _flow(hass)
+            result = await flow.async_step_cascade(STEP_CASCADE_DATA_SCHEMA({"host": "10.0.0.5", "units": "60, 60"}))
+            assert result["errors"] == {"units": "invalid_units"}
+            result = await flow.async_step_cascade(STEP_CASCADE_DATA_SCHEMA({"units": "10.0.0.5/1, nowhere/2"}))
+            assert result["errors"] == {"units": "cannot_connect"}
+
+            data = STEP_CASCADE_DATA_SCHEMA({
+                "host": "10.0.0.5", "units": "61, 10.0.0.6:503/60", "transport": TRANSPORT_RTU_OVER_TCP,
+            })
+            result = await flow.async_step_cascade(data)
+            assert result["type"] == FlowResultType.CREATE_ENTRY
+            assert result["data"]["cascade"] and result["data"]["transport"] == TRANSPORT_RTU_OVER_TCP
+            assert result["data"]["units"] == [["10.0.0.5", DEFAULT_PORT, 61], ["10.0.0.6", 503, 60]]
+            assert not {"host", "port"} & result["data"].keys()
+            # The same set of units in any order is the same cascade
+            assert flow.unique_id == f"cascade:10.0.0.5:{DEFAULT_PORT}:61,10.0.0.6:503:60"
+
+            # On a serial port every unit is on the port named in `host`, which is not resolved
+            flow = await _flow(hass)
+            data = STEP_CASCADE_DATA_SCHEMA({"host": "/dev/ttyUSB0", "units": "1, 2", "transport": TRANSPORT_SERIAL})
+            result = await flow.async_step_cascade(data)
+            assert result["data"]["units"] == [["/dev/ttyUSB0", 0, 1], ["/dev/ttyUSB0", 0, 2]]
+
+    asyncio.run(run())
+
+
+def test_units_configured_in_another_entry_abort(tmp_path):
+    async def run():
+        single = _entry({"host": "10.0.0.5", "port": DEFAULT_PORT, "unit_id": 60}, f"10.0.0.5:{DEFAULT_PORT}:60")
+        serial = _entry({"transport": TRANSPORT_SERIAL, "device": "/dev/ttyUSB0", "unit_id": 1}, "/dev/ttyUSB0:0:1")
+        cascade = _entry(
+            {"cascade": True, "units": [["10.0.0.6", DEFAULT_PORT, 1], ["10.0.0.6", DEFAULT_PORT, 2]]},
+            f"cascade:10.0.0.6:{DEFAULT_PORT}:1,10.0.0.6:{DEFAULT_PORT}:2",
+        )
+        async with running_hass(tmp_path) as hass:
+            flow = await _flow(hass, single, serial, cascade)
+            # A unit of a cascade added on its own
+            with pytest.raises(AbortFlow, match="already_configured"):
+                await flow.async_step_single(STEP_USER_DATA_SCHEMA({"host": "10.0.0.6", "unit_id": 2}))
+            # A cascade taking in a single unit, or one of another cascade
+            with pytest.raises(AbortFlow, match="already_configured"):
+                await flow.async_step_cascade(STEP_CASCADE_DATA_SCHEMA({"host": "10.0.0.5", "units": "59, 60"}))
+            with pytest.raises(AbortFlow, match="already_configured"):
+                await flow.async_step_cascade(STEP_CASCADE_DATA_SCHEMA({"host": "10.0.0.6", "units": "2, 3"}))
+            # The same serial unit, single or in a cascade
+            device = tmp_path / "ttyUSB0"
+            device.touch()
+            hass.config_entries._entries.pop(serial.entry_id)
+            moved = _entry({"transport": TRANSPORT_SERIAL, "device": str(device), "unit_id": 1}, f"{device}:0:1")
+            hass.config_entries._entries[moved.entry_id] = moved
+            with pytest.raises(AbortFlow, match="already_configured"):
+                await flow.async_step_serial(STEP_SERIAL_DATA_SCHEMA({"device": str(device), "unit_id": 1}))
+            with pytest.raises(AbortFlow, match="already_configured"):
+                await flow.async_step_cascade(STEP_CASCADE_DATA_SCHEMA(
+                    {"host": str(device), "units": "1, 2", "transport": TRANSPORT_SERIAL}
+                ))
+            # Other units on the same gateways are fine
+            result = await flow.async_step_single(STEP_USER_DATA_SCHEMA({"host": "10.0.0.6", "unit_id": 3}))
+            assert result["type"] == FlowResultType.CREATE_ENTRY
+
+    asyncio.run(run())
@@ -0,0 +1,224 @@
+"""The shared Modbus connection: lazy client, units, refcounts and reconnects."""
+from __future__ import annotations
+
+import asyncio
+import subprocess
+import sys
+import threading
+
+from common import ROOT, free_port, running_hass
+from simulator import start_server
+from spirala_heat_pump import connection
+
+
+def test_package_import_leaves_out_pymodbus():
+    code = (
+        f"import sys; sys.path.insert(0, {str(ROOT / 'custom_components')!r}); "
+        "import spirala_heat_pump.sensor, spirala_heat_pump.config_flow; "
+        "print('pymodbus' in sys.modules)"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
+
+
+def test_pymodbus_is_imported_in_the_executor(monkeypatch):
+    threads = []
+    real = connection._import_pymodbus
+
+    def recording():
+        threads.append(threading.current_thread())
+        return real()
+
+    monkeypatch.setattr(connection, "_import_pymodbus", recording)
+
+    async def run():
+        port = free_port()
+        server = await start_server("127.0.0.1", port, [1])
+        conn = connection.SpiralaConnection("127.0.0.1", port)
+        assert conn.client is None
+        assert await conn.connect()
+        rr, _ = await conn.read_holding_registers(1, 0, 4)
+        assert not rr.isError()
+        conn.close()
+        await server.shutdown()
+
+    asyncio.run(run())
+    assert len(threads) == 1 and threads[0] is not threading.main_thread()
+
+
+def _images(units: list[int]) -> dict[int, list[int]]:
+    """A distinct register image per unit: unit * 1000 + address."""
+    return {unit: [unit * 1000 + addr for addr in range(200)] for unit in units}
+
+
+def test_units_share_one_connection_in_isolation():
+    async def run():
+        port = free_port()
+        server = await start_server("127.0.0.1", port, [1, 2, 3], images=_images([1, 2, 3]))
+        conn = connection.SpiralaConnection("127.0.0.1", port)
+        base, _ = await conn.read_holding_registers(1, 10, 5)
+        for unit in (2, 3):
+            rr, _ = await conn.read_holding_registers(unit, 10, 5)
+            assert rr.registers == [v + (unit - 1) * 1000 for v in base.registers]
+        rr, _ = await conn.write_register(2, 10, 999)
+        assert not rr.isError()
+        after = {unit: (await conn.read_holding_registers(unit, 10, 1))[0].registers[0] for unit in (1, 2, 3)}
+        assert after == {1: base.registers[0], 2: 999, 3: base.registers[0] + 2000}
+        # A unit that is not on the bus fails without disturbing the others
+        rr, _ = await conn.read_holding_registers(4, 10, 1)
+        assert rr.isError()
+        rr, _ = await conn.read_holding_registers(3, 10, 1)
+        assert rr.registers == [after[3]]
+        assert conn.reconnects == 0
+        conn.close()
+        await server.shutdown()
+
+    asyncio.run(run())
+
+
+def test_units_are_served_round_robin():
+    from simulator import SimulatedUnit
+
+    order: list[int] = []
+
+    class Recording(SimulatedUnit):
+        def __init__(self, unit: int) -> None:
+            super().__init__()
+            self.unit = unit
+
+        async def action(self, *args):
+            order.append(self.unit)
+            return await super().action(*args)
+
+    async def run():
+        port = free_port()
+        server = await start_server("127.0.0.1", port, [1, 2, 3], units={u: Recording(u) for u in (1, 2, 3)})
+        conn = connection.SpiralaConnection("127.0.0.1", port)
+        assert await conn.connect()
+        # Unit 1 floods the queue first; 2 and 3 still get every other turn
+        reads = [conn.read_holding_registers(1, 0, 2) for _ in range(6)]
+        reads += [conn.read_holding_registers(unit, 0, 2) for unit in (2, 3) for _ in range(2)]
+        results = await asyncio.gather(*reads)
+        assert not any(rr.isError() for rr, _ in results)
+        conn.close()
+        await server.shutdown()
+
+    asyncio.run(run())
+    assert order == [1, 2, 3, 1, 2, 3, 1, 1, 1, 1]
+
+
+def test_release_keeps_the_connection_until_the_last_user(tmp_path):
+    from spirala_heat_pump.const import DATA_CONNECTIONS, DOMAIN
+
+    async def run():
+        port = free_port()
+        server = await start_server("127.0.0.1", port, [1, 2])
+        async with running_hass(tmp_path) as hass:
+            await _share(hass, port)
+        await server.shutdown()
+
+    async def _share(hass, port):
+        first = connection.async_acquire_connection(hass, "127.0.0.1", port)
+        second = connection.async_acquire_connection(hass, "127.0.0.1", port)
+        assert first is second and first.refs == 2
+        first.add_unit(1)
+        second.add_unit(2)
+        await first.read_holding_registers(1, 0, 1)
+        client = first.client
+        connection.async_release_connection(hass, first)
+        # The other entry keeps the same, still open client
+        assert second.refs == 1 and second.connected and second.client is client
+        rr, _ = await second.read_holding_registers(2, 0, 1)
+        assert not rr.isError() and second.reconnects == 0
+        assert hass.data[DOMAIN][DATA_CONNECTIONS] == {("127.0.0.1", port): second}
+        connection.async_release_connection(hass, second)
+        assert not client.connected and not second.connected
+        assert hass.data[DOMAIN][DATA_CONNECTIONS] == {}
+
+    asyncio.run(run())
+
+
+def test_reconnect_backs_off_then_recovers(monkeypatch):
+    monkeypatch.setattr(connection, "RECONNECT_MIN_SECS", 0.3)
+    monkeypatch.setattr(connection, "RECONNECT_MAX_SECS", 0.3)
+
+    async def run():
+        port = free_port()
+        conn = connection.SpiralaConnection("127.0.0.1", port)
+        try:
+            await conn.read_holding_registers(1, 0, 1)
+        except connection.ModbusConnectionError:
+            pass
+        else:
+            raise AssertionError("read without a server succeeded")
+        assert conn.state == "backoff" and conn.backing_off
+        attempts = 0
+        connect = conn.client.connect
+
+        async def counting_connect():
+            nonlocal attempts
+            attempts += 1
+            return await connect()
+
+        conn.client.connect = counting_connect
+        # While backing off, requests fail fast without touching the network
+        for _ in range(5):
+            try:
+                await conn.read_holding_registers(1, 0, 1)
+            except connection.ModbusConnectionError:
+                continue
+            raise AssertionError("read while backing off succeeded")
+        assert attempts == 0
+        server = await start_server("127.0.0.1", port, [1])
+        await asyncio.sleep(0.35)
+        rr, _ = await conn.read_holding_registers(1, 0, 1)
+        assert not rr.isError()
+        assert attempts == 1 and conn.state == "connected" and conn.reconnects == 1
+        conn.close()
+        await server.shutdown()
+
+    asyncio.run(run())
+
+
+def test_request_cancelled_during_connect_leaves_the_worker_running(monkeypatch):
+    monkeypatch.setattr(connection, "RECONNECT_MIN_SECS", 0.05)
+    monkeypatch.setattr(connection, "RECONNECT_MAX_SECS", 0.05)
+
+    async def run():
+        port = free_port()
+        server = await start_server("127.0.0.1", port, [1, 2])
+        conn = connection.SpiralaConnection("127.0.0.1", port)
+        await conn._async_create_client()
+        connect = conn.client.connect
+        gate = asyncio.Event()
+        calls = 0
+
+        async def slow_connect():
+            # The first connect fails after the caller has given up
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                await gate.wait()
+                return False
+            return await connect()
+
+        conn.client.connect = slow_connect
+        first = asyncio.ensure_future(conn.read_holding_registers(1, 0, 1))
+        second = asyncio.ensure_future(conn.read_holding_registers(2, 0, 1))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        await asyncio.sleep(0)
+        gate.set()
+        # The next queued request fails on the backoff, not on a dead worker
+        try:
+            await asyncio.wait_for(second, 2)
+        except connection.ModbusConnectionError:
+            pass
+        assert not conn._worker.done()
+        await asyncio.sleep(0.1)
+        rr, _ = await asyncio.wait_for(conn.read_holding_registers(2, 0, 1), 2)
+        assert not rr.isError() and first.cancelled()
+        conn.close()
+        await server.shutdown()
+
+    asyncio.run(run())
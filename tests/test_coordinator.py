@@ -0,0 +1,207 @@
+"""Polling through failures: failed ranges, unavailability and probing, against the simulator."""
+from __future__ import annotations
+
+import asyncio
+
+from pymodbus.constants import ExcCodes
+
+from common import free_port, polling
+from simulator import SimulatedUnit, start_gateway_proxy, start_server
+from spirala_heat_pump import connection, coordinator as coordinator_mod
+from spirala_heat_pump.const import (
+    DEFAULT_FAILED_POLLS_UNAVAILABLE, HISTORY_KEYS, JOURNAL_KEYS, POLL_TIER_FAST, STATISTICS_MEAN_KEYS,
+)
+from spirala_heat_pump.metrics import INPUT_KEYS as METRIC_INPUT_KEYS
+from spirala_heat_pump.planner import INTERNAL_KEYS
+
+UNAVAILABLE_AFTER = DEFAULT_FAILED_POLLS_UNAVAILABLE
+
+
+class FaultyUnit(SimulatedUnit):
+    """Answers reads starting at an address in `fail_at`, or every read while `down`, with an exception."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.fail_at: set[int] = set()
+        self.down = False
+
+    async def action(self, func_code, start_address, address, count, registers, values):
+        await super().action(func_code, start_address, address, count, registers, values)
+        if self.down or address in self.fail_at:
+            return ExcCodes.DEVICE_FAILURE
+        return None
+
+
+def range_slots(coordinator, start: int, count: int) -> list[int]:
+    index = coordinator.decoder.index
+    return [index[p.key] for p in coordinator.points.values() if start <= p.addr < start + count]
+
+
+def test_failed_range_keeps_its_values(tmp_path):
+    async def run():
+        port = free_port()
+        unit = FaultyUnit()
+        server = await start_server("127.0.0.1", port, [1], units={1: unit})
+        async with polling(tmp_path, port) as coordinator:
+            await coordinator.async_refresh()
+            assert coordinator.last_update_success
+            fast = coordinator.planner.plan_for([POLL_TIER_FAST])
+            assert len(fast) > 1
+            start, count = fast[-1]
+            failed = range_slots(coordinator, start, count)
+            good = range_slots(coordinator, *fast[0])
+            before = list(coordinator.data.values)
+            updated = list(coordinator.slot_updated)
+            assert all(updated[slot] is not None for slot in failed)
+
+            unit.fail_at = {start}
+            await asyncio.sleep(0.01)
+            await coordinator.async_refresh()
+            # One bad range is not a failed poll: still available, its values kept
+            assert coordinator.last_update_success
+            assert coordinator._failed_polls == 0
+            assert [coordinator.data.values[slot] for slot in failed] == [before[slot] for slot in failed]
+            assert [coordinator.slot_updated[slot] for slot in failed] == [updated[slot] for slot in failed]
+            assert all(coordinator.slot_updated[slot] > updated[slot] for slot in good)
+        await server.shutdown()
+
+    asyncio.run(run())
+
+
+def test_unavailable_after_failed_polls_and_back_after_one_probe(tmp_path, monkeypatch):
+    monkeypatch.setattr(coordinator_mod, "PROBE_MIN_SECS", 10.0)
+    monkeypatch.setattr(coordinator_mod, "PROBE_MAX_SECS", 30.0)
+
+    async def run():
+        port = free_port()
+        unit = FaultyUnit()
+        server = await start_server("127.0.0.1", port, [1], units={1: unit})
+        async with polling(tmp_path, port) as coordinator:
+            clock = coordinator.clock
+            await coordinator.async_refresh()
+            values = list(coordinator.data.values)
+
+            unit.down = True
+            for poll in range(1, UNAVAILABLE_AFTER + 1):
+                clock.now += 1
+                await coordinator.async_refresh()
+                # Available with the last values until the limit is reached
+                assert coordinator.last_update_success is (poll < UNAVAILABLE_AFTER)
+            assert coordinator.data.values == values
+
+            # Open: ticks before the probe is due do not touch the bus
+            requests = unit.requests
+            clock.now += 9
+            await coordinator.async_refresh()
+            assert unit.requests == requests and not coordinator.last_update_success
+
+            # A failed probe is a single read, and doubles the wait for the next
+            clock.now += 1
+            await coordinator.async_refresh()
+            assert unit.requests == requests + 1
+            clock.now += 19
+            await coordinator.async_refresh()
+            assert unit.requests == requests + 1
+            clock.now += 1
+            await coordinator.async_refresh()
+            assert unit.requests == requests + 2
+            # Capped at the max
+            clock.now += 30
+            await coordinator.async_refresh()
+            assert unit.requests == requests + 3
+
+            # One good probe read brings the unit back
+            unit.down = False
+            clock.now += 30
+            await coordinator.async_refresh()
+            assert coordinator.last_update_success and coordinator._failed_polls == 0
+            assert unit.requests == requests + 4
+            # The next poll reads the whole plan again
+            clock.now += 1
+            requests = unit.requests
+            await coordinator.async_refresh()
+            assert unit.requests - requests >= len(coordinator.planner.plan_for([POLL_TIER_FAST]))
+        await server.shutdown()
+
+    asyncio.run(run())
+
+
+def test_dropped_connections_through_a_gateway(tmp_path, monkeypatch):
+    monkeypatch.setattr(connection, "RECONNECT_MIN_SECS", 0.05)
+    monkeypatch.setattr(connection, "RECONNECT_MAX_SECS", 0.05)
+
+    async def run():
+        port, gateway_port = free_port(), free_port()
+        server = await start_server("127.0.0.1", port, [1])
+        gateway = await start_gateway_proxy(gateway_port, port)
+        async with polling(tmp_path, gateway_port) as coordinator:
+            clock = coordinator.clock
+            coordinator.connection.timeout = 0.2
+            await coordinator.async_refresh()
+            values = list(coordinator.data.values)
+
+            # The gateway now drops every request; closing the listener leaves
+            # the open connection, so the client drops it as a restart would
+            gateway.close()
+            await gateway.wait_closed()
+            gateway = await start_gateway_proxy(gateway_port, port, drop_rate=1.0)
+            coordinator.connection.client.close()
+            for poll in range(1, UNAVAILABLE_AFTER + 1):
+                clock.now += 1
+                await asyncio.sleep(0.1)
+                await coordinator.async_refresh()
+                assert coordinator.last_update_success is (poll < UNAVAILABLE_AFTER)
+            assert coordinator.data.values == values
+            # Every read was sent and lost with its connection
+            stats = coordinator.stats
+            assert stats.timeouts + stats.connection_errors >= UNAVAILABLE_AFTER
+            assert coordinator.connection.reconnects >= UNAVAILABLE_AFTER
+            reconnects = coordinator.connection.reconnects
+
+            gateway.close()
+            await gateway.wait_closed()
+            gateway = await start_gateway_proxy(gateway_port, port)
+            clock.now += coordinator_mod.PROBE_MIN_SECS
+            await asyncio.sleep(0.1)
+            await coordinator.async_refresh()
+            assert coordinator.last_update_success and coordinator._failed_polls == 0
+            assert coordinator.connection.reconnects == reconnects + 1
+        gateway.close()
+        await server.shutdown()
+
+    asyncio.run(run())
+
+
+def test_internal_keys_follow_the_consumers_that_are_on(tmp_path):
+    async def run():
+        port = free_port()
+        server = await start_server("127.0.0.1", port, [1])
+        async with polling(tmp_path, port, enable_history=False, enable_journal=False) as coordinator:
+            await coordinator.async_refresh()
+            consumers = {*HISTORY_KEYS, *JOURNAL_KEYS, *STATISTICS_MEAN_KEYS, *METRIC_INPUT_KEYS}
+            key = next(
+                k for k, p in coordinator.points.items()
+                if p.tier == POLL_TIER_FAST and k not in consumers | INTERNAL_KEYS
+            )
+            unsub = coordinator.async_add_listener(lambda: None, key)
+            await coordinator.async_refresh()
+            # Without history, journal, recorder or metric sensors only the entity's key is added
+            assert not coordinator.long_term.enabled
+            assert coordinator.polled_keys == (INTERNAL_KEYS | {key}) & coordinator.points.keys()
+            # A metric sensor brings in the metric inputs
+            unsub_metric = coordinator.async_add_listener(lambda: None, "delta_t")
+            await coordinator.async_refresh()
+            assert set(METRIC_INPUT_KEYS) <= coordinator.polled_keys
+            unsub_metric()
+            unsub()
+            await coordinator.async_refresh()
+            assert coordinator.polled_keys == INTERNAL_KEYS & coordinator.points.keys()
+            fast_off = sum(count for _, count in coordinator.planner.plan_for([POLL_TIER_FAST]))
+        async with polling(tmp_path, port) as coordinator:
+            coordinator.async_add_listener(lambda: None, "delta_t")
+            await coordinator.async_refresh()
+            assert {*HISTORY_KEYS, *JOURNAL_KEYS} <= coordinator.polled_keys
+            assert sum(count for _, count in coordinator.planner.plan_for([POLL_TIER_FAST])) > fast_off
+        await server.shutdown()
+
+    asyncio.run(run())
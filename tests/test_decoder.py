@@ -0,0 +1,121 @@
+"""Decoding reads into snapshot slots: scale, sign, enums, bits, two-register values and partial reads."""
+from __future__ import annotations
+
+import asyncio
+
+from common import FakeConnection, polling
+from simulator import initial_registers
+from spirala_heat_pump.const import POLL_TIER_FAST, POLL_TIER_SLOW
+from spirala_heat_pump.decoder import ENUMS, EXTRA_KEYS, DecodePlan
+from spirala_heat_pump.registers import REGISTERS, Point
+
+POINTS = (
+    Point("temp", 10, scale=0.1, signed=True),
+    Point("level", 11, scale=0.5),
+    Point("mode", 12, enum={0: "off", 1: "heat", 2: "cool"}),
+    Point("counter", 13, words=2),
+    Point("offset", 15, words=2, signed=True),
+    Point("status", 17),
+    Point("status_pump", 17, word="status", bit=0),
+    Point("status_alarm", 17, word="status", bit=15),
+)
+
+
+def decoded(plan: DecodePlan, start: int, registers: list[int], values=None) -> dict:
+    snapshot = plan.new_snapshot()
+    if values is not None:
+        snapshot.values[:] = values
+    plan.decode(start, registers, snapshot.values)
+    return snapshot.as_dict()
+
+
+def test_scale_sign_and_enum():
+    plan = DecodePlan(POINTS)
+    values = decoded(plan, 10, [235, 7, 2])
+    assert values["temp"] == 23.5 and values["level"] == 3.5
+    # Enums stay raw in the snapshot; entities look the label up
+    assert values["mode"] == 2 and POINTS[2].enum[values["mode"]] == "cool"
+    # Two's complement only where the point is signed
+    values = decoded(plan, 10, [0xFFF6, 0xFFFF])
+    assert values["temp"] == -1.0
+    assert values["level"] == 0xFFFF * 0.5
+    # Unscaled values stay ints
+    assert isinstance(decoded(plan, 12, [1])["mode"], int)
+    assert ENUMS["active_circuit"] == next(p.enum for p in REGISTERS if p.key == "active_circuit")
+
+
+def test_values_spanning_two_registers():
+    plan = DecodePlan(POINTS)
+    # High word first
+    values = decoded(plan, 13, [0x0001, 0x0002, 0xFFFF, 0xFFFE])
+    assert values["counter"] == 0x10002
+    assert values["offset"] == -2
+    values = decoded(plan, 13, [0xFFFF, 0xFFFF, 0x7FFF, 0xFFFF])
+    assert values["counter"] == 0xFFFFFFFF
+    assert values["offset"] == 0x7FFFFFFF
+
+
+def test_bits_of_a_word():
+    plan = DecodePlan(POINTS)
+    values = decoded(plan, 17, [0x8000])
+    assert values["status"] == 0x8000
+    assert values["status_pump"] is False and values["status_alarm"] is True
+    values = decoded(plan, 17, [1])
+    assert values["status_pump"] is True and values["status_alarm"] is False
+
+
+def test_only_points_inside_the_read_are_decoded():
+    plan = DecodePlan(POINTS)
+    before = [object()] * len(plan.index)
+    # Starts in the middle of `counter` and ends in the middle of `offset`
+    values = decoded(plan, 14, [1, 2], before)
+    assert all(values[key] is before[plan.index[key]] for key in plan.index)
+    values = decoded(plan, 11, [4, 1, 0, 9], before)
+    assert values["level"] == 2.0 and values["mode"] == 1 and values["counter"] == 9
+    assert values["temp"] is before[0] and values["offset"] is before[plan.index["offset"]]
+    # One op list per (start, count), compiled once
+    assert plan.ops_for(11, 4) is plan.ops_for(11, 4)
+    assert [op[0] for op in plan.ops_for(11, 4)] == [1, 2, 3]
+    assert plan.ops_for(100, 10) == ()
+
+
+def test_snapshot():
+    plan = DecodePlan(POINTS)
+    snapshot = plan.new_snapshot()
+    # Extra values after the points, in a fixed order
+    assert list(snapshot) == [p.key for p in POINTS] + list(EXTRA_KEYS)
+    assert snapshot.as_dict() == dict.fromkeys(snapshot)
+    snapshot.values[plan.index["model"]] = "WW-A"
+    assert snapshot.get("model") == "WW-A" and snapshot[plan.index["model"]] == "WW-A"
+    assert snapshot.get("no_such_key", 5) == 5
+    # Every snapshot of a plan shares its index
+    assert plan.new_snapshot().index is snapshot.index
+
+
+def test_slots_outside_the_due_tiers_keep_their_values(tmp_path):
+    async def run():
+        fake = FakeConnection(initial_registers())
+        async with polling(tmp_path, connection=fake) as coordinator:
+            await coordinator.async_refresh()
+            points = coordinator.points.values()
+            fast = [p for p in points if p.tier == POLL_TIER_FAST and p.word is None and p.scale == 1]
+            slow = [p for p in points if p.tier == POLL_TIER_SLOW and p.word is None and p.scale == 1]
+            assert fast and slow
+            index = coordinator.decoder.index
+            before = {p.key: coordinator.data.values[index[p.key]] for p in slow}
+            updated = {p.key: coordinator.slot_updated[index[p.key]] for p in slow}
+            for p in fast + slow:
+                fake.registers[p.addr] += 1
+
+            coordinator.clock.now += 1
+            await coordinator.async_refresh()
+            # Only the fast tier was read; the slow slots keep their value and their age
+            assert all(coordinator.data.values[index[p.key]] == fake.registers[p.addr] for p in fast)
+            assert {p.key: coordinator.data.values[index[p.key]] for p in slow} == before
+            assert {p.key: coordinator.slot_updated[index[p.key]] for p in slow} == updated
+
+            coordinator.clock.now += coordinator.tier_secs[POLL_TIER_SLOW]
+            await coordinator.async_refresh()
+            assert all(coordinator.data.values[index[p.key]] == fake.registers[p.addr] for p in slow)
+
+    asyncio.run(run())
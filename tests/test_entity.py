@@ -0,0 +1,85 @@
+"""Which points get entities: entry options (`requires`) and the unit's feature flags (`flag`)."""
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+from spirala_heat_pump.decoder import DecodePlan
+from spirala_heat_pump.entity import platform_points
+from spirala_heat_pump.registers import REGISTERS
+
+PLATFORMS = ("binary_sensor", "number", "select", "sensor", "switch")
+# Points behind an option or a flag
+GATED = {
+    "setpoint_2", "diff_circuit_2", "thermostat_mode_2", "io_control_2", "relay_pump_circuit2",
+    "setpoint_dhw", "diff_dhw", "dhw_enable", "relay_dhw", "cooling_enable",
+}
+# The controls of circuit 2 need the option as well, its status bits only the flag
+CIRCUIT_2_BITS = {"io_control_2", "relay_pump_circuit2"}
+CIRCUIT_2 = {"setpoint_2", "diff_circuit_2", "thermostat_mode_2"} | CIRCUIT_2_BITS
+DHW = {"setpoint_dhw", "diff_dhw", "dhw_enable", "relay_dhw"}
+
+
+def coordinator(options: dict, flags: dict | None, data: dict | None = None) -> SimpleNamespace:
+    """What platform_points looks at; `flags` None before the first poll."""
+    snapshot = None
+    if flags is not None:
+        plan = DecodePlan()
+        snapshot = plan.new_snapshot()
+        for key, value in flags.items():
+            snapshot.values[plan.index[key]] = value
+    entry = SimpleNamespace(data={"host": "10.0.0.5", **(data or {})}, options=options)
+    return SimpleNamespace(entry=entry, data=snapshot, points={p.key: p for p in REGISTERS})
+
+
+def created(coordinator: SimpleNamespace) -> dict[str, set[str]]:
+    return {platform: {p.key for p in platform_points(coordinator, platform)} for platform in PLATFORMS}
+
+
+def gated(coordinator: SimpleNamespace) -> set[str]:
+    return set().union(*created(coordinator).values()) & GATED
+
+
+@pytest.mark.parametrize("options, flags, expected", [
+    # The circuit 2 option is off by default
+    ({}, {"has_circuit_2": 1, "enable_dhw": 1}, DHW | CIRCUIT_2_BITS | {"cooling_enable"}),
+    ({"has_circuit_2": True}, {"has_circuit_2": 1, "enable_dhw": 1}, GATED),
+    ({"has_circuit_2": True}, {"has_circuit_2": 0, "enable_dhw": 1}, DHW | {"cooling_enable"}),
+    ({"has_circuit_2": False}, {"has_circuit_2": 1, "enable_dhw": 0}, CIRCUIT_2_BITS | {"cooling_enable"}),
+    # The DHW option only hides the switch; the unit's flag hides every DHW point
+    ({"enable_dhw": False}, {"has_circuit_2": 0, "enable_dhw": 1}, DHW - {"dhw_enable"} | {"cooling_enable"}),
+    ({"enable_dhw": True}, {"has_circuit_2": 0, "enable_dhw": 0}, {"cooling_enable"}),
+    ({"enable_dhw": False}, {"has_circuit_2": 0, "enable_dhw": 0}, {"cooling_enable"}),
+    ({"enable_cooling": False}, {"has_circuit_2": 0, "enable_dhw": 1}, DHW),
+    ({"enable_cooling": False, "enable_dhw": False, "has_circuit_2": True}, {"has_circuit_2": 1, "enable_dhw": 0},
+     CIRCUIT_2),
+    # Unknown flags count as off
+    ({"has_circuit_2": True}, {}, {"cooling_enable"}),
+    # Before the first poll only points without a flag
+    ({"has_circuit_2": True}, None, {"cooling_enable"}),
+])
+def test_gated_points(options, flags, expected):
+    assert gated(coordinator(options, flags)) == expected
+
+
+def test_points_by_platform():
+    points = created(coordinator({"has_circuit_2": True}, {"has_circuit_2": 1, "enable_dhw": 1}))
+    assert points["number"] >= {"setpoint_1", "setpoint_2", "setpoint_dhw", "diff_circuit_2", "diff_dhw"}
+    assert points["switch"] == {"cooling_enable", "dhw_enable"}
+    assert points["select"] == {"thermostat_mode_1", "thermostat_mode_2"}
+    assert {"io_control_2", "relay_pump_circuit2", "relay_dhw"} <= points["binary_sensor"]
+    # Every point with a platform gets exactly one entity, on that platform
+    assert sum(map(len, points.values())) == sum(1 for p in REGISTERS if p.platform)
+    # Points without an option or flag do not depend on either
+    ungated = {platform: keys - GATED for platform, keys in points.items()}
+    assert {platform: keys - GATED for platform, keys in created(coordinator({}, None)).items()} == ungated
+
+
+def test_options_override_entry_data():
+    flags = {"has_circuit_2": 1, "enable_dhw": 1}
+    assert "dhw_enable" not in gated(coordinator({}, flags, data={"enable_dhw": False}))
+    assert "dhw_enable" in gated(coordinator({"enable_dhw": True}, flags, data={"enable_dhw": False}))
+    assert CIRCUIT_2 <= gated(coordinator({}, flags, data={"has_circuit_2": True}))
+    overridden = gated(coordinator({"has_circuit_2": False}, flags, data={"has_circuit_2": True}))
+    assert overridden & CIRCUIT_2 == CIRCUIT_2_BITS
@@ -0,0 +1,239 @@
+"""Snapshot export: every format decoded back, every sink, overflow and close."""
+from __future__ import annotations
+
+import asyncio
+import sys
+import types
+
+import pytest
+
+from common import decode_cbor, decode_line, decode_msgpack, free_port, running_hass
+from spirala_heat_pump import export
+from spirala_heat_pump.const import EXPORT_BATCH_MAX, EXPORT_MEASUREMENT, EXPORT_QUEUE_MAX
+
+KEYS = ["flow_temp", "error_code", "compressor", "label", "starts_count"]
+TAGS = {"host": "10.0.0.5", "port": 502, "unit": 1, "site": "a b,c=d"}
+POLLS = [
+    (1_700_000_000.25, 0.0123, 0b00101, [35.5, 0, True, "ok", 12345]),
+    (1_700_000_010.5, 0.5, 0b11010, [None, -3, False, 'say "hi"', 70000]),
+    (1_700_000_020.75, 1.25, 0, [-12.25, -40000, None, None, 2**40]),
+]
+
+
+def expected_rows(polls=POLLS) -> list[tuple]:
+    """Records as SnapshotExporter.submit queues them."""
+    return [(t, round(secs * 1000, 1), mask.to_bytes(1, "little"), values) for t, secs, mask, values in polls]
+
+
+def decode(fmt: str, payloads: list[bytes]) -> list[tuple]:
+    """(time, poll ms, mask, values) of every record in the payloads, in order."""
+    rows = []
+    for payload in payloads:
+        if fmt == "line":
+            for measurement, tags, fields, ns in decode_line(payload):
+                assert measurement == EXPORT_MEASUREMENT
+                assert tags == {k: str(v) for k, v in TAGS.items()}
+                values = [fields.get(key) for key in KEYS]
+                rows.append((ns / 1e9, fields["poll_ms"], bytes.fromhex(fields["changed"]), values))
+            continue
+        (batch,) = (decode_msgpack if fmt == "msgpack" else decode_cbor)(payload)
+        assert batch["tags"] == TAGS
+        assert batch["keys"] == KEYS
+        rows += [tuple(row) for row in batch["rows"]]
+    return rows
+
+
+def assert_rows(fmt: str, got: list[tuple], want: list[tuple]) -> None:
+    assert len(got) == len(want)
+    for (t, ms, mask, values), (wt, wms, wmask, wvalues) in zip(got, want):
+        # Line protocol carries nanoseconds as an integer
+        assert t == pytest.approx(wt, abs=1e-6) if fmt == "line" else t == wt
+        assert (ms, mask, values) == (wms, wmask, wvalues)
+
+
+@pytest.mark.parametrize("fmt", export.EXPORT_FORMATS)
+def test_encode_round_trip(fmt):
+    exporter = export.SnapshotExporter(None, None, fmt, KEYS, TAGS)
+    assert_rows(fmt, decode(fmt, [exporter.encode(expected_rows())]), expected_rows())
+
+
+def test_line_leaves_out_missing_poll_time():
+    (_, _, fields, _), = decode_line(export.encode_line({}, ["a"], [(1.0, None, b"\x01", [1])]))
+    assert fields == {"changed": "01", "a": 1}
+
+
+class RecordingSink:
+    """Keeps every payload; optionally slow or failing."""
+
+    def __init__(self, delay: float = 0.0, failures: int = 0) -> None:
+        self.payloads: list[bytes] = []
+        self.delay = delay
+        self.failures = failures
+        self.closed = False
+
+    async def async_send(self, payload: bytes) -> None:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise OSError("sink down")
+        self.payloads.append(payload)
+
+    async def async_close(self) -> None:
+        self.closed = True
+
+
+def submit_all(exporter: export.SnapshotExporter, polls=POLLS) -> None:
+    for t, secs, mask, values in polls:
+        exporter.submit(t, secs, mask, values)
+
+
+async def _export_to(hass, target: str, fmt: str) -> None:
+    exporter = export.SnapshotExporter(hass, export.make_sink(hass, target), fmt, KEYS, TAGS)
+    submit_all(exporter)
+    await exporter.async_close()
+    assert exporter.stats["sent"] == len(POLLS)
+
+
+@pytest.mark.parametrize("fmt", export.EXPORT_FORMATS)
+def test_udp_sink(tmp_path, fmt):
+    async def run():
+        received: list[bytes] = []
+
+        class Receiver(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                received.append(data)
+
+        port = free_port()
+        transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            Receiver, local_addr=("127.0.0.1", port)
+        )
+        async with running_hass(tmp_path) as hass:
+            await _export_to(hass, f"udp://127.0.0.1:{port}", fmt)
+            await asyncio.sleep(0.1)
+        transport.close()
+        assert_rows(fmt, decode(fmt, received), expected_rows())
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("fmt", export.EXPORT_FORMATS)
+def test_unix_sink(tmp_path, fmt):
+    async def run():
+        received = bytearray()
+        done = asyncio.Event()
+
+        async def handle(reader, writer):
+            while data := await reader.read(65536):
+                received.extend(data)
+            done.set()
+
+        path = str(tmp_path / "export.sock")
+        server = await asyncio.start_unix_server(handle, path)
+        async with running_hass(tmp_path) as hass:
+            await _export_to(hass, f"unix://{path}", fmt)
+            await asyncio.wait_for(done.wait(), 5)
+        server.close()
+        assert_rows(fmt, decode(fmt, [bytes(received)]), expected_rows())
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("fmt", export.EXPORT_FORMATS)
+def test_file_sink(tmp_path, fmt):
+    async def run():
+        path = tmp_path / "export.bin"
+        async with running_hass(tmp_path) as hass:
+            await _export_to(hass, f"file://{path}", fmt)
+        assert_rows(fmt, decode(fmt, [path.read_bytes()]), expected_rows())
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("fmt", export.EXPORT_FORMATS)
+def test_mqtt_sink(tmp_path, monkeypatch, fmt):
+    published: list[tuple[str, bytes]] = []
+
+    async def async_publish(hass, topic, payload):
+        published.append((topic, payload))
+
+    mqtt = types.ModuleType("homeassistant.components.mqtt")
+    mqtt.async_publish = async_publish
+    monkeypatch.setitem(sys.modules, "homeassistant.components.mqtt", mqtt)
+    monkeypatch.setattr(sys.modules["homeassistant.components"], "mqtt", mqtt, raising=False)
+
+    async def run():
+        async with running_hass(tmp_path) as hass:
+            await _export_to(hass, "mqtt://spirala/export", fmt)
+
+    asyncio.run(run())
+    assert {topic for topic, _ in published} == {"spirala/export"}
+    assert_rows(fmt, decode(fmt, [payload for _, payload in published]), expected_rows())
+
+
+def test_make_sink_rejects_unknown_targets():
+    for target in ("", "tcp://host:1", "udp://host", "mqtt://"):
+        with pytest.raises(ValueError):
+            export.make_sink(None, target)
+
+
+def test_queue_overflow_drops_oldest(tmp_path):
+    async def run():
+        async with running_hass(tmp_path) as hass:
+            sink = RecordingSink(delay=3600)
+            exporter = export.SnapshotExporter(hass, sink, "msgpack", ["i"], {})
+            extra = 50
+            for i in range(EXPORT_QUEUE_MAX + extra):
+                exporter.submit(float(i), 0.01, 1, [i])
+            # The task may hold one batch in its stalled send; the rest is bounded
+            await asyncio.sleep(0)
+            queued = [row[3][0] for row in exporter._queue]
+            assert len(exporter._queue) <= EXPORT_QUEUE_MAX
+            assert queued[-1] == EXPORT_QUEUE_MAX + extra - 1
+            assert exporter.stats["dropped"] == extra
+            assert queued == sorted(queued)
+            exporter._task.cancel()
+
+    asyncio.run(run())
+
+
+def test_failed_batch_is_retried_in_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_RETRY_SECS", 0.01)
+
+    async def run():
+        async with running_hass(tmp_path) as hass:
+            sink = RecordingSink(failures=1)
+            exporter = export.SnapshotExporter(hass, sink, "cbor", ["i"], {})
+            for i in range(EXPORT_BATCH_MAX):
+                exporter.submit(float(i), 0.01, 1, [i])
+            for _ in range(100):
+                if exporter.stats["sent"] == EXPORT_BATCH_MAX:
+                    break
+                await asyncio.sleep(0.01)
+            await exporter.async_close()
+            rows = decode_cbor(b"".join(sink.payloads))
+            assert [row[3][0] for batch in rows for row in batch["rows"]] == list(range(EXPORT_BATCH_MAX))
+            assert exporter.stats["errors"] == 1
+
+    asyncio.run(run())
+
+
+def test_close_waits_for_the_batch_in_flight(tmp_path):
+    async def run():
+        async with running_hass(tmp_path) as hass:
+            sink = RecordingSink(delay=0.2)
+            exporter = export.SnapshotExporter(hass, sink, "msgpack", ["i"], {})
+            total = EXPORT_BATCH_MAX + 5
+            for i in range(total):
+                exporter.submit(float(i), 0.01, 1, [i])
+            # Let the task pop a full batch and start sending it
+            await asyncio.sleep(0.05)
+            assert len(exporter._queue) == total - EXPORT_BATCH_MAX
+            await exporter.async_close()
+            assert sink.closed
+            sent = [row[3][0] for payload in sink.payloads for batch in decode_msgpack(payload)
+                    for row in batch["rows"]]
+            assert sent == list(range(total))
+            assert exporter.stats["sent"] == total
+
+    asyncio.run(run())
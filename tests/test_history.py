@@ -0,0 +1,119 @@
+"""The telemetry history rings: wraparound, downsampling and the file they are mapped onto."""
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from spirala_heat_pump.history import TelemetryHistory
+
+KEYS = ("a", "b")
+# Four raw samples, three 10 s buckets
+LEVELS = ((0, 4), (10, 3))
+
+
+def history() -> TelemetryHistory:
+    return TelemetryHistory(KEYS, LEVELS)
+
+
+def test_raw_ring_wraps_around():
+    h = history()
+    for t in range(6):
+        h.add(t, [t, 10 * t])
+    window = h.window(0, 100, resolution=0)
+    # The two oldest rows were overwritten, the rest come out oldest first
+    assert window == {"resolution": 0, "t": [2, 3, 4, 5], "a": [2, 3, 4, 5], "b": [20, 30, 40, 50]}
+    assert h.window(3, 4, keys=["b"], resolution=0) == {"resolution": 0, "t": [3, 4], "b": [30, 40]}
+    # Keeps wrapping
+    for t in range(6, 11):
+        h.add(t, [t, None])
+    assert h.window(0, 100, resolution=0) == {"resolution": 0, "t": [7, 8, 9, 10], "a": [7, 8, 9, 10], "b": [None] * 4}
+
+
+def test_buckets():
+    h = history()
+    h.add(0, [1.0, None])
+    h.add(4, [3.0, None])
+    h.add(9, [8.0, 2.0])
+    # The open bucket is not in the ring yet
+    assert h.window(0, 100, resolution=10)["t"] == []
+    h.add(25, [0.0, 0.0])
+    window = h.window(0, 100, resolution=10)
+    assert window["t"] == [0]
+    assert window["a"] == {"min": [1.0], "max": [8.0], "mean": [4.0]}
+    assert window["b"] == {"min": [2.0], "max": [2.0], "mean": [2.0]}
+    # A bucket without any value for a key
+    h.add(31, [5.0, None])
+    assert h.window(20, 100, resolution=10)["b"] == {"min": [0.0], "max": [0.0], "mean": [0.0]}
+    h.add(40, [1.0, 1.0])
+    assert h.window(30, 100, resolution=10)["b"] == {"min": [None], "max": [None], "mean": [None]}
+    with pytest.raises(ValueError, match="resolution 60"):
+        h.window(0, 100, resolution=60)
+
+
+def test_window_falls_back_to_a_coarser_ring():
+    h = history()
+    for t in range(0, 40, 2):
+        h.add(t, [t, t])
+    # Raw rows only go back to t=32; buckets to t=0
+    assert h.window(32, 100)["resolution"] == 0
+    window = h.window(0, 100)
+    assert window["resolution"] == 10 and window["t"] == [0, 10, 20]
+    assert window["a"]["mean"] == [4.0, 14.0, 24.0]
+    # Older than any ring: the coarsest one
+    for t in range(40, 100, 2):
+        h.add(t, [t, t])
+    assert h.window(0, 100)["resolution"] == 10
+
+
+def test_reopening_keeps_the_rings(tmp_path):
+    path = str(tmp_path / "history.bin")
+    h = history()
+    h.open(path)
+    assert os.path.getsize(path) == h.nbytes
+    for t in range(6):
+        h.add(t, [t, t])
+    h.add(12, [1.0, 1.0])
+    h.close()
+    # Closed: back to an empty history in memory
+    assert h.window(0, 100, resolution=0)["t"] == []
+
+    h = history()
+    h.open(path)
+    assert h.window(0, 100, resolution=0)["t"] == [3, 4, 5, 12]
+    assert h.window(0, 100, resolution=10)["a"]["mean"] == [2.5]
+    # Appends continue after the rows already there
+    h.add(13, [7.0, 7.0])
+    assert h.window(0, 100, resolution=0)["a"] == [4, 5, 1, 7]
+    h.close()
+
+
+def test_file_of_another_size_starts_over(tmp_path):
+    path = tmp_path / "history.bin"
+    path.write_bytes(b"\xff" * 100)
+    h = history()
+    h.open(str(path))
+    assert path.stat().st_size == h.nbytes
+    assert h.window(0, 100, resolution=0)["t"] == []
+    h.add(1, [1.0, 1.0])
+    assert h.window(0, 100, resolution=0)["t"] == [1]
+    h.close()
+
+
+def test_file_of_another_layout_starts_over(tmp_path):
+    path = str(tmp_path / "history.bin")
+    h = history()
+    h.open(path)
+    h.add(1, [1.0, 1.0])
+    h.close()
+    # Same size, other keys: the checksum differs
+    other = TelemetryHistory(("c", "d"), LEVELS)
+    assert other.nbytes == h.nbytes
+    other.open(path)
+    assert other.window(0, 100, resolution=0)["t"] == []
+    other.close()
+    # Another layout rewrote the file, so the first one starts over as well
+    h = history()
+    h.open(path)
+    assert h.window(0, 100, resolution=0)["t"] == []
+    h.close()
@@ -0,0 +1,154 @@
+"""The identity block: parsing, and retries of a blank block that never replace a known identity."""
+from __future__ import annotations
+
+import asyncio
+import struct
+
+from common import Clock, FakeConnection, FakeResponse, polling
+from simulator import initial_registers
+from spirala_heat_pump.const import IDENTITY_RETRY_MAX_SECS, IDENTITY_RETRY_MIN_SECS
+from spirala_heat_pump.identity import (
+    IDENTITY_ADDR, IDENTITY_COUNT, Identity, IdentityReader, decode_ascii, parse_identity,
+)
+
+
+def block(text: str) -> list[int]:
+    raw = text.encode("ascii").ljust(2 * IDENTITY_COUNT, b"\0")
+    return list(struct.unpack(f">{IDENTITY_COUNT}H", raw))
+
+
+BLANK = [0] * IDENTITY_COUNT
+
+
+def test_parse_identity():
+    assert decode_ascii(block(" A123\x01 ")) == "A123"
+    assert parse_identity(block("B2024-0042")) == Identity("B2024-0042", "WW-B")
+    # Blank, padding only or garbled: no serial, no identity
+    assert parse_identity(BLANK) is None
+    assert parse_identity([0x2020] * IDENTITY_COUNT) is None
+    assert parse_identity([0xFFFF, 0x0102] * (IDENTITY_COUNT // 2)) is None
+
+
+class Unit:
+    """The coordinator as the identity reader sees it, answering with `registers`."""
+
+    def __init__(self, registers: list[int]) -> None:
+        self.registers = registers
+        self.clock = Clock()
+        self.unit_id, self.host = 1, "fake"
+        self.reads: list[float] = []
+
+    async def _async_request_read(self, start: int, count: int):
+        assert (start, count) == (IDENTITY_ADDR, IDENTITY_COUNT)
+        self.reads.append(self.clock.now)
+        return FakeResponse(self.registers), 0.001
+
+
+async def _poll_for(unit: Unit, reader: IdentityReader, secs: float, step: float = 5.0) -> None:
+    """Update on every poll for `secs` seconds."""
+    end = unit.clock.now + secs
+    while unit.clock.now < end:
+        await reader.async_update()
+        unit.clock.now += step
+
+
+def _gaps(times: list[float]) -> list[float]:
+    return [b - a for a, b in zip(times, times[1:])]
+
+
+def test_blank_block_is_retried_with_backoff():
+    async def run():
+        unit = Unit(BLANK)
+        reader = IdentityReader(unit)
+        await _poll_for(unit, reader, 4 * 3600)
+        assert reader.identity is None and not reader.confirmed
+        gaps = _gaps(unit.reads)
+        # 30 s, doubling on every blank block, up to an hour
+        expected = [min(IDENTITY_RETRY_MAX_SECS, IDENTITY_RETRY_MIN_SECS * 2 ** k) for k in range(len(gaps))]
+        assert gaps == expected
+        assert gaps[-1] == IDENTITY_RETRY_MAX_SECS
+        assert reader.reads == len(unit.reads)
+
+        # Once the block is filled in, the next retry takes it and reading stops
+        unit.registers = block("A0001")
+        await _poll_for(unit, reader, IDENTITY_RETRY_MAX_SECS + 5)
+        assert reader.identity == Identity("A0001", "WW-A") and reader.confirmed
+        reads = len(unit.reads)
+        await _poll_for(unit, reader, 2 * IDENTITY_RETRY_MAX_SECS)
+        assert len(unit.reads) == reads
+
+    asyncio.run(run())
+
+
+def test_blank_block_keeps_the_cached_identity():
+    async def run():
+        unit = Unit(BLANK)
+        reader = IdentityReader(unit)
+        reader.restore({"serial": "A0001", "model": "WW-A"})
+        assert not await reader.async_update()
+        assert reader.identity == Identity("A0001", "WW-A") and not reader.confirmed
+        # Nor do garbled blocks
+        unit.registers = [0xFFFF] * IDENTITY_COUNT
+        await _poll_for(unit, reader, 600)
+        assert reader.serial == "A0001" and not reader.confirmed
+        assert _gaps(unit.reads) == [30, 60, 120, 240]
+
+        # A real block confirms it and resets the backoff
+        unit.registers = block("A0001")
+        await _poll_for(unit, reader, 600)
+        assert reader.confirmed and reader._failures == 0
+
+    asyncio.run(run())
+
+
+def test_failed_reads_back_off_like_blank_blocks():
+    async def run():
+        unit = Unit(BLANK)
+
+        async def rejected(start, count):
+            unit.reads.append(unit.clock.now)
+            return FakeResponse(error=True), 0.001
+
+        unit._async_request_read = rejected
+        reader = IdentityReader(unit)
+        await _poll_for(unit, reader, 300)
+        assert _gaps(unit.reads) == [30, 60, 120]
+
+    asyncio.run(run())
+
+
+def test_new_serial_replaces_the_cached_identity():
+    async def run():
+        unit = Unit(block("C0002"))
+        reader = IdentityReader(unit)
+        reader.restore({"serial": "A0001", "model": "WW-A"})
+        assert await reader.async_update()
+        assert reader.identity == Identity("C0002", "WW-C")
+
+    asyncio.run(run())
+
+
+def test_coordinator_publishes_the_cached_identity_over_a_blank_block(tmp_path):
+    async def run():
+        registers = initial_registers()
+        registers[IDENTITY_ADDR:IDENTITY_ADDR + IDENTITY_COUNT] = BLANK
+        fake = FakeConnection(registers)
+        async with polling(tmp_path, connection=fake) as coordinator:
+            coordinator.identity.restore({"serial": "A0001", "model": "WW-A"})
+            await coordinator.async_refresh()
+            index = coordinator.decoder.index
+            assert coordinator.data.values[index["serial_number"]] == "A0001"
+            assert coordinator.data.values[index["model"]] == "WW-A"
+            reads = [r for r in fake.requests if r[1] == IDENTITY_ADDR]
+            assert len(reads) == 1
+            # Not read again on the next polls until the retry is due
+            for _ in range(5):
+                coordinator.clock.now += 5
+                await coordinator.async_refresh()
+            assert [r for r in fake.requests if r[1] == IDENTITY_ADDR] == reads
+            coordinator.clock.now += IDENTITY_RETRY_MIN_SECS
+            await coordinator.async_refresh()
+            assert len([r for r in fake.requests if r[1] == IDENTITY_ADDR]) == 2
+            assert coordinator.data.values[index["serial_number"]] == "A0001"
+
+    asyncio.run(run())
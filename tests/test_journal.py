@@ -0,0 +1,172 @@
+"""Transition journal: records, rotation, torn tails, lookups across files and durations."""
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from spirala_heat_pump import journal as journal_mod
+from spirala_heat_pump.decoder import DecodePlan
+from spirala_heat_pump.journal import TransitionJournal
+
+INDEX = DecodePlan().index
+KEYS = ("active_circuit", "io_state")
+HEADER = journal_mod._HEADER.size
+RECORD = journal_mod._RECORD.size
+
+
+def values(active: int | None = None, io: int | None = None) -> list:
+    row = [None] * len(INDEX)
+    row[INDEX["active_circuit"]] = active
+    row[INDEX["io_state"]] = io
+    return row
+
+
+def make(path, **kwargs) -> TransitionJournal:
+    journal = TransitionJournal(INDEX, keys=KEYS, **kwargs)
+    journal.open(str(path))
+    return journal
+
+
+def feed(journal: TransitionJournal, rows: list[tuple[float, int | None, int | None]]) -> None:
+    """(time, active circuit, io word) rows; wall and monotonic time move together."""
+    for t, active, io in rows:
+        journal.update(t, t, values(active, io))
+        journal.write(journal.take())
+
+
+def test_transitions_and_durations(tmp_path):
+    journal = make(tmp_path / "j")
+    feed(journal, [(100, 0, 0), (110, 1, 0b100000), (130, 0, 0b100000), (135, 0, 0)])
+    result = journal.query(100, 140)
+    assert [(t["t"], t["key"], t["from"], t["to"]) for t in result["transitions"]] == [
+        (100, "active_circuit", None, "none"),
+        (100, "io_state", None, 0),
+        (110, "active_circuit", "none", "circuit_1"),
+        (110, "io_state", 0, 32),
+        (130, "active_circuit", "circuit_1", "none"),
+        (135, "io_state", 32, 0),
+    ]
+    assert result["transitions"][3]["set"] == ["io_contactor"]
+    assert result["transitions"][5]["cleared"] == ["io_contactor"]
+    # Enum values per state, words per bit; the last state runs to the end of the window
+    assert result["durations"] == {"active_circuit": {"none": 20.0, "circuit_1": 20.0},
+                                   "io_state": {"io_contactor": 25.0}}
+    # A window starting mid-state takes the state from the record before it
+    result = journal.query(120, 125, keys=["active_circuit"])
+    assert result["transitions"] == []
+    assert result["durations"] == {"active_circuit": {"circuit_1": 5.0}}
+    journal.close()
+
+
+def test_durations_use_monotonic_time_within_a_run(tmp_path):
+    journal = make(tmp_path / "j")
+    journal.update(100, 5000, values(1, 0))
+    # The wall clock steps forward by an hour, the monotonic clock does not
+    journal.update(3710, 5010, values(2, 0))
+    journal.write(journal.take())
+    assert journal.query(0, 3710, keys=["active_circuit"])["durations"]["active_circuit"] == {"circuit_1": 10.0}
+    journal.close()
+
+
+def test_stop_ends_every_state(tmp_path):
+    journal = make(tmp_path / "j")
+    feed(journal, [(100, 1, 0)])
+    journal.stop(110, 110)
+    journal.write(journal.take())
+    # After a restart the next value is a start again
+    feed(journal, [(200, 1, 0)])
+    result = journal.query(100, 210, keys=["active_circuit"])
+    assert result["durations"]["active_circuit"] == {"circuit_1": 20.0}
+    assert [t["from"] for t in result["transitions"]] == [None, None]
+    journal.close()
+
+
+def test_rotation_keeps_files_and_state(tmp_path):
+    path = tmp_path / "j"
+    # Room for five records per file, three files kept
+    journal = make(path, max_bytes=HEADER + 5 * RECORD, files=3)
+    rows = [(100 + 10 * i, i % 4, 0) for i in range(20)]
+    feed(journal, rows)
+    paths = journal.paths()
+    assert [os.path.exists(p) for p in paths] == [True, True, True]
+    assert all(os.path.getsize(p) <= HEADER + 6 * RECORD for p in paths)
+    # Each rotated file starts with the state of every channel
+    with open(paths[1], "rb") as f:
+        f.seek(HEADER)
+        first = journal_mod._RECORD.unpack(f.read(RECORD))
+    assert first[3] == journal_mod._F_SNAPSHOT
+    # The oldest records are gone; a window inside the kept files is exact
+    start = journal_mod._RECORD.unpack(open(paths[0], "rb").read()[HEADER:HEADER + RECORD])[0]
+    assert start > 100
+    result = journal.query(start + 5, 290, keys=["active_circuit"])
+    expected = [(t, f"circuit_{a}" if a in (1, 2) else {0: "none", 3: "dhw"}[a]) for t, a, _ in rows
+                if start + 5 <= t <= 290]
+    assert [(t["t"], t["to"]) for t in result["transitions"]] == expected
+    # Every state lasts 10 s apart from the partial ones at the window edges
+    assert sum(result["durations"]["active_circuit"].values()) == pytest.approx(290 - (start + 5))
+    journal.close()
+
+
+def test_bisect_across_files(tmp_path):
+    journal = make(tmp_path / "j", max_bytes=HEADER + 5 * RECORD, files=4)
+    feed(journal, [(100 + 10 * i, i % 2, 0) for i in range(15)])
+    fds = [os.open(p, os.O_RDONLY) for p in journal.paths() if os.path.exists(p)]
+    try:
+        for fd in fds:
+            n = journal_mod._count(fd)
+            times = [r[0] for r in journal_mod._read(fd, 0, n)]
+            for t in (times[0] - 1, times[0], times[-1], times[-1] + 1, (times[0] + times[-1]) / 2):
+                i = journal_mod._bisect(fd, n, t)
+                assert all(x < t for x in times[:i]) and all(x >= t for x in times[i:])
+    finally:
+        for fd in fds:
+            os.close(fd)
+    # The kept transitions are the newest ones, without gaps at the file boundaries
+    kept = [t["t"] for t in journal.query(0, 240, keys=["active_circuit"])["transitions"]]
+    assert kept == list(range(int(kept[0]), 241, 10)) and kept[0] > 100
+    # Each is found once whatever file the window starts in
+    for start in range(95, 245, 10):
+        result = journal.query(start, 240, keys=["active_circuit"])
+        assert [t["t"] for t in result["transitions"]] == [t for t in kept if t >= start]
+    journal.close()
+
+
+def test_torn_record_is_dropped_on_reopen(tmp_path):
+    path = tmp_path / "j"
+    journal = make(path)
+    feed(journal, [(100, 0, 0), (110, 1, 0), (120, 2, 0)])
+    journal.close()
+    size = os.path.getsize(path)
+    # A crash in the middle of the last write
+    with open(path, "r+b") as f:
+        f.truncate(size - RECORD // 2)
+    journal = make(path)
+    assert os.path.getsize(path) == size - RECORD
+    result = journal.query(0, 130, keys=["active_circuit"])
+    assert [t["to"] for t in result["transitions"]] == ["none", "circuit_1"]
+    assert result["durations"]["active_circuit"] == {"none": 10.0, "circuit_1": 20.0}
+    # Appending goes on at a record boundary
+    feed(journal, [(130, 3, 0)])
+    assert (os.path.getsize(path) - HEADER) % RECORD == 0
+    assert journal.query(125, 140, keys=["active_circuit"])["transitions"][-1]["to"] == "dhw"
+    journal.close()
+
+
+def test_foreign_file_is_started_over(tmp_path):
+    path = tmp_path / "j"
+    path.write_bytes(b"not a journal at all")
+    journal = make(path)
+    assert os.path.getsize(path) == HEADER
+    assert journal.query(0, 100)["transitions"] == []
+    journal.close()
+
+
+def test_transition_limit(tmp_path):
+    journal = make(tmp_path / "j")
+    feed(journal, [(100 + i, i % 2, None) for i in range(10)])
+    result = journal.query(0, 200, keys=["active_circuit"], limit=3)
+    assert len(result["transitions"]) == 3 and result["truncated"]
+    # Durations still cover the whole window
+    assert sum(result["durations"]["active_circuit"].values()) == pytest.approx(200 - 100)
+    journal.close()
@@ -0,0 +1,151 @@
+"""Hourly long-term statistics: closing hours, partial hours and backfill after a restart."""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+import pytest
+
+from spirala_heat_pump.const import STATISTICS_BACKFILL_MAX_HOURS, STATISTICS_MEAN_KEYS
+from spirala_heat_pump.decoder import DecodePlan
+from spirala_heat_pump.longterm import LongTermStatistics
+
+INDEX = DecodePlan().index
+HOUR = 3600
+# An hour boundary
+T0 = 1_700_000_000 - 1_700_000_000 % HOUR
+
+
+def utc(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, timezone.utc)
+
+
+class Imported(LongTermStatistics):
+    """Collects the rows it would import into the recorder, per statistic key."""
+
+    def __init__(self) -> None:
+        super().__init__(None, INDEX, "10.0.0.5-502-1", "Heat pump 1")
+        self.enabled = True
+        self.imported: dict[str, list[dict]] = {}
+
+    def _import(self, metadata, rows) -> None:
+        self.rows += len(rows)
+        key = metadata["statistic_id"].rsplit("_1_", 1)[1]
+        self.imported.setdefault(key, []).extend(rows)
+
+
+def poll(stats: LongTermStatistics, wall: float, **values) -> None:
+    row = [None] * len(INDEX)
+    for key, value in values.items():
+        row[INDEX[key]] = value
+    stats.add(wall, row)
+
+
+def test_closing_an_hour_imports_min_max_mean_and_counters():
+    stats = Imported()
+    poll(stats, T0, supply_temp=30.0, tank_temp_1=45.0, starts_count=10, runtime_hours=100)
+    poll(stats, T0 + 1200, supply_temp=36.0, tank_temp_1=None, starts_count=11, runtime_hours=100)
+    poll(stats, T0 + 2400, supply_temp=33.0, tank_temp_1=44.0, starts_count=12, runtime_hours=101)
+    assert stats.imported == {}
+    # The first poll of the next hour closes it
+    poll(stats, T0 + HOUR + 5, supply_temp=20.0, tank_temp_1=40.0, starts_count=12, runtime_hours=101)
+    assert stats.imported["supply_temp"] == [{"start": utc(T0), "min": 30.0, "max": 36.0, "mean": 33.0}]
+    # Unknown values are left out
+    assert stats.imported["tank_temp_1"] == [{"start": utc(T0), "min": 44.0, "max": 45.0, "mean": 44.5}]
+    # Never seen: no row
+    assert "return_temp" not in stats.imported
+    # Counters: the value at the end of the hour; the first row starts the sum
+    assert stats.imported["starts_count"] == [{"start": utc(T0), "state": 12, "sum": 0.0}]
+    assert stats.imported["runtime_hours"] == [{"start": utc(T0), "state": 101, "sum": 0.0}]
+
+    poll(stats, T0 + 2 * HOUR, supply_temp=21.0, tank_temp_1=40.0, starts_count=15, runtime_hours=102)
+    assert stats.imported["supply_temp"][-1] == {"start": utc(T0 + HOUR), "min": 20.0, "max": 20.0, "mean": 20.0}
+    assert stats.imported["starts_count"][-1] == {"start": utc(T0 + HOUR), "state": 12, "sum": 0.0}
+    poll(stats, T0 + 3 * HOUR, starts_count=2)
+    assert stats.imported["starts_count"][-1] == {"start": utc(T0 + 2 * HOUR), "state": 15, "sum": 3.0}
+    # A counter that went back was reset: its new value is all growth
+    poll(stats, T0 + 4 * HOUR)
+    assert stats.imported["starts_count"][-1] == {"start": utc(T0 + 3 * HOUR), "state": 2, "sum": 5.0}
+    assert stats.rows == sum(len(rows) for rows in stats.imported.values())
+
+
+def test_partial_hour():
+    stats = Imported()
+    # Started half way through the hour, stopped before its end
+    poll(stats, T0 + 1800, return_temp=25.0, starts_count=7)
+    poll(stats, T0 + 1810, return_temp=27.0, starts_count=7)
+    # Nothing until a poll in another hour closes it
+    assert stats.imported == {}
+    poll(stats, T0 + 5 * HOUR, return_temp=26.0, starts_count=7)
+    assert stats.imported["return_temp"] == [{"start": utc(T0), "min": 25.0, "max": 27.0, "mean": 26.0}]
+    # The hours without polls have no temperature rows; the counter is flat across them
+    assert stats.imported["starts_count"][0] == {"start": utc(T0), "state": 7, "sum": 0.0}
+    assert {key for key in stats.imported if key in STATISTICS_MEAN_KEYS} == {"return_temp"}
+
+
+def restarted(before: Imported) -> Imported:
+    """A new instance continuing from the last rows imported, as async_setup does from the recorder."""
+    stats = Imported()
+    for counter in stats._counters:
+        if counter.key not in before.imported:
+            continue
+        last = before.imported[counter.key][-1]
+        counter.hour, counter.state, counter.sum = last["start"].timestamp(), last["state"], last["sum"]
+    return stats
+
+
+def test_backfill_after_a_restart():
+    stats = Imported()
+    poll(stats, T0 + 600, starts_count=100, runtime_hours=500)
+    poll(stats, T0 + HOUR, starts_count=110, runtime_hours=501)
+    assert stats.imported["starts_count"] == [{"start": utc(T0), "state": 100, "sum": 0.0}]
+
+    # Down for four and a half hours
+    stats = restarted(stats)
+    start = T0 + 5 * HOUR + 1800
+    poll(stats, start, starts_count=155, runtime_hours=505.5)
+    assert stats.backfilled == 2 * 4
+    poll(stats, T0 + 6 * HOUR, starts_count=160, runtime_hours=506)
+    rows = stats.imported["starts_count"]
+    # The hours after the last imported row, the delta spread over the time down
+    assert [row["start"] for row in rows] == [utc(T0 + h * HOUR) for h in range(1, 6)]
+    rate = (155 - 100) / (start - (T0 + HOUR))
+    assert [row["state"] for row in rows[:4]] == [pytest.approx(100 + rate * h * HOUR, abs=1e-3) for h in range(1, 5)]
+    # The hour it came back in ends with the last value polled in it
+    assert rows[4]["state"] == 155
+    assert rows[-1]["sum"] == 55.0
+    assert [row["sum"] for row in rows] == sorted(row["sum"] for row in rows)
+
+
+def test_backfill_skips_hours_already_imported():
+    stats = Imported()
+    poll(stats, T0, starts_count=100)
+    poll(stats, T0 + HOUR, starts_count=101)
+    poll(stats, T0 + 2 * HOUR, starts_count=103)
+    assert [row["start"] for row in stats.imported["starts_count"]] == [utc(T0), utc(T0 + HOUR)]
+
+    # Restarted in the hour after the last row: nothing to backfill
+    stats = restarted(stats)
+    poll(stats, T0 + 2 * HOUR + 60, starts_count=103)
+    poll(stats, T0 + 3 * HOUR, starts_count=104)
+    assert stats.backfilled == 0
+    assert stats.imported["starts_count"] == [{"start": utc(T0 + 2 * HOUR), "state": 103, "sum": 3.0}]
+
+    # Restarted within an hour whose row is already in: it is not imported twice
+    stats = restarted(stats)
+    poll(stats, T0 + 2 * HOUR + 3000, starts_count=104)
+    poll(stats, T0 + 3 * HOUR + 10, starts_count=105)
+    assert "starts_count" not in stats.imported
+    poll(stats, T0 + 4 * HOUR, starts_count=106)
+    assert stats.imported["starts_count"] == [{"start": utc(T0 + 3 * HOUR), "state": 105, "sum": 5.0}]
+
+
+def test_no_backfill_across_a_reset_or_a_long_outage():
+    stats = Imported()
+    poll(stats, T0, starts_count=100)
+    poll(stats, T0 + HOUR, starts_count=100)
+    reset = restarted(stats)
+    poll(reset, T0 + 10 * HOUR, starts_count=5)
+    assert reset.backfilled == 0
+    long_outage = restarted(stats)
+    poll(long_outage, T0 + (STATISTICS_BACKFILL_MAX_HOURS + 3) * HOUR, starts_count=200)
+    assert long_outage.backfilled == 0
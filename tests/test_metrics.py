@@ -0,0 +1,113 @@
+"""Derived metrics checked against sequences with known results."""
+from __future__ import annotations
+
+import math
+
+import pytest
+
+from spirala_heat_pump.metrics import (
+    CIRCUIT_TIME_KEYS, INPUT_KEYS, MAX_GAP_SECS, METRIC_KEYS, RATE_WINDOW_SECS, REASON_TIME_KEYS, MetricsEngine,
+)
+
+INDEX = {key: i for i, key in enumerate(INPUT_KEYS)}
+
+
+def row(running: bool | None = False, supply=None, ret=None, circuit=None, reason=None) -> list:
+    values = [None] * len(INDEX)
+    values[INDEX["io_contactor"]] = running
+    values[INDEX["supply_temp"]] = supply
+    values[INDEX["return_temp"]] = ret
+    values[INDEX["active_circuit"]] = circuit
+    values[INDEX["not_running_reason"]] = reason
+    return values
+
+
+def run(engine: MetricsEngine, start: float, end: float, step: float, running) -> None:
+    """Polls every `step` seconds in (start, end], `running` a function of the time."""
+    t = start + step
+    while t <= end:
+        engine.update(t, row(running(t)))
+        t += step
+
+
+def test_duty_cycle():
+    engine = MetricsEngine(INDEX)
+    engine.update(0, row(True))
+    # Bias corrected: right from the second poll
+    engine.update(10, row(True))
+    assert engine.values["duty_cycle"] == 100.0
+    # On for the first half hour, off for the second: each interval weighted by its age
+    run(engine, 10, RATE_WINDOW_SECS, 10, lambda t: t <= 1800)
+    expected = 100 * (math.exp(-0.5) - math.exp(-1)) / (1 - math.exp(-1))
+    assert engine.values["duty_cycle"] == pytest.approx(expected, abs=0.05)
+    assert engine.values["starts_per_hour"] == 0.0
+
+
+def test_starts_per_hour_and_average_cycle():
+    engine = MetricsEngine(INDEX)
+    engine.update(0, row(False))
+    # A start every 10 minutes, running for 5 of them, for ten hours
+    hours = 10
+    run(engine, 0, hours * 3600, 10, lambda t: t % 600 < 300)
+    # The last poll is a start: the starts are a geometric series of the decay per cycle
+    expected = 1 / (1 - math.exp(-600 / RATE_WINDOW_SECS))
+    assert engine.values["starts_per_hour"] == pytest.approx(expected, abs=0.01)
+    assert engine.values["duty_cycle"] == pytest.approx(50.0, abs=5)
+    assert engine.values["avg_cycle_minutes"] == 5.0
+
+
+def test_average_cycle_is_weighted_towards_recent_cycles():
+    engine = MetricsEngine(INDEX)
+    engine.update(0, row(False))
+    # Running at the first poll: not a start, so no cycle until the next edge
+    assert engine.values["avg_cycle_minutes"] is None
+    for t, running in ((60, True), (660, False), (700, True), (1000, False)):
+        engine.update(t, row(running))
+    # 10 minutes, then 10 + 0.2 * (5 - 10)
+    assert engine.values["avg_cycle_minutes"] == 9.0
+    # An unknown contactor neither starts nor ends a cycle
+    engine.update(1010, row(None))
+    engine.update(1020, row(False))
+    assert engine.values["avg_cycle_minutes"] == 9.0
+
+
+def test_time_per_circuit_and_reason():
+    engine = MetricsEngine(INDEX)
+    for t in range(0, 361, 10):
+        engine.update(t, row(circuit=1, reason=4))
+    for t in range(370, 1081, 10):
+        engine.update(t, row(circuit=3, reason=None))
+    assert engine.values[CIRCUIT_TIME_KEYS[1]] == 0.1
+    assert engine.values[CIRCUIT_TIME_KEYS[3]] == 0.2
+    assert engine.values[CIRCUIT_TIME_KEYS[2]] == 0.0
+    assert engine.values[REASON_TIME_KEYS[4]] == 0.1
+
+
+def test_gaps_are_not_attributed():
+    engine = MetricsEngine(INDEX)
+    engine.update(0, row(False, circuit=1))
+    engine.update(10, row(False, circuit=1))
+    # Down for a while, running when it comes back
+    engine.update(10 + MAX_GAP_SECS + 1, row(True, circuit=1))
+    assert engine.values[CIRCUIT_TIME_KEYS[1]] == round(10 / 3600, 2)
+    assert engine.values["duty_cycle"] == 0.0
+    # The start is still counted
+    engine.update(20 + MAX_GAP_SECS + 1, row(True, circuit=1))
+    assert engine.values["starts_per_hour"] > 0
+
+
+def test_changed_keys_and_restore():
+    engine = MetricsEngine(INDEX)
+    engine.restore(CIRCUIT_TIME_KEYS[1], 2.5)
+    engine.restore("avg_cycle_minutes", 12.0)
+    changed = engine.update(0, row(False, supply=35.04, ret=30.0))
+    assert engine.values["delta_t"] == 5.0
+    assert "delta_t" in changed and CIRCUIT_TIME_KEYS[1] not in changed
+    assert engine.values["avg_cycle_minutes"] == 12.0
+    # Totals continue from the restored hours
+    engine.update(360, row(False, circuit=1))
+    engine.update(360 + 36, row(False, circuit=1))
+    assert engine.values[CIRCUIT_TIME_KEYS[1]] == 2.51
+    # Only what changed is reported
+    assert engine.update(400, row(False, circuit=5)) <= {"delta_t", "starts_per_hour", "duty_cycle"}
+    assert set(engine.values) == set(METRIC_KEYS)
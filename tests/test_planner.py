@@ -0,0 +1,92 @@
+"""Read planning: merging spans into reads and tuning the gap from measured round trips."""
+from __future__ import annotations
+
+from spirala_heat_pump import planner as planner_mod
+from spirala_heat_pump.planner import ReadPlanner, plan_reads
+
+MIN_SAMPLES = planner_mod._MIN_SAMPLES
+
+
+def test_holes_up_to_the_gap_are_read_through():
+    spans = [(0, 2), (4, 1), (8, 2)]
+    assert plan_reads(spans, 125, 0) == [(0, 2), (4, 1), (8, 2)]
+    assert plan_reads(spans, 125, 1) == [(0, 2), (4, 1), (8, 2)]
+    assert plan_reads(spans, 125, 2) == [(0, 5), (8, 2)]
+    assert plan_reads(spans, 125, 3) == [(0, 10)]
+
+
+def test_spans_in_any_order_and_overlapping():
+    assert plan_reads([(50, 2), (10, 1), (30, 1)], 125, 5) == [(10, 1), (30, 1), (50, 2)]
+    # Duplicates, a span inside another and spans sharing registers
+    assert plan_reads([(0, 4), (1, 2), (0, 4), (3, 3)], 125, 0) == [(0, 6)]
+    assert plan_reads([], 125, 10) == []
+
+
+def test_no_read_exceeds_max_count():
+    assert plan_reads([(addr, 1) for addr in range(10)], 4, 0) == [(0, 4), (4, 4), (8, 2)]
+    # A hole that would take the read past max_count starts a new one
+    assert plan_reads([(0, 3), (5, 2)], 6, 5) == [(0, 3), (5, 2)]
+    assert plan_reads([(0, 3), (5, 2)], 7, 5) == [(0, 7)]
+    # A span that does not fit the read it would join starts the next one whole
+    assert plan_reads([(0, 3), (3, 2)], 4, 0) == [(0, 3), (3, 2)]
+
+
+def test_plans_are_per_set_of_tiers():
+    planner = ReadPlanner({"fast": [(0, 1), (10, 1)], "slow": [(5, 1)]}, gap=5)
+    assert planner.plan_for(["fast"]) == [(0, 1), (10, 1)]
+    assert planner.plan_for(["slow", "fast"]) == [(0, 11)]
+    assert planner.plan == [(0, 11)]
+    assert planner.registers_per_poll == 11
+
+
+def _feed(planner: ReadPlanner, samples) -> list[bool]:
+    return [planner.record(count, rtt) for count, rtt in samples]
+
+
+def _linear(overhead: float, per_reg: float, counts) -> list[tuple[int, float]]:
+    return [(count, overhead + per_reg * count) for count in counts]
+
+
+def test_gap_follows_the_fitted_overhead():
+    planner = ReadPlanner({"fast": [(0, 1), (15, 1), (40, 1)]})
+    assert planner.plan == [(0, 1), (15, 1), (40, 1)]
+    # 20.5 ms per request and 1 ms per register: bridging up to 20 registers pays
+    changed = _feed(planner, _linear(0.0205, 0.001, [1, 10, 30, 5, 20, 2, 40, 15, 25, 8]))
+    assert planner._fitted_gap() == 20
+    assert planner.gap == 20
+    assert planner.plan == [(0, 16), (40, 1)]
+    assert changed.count(True) == 1
+    # Capped at the largest read
+    planner = ReadPlanner({}, max_count=10)
+    _feed(planner, _linear(0.0205, 0.001, [1, 10, 30, 5, 20, 2, 40, 15, 25, 8]))
+    assert planner.gap == 10
+
+
+def test_too_few_samples_keep_the_gap():
+    planner = ReadPlanner({"fast": [(0, 1), (15, 1)]}, gap=3)
+    # Older samples decay, so it takes one more than MIN_SAMPLES to weigh that much
+    assert _feed(planner, _linear(0.0205, 0.001, range(1, MIN_SAMPLES + 1))) == [False] * MIN_SAMPLES
+    assert planner.gap == 3
+    assert planner.record(MIN_SAMPLES + 1, 0.0205 + 0.001 * (MIN_SAMPLES + 1))
+    assert planner.gap == 20
+
+
+def test_degenerate_samples_keep_the_gap():
+    # Every request the same size: overhead and per-register cost can't be told apart
+    planner = ReadPlanner({"fast": [(0, 1), (15, 1)]}, gap=3)
+    assert not any(_feed(planner, [(10, 0.03)] * 20))
+    assert planner._fitted_gap() is None and planner.gap == 3
+    # Larger reads answered faster: no per-register cost to fit
+    planner = ReadPlanner({"fast": [(0, 1), (15, 1)]}, gap=3)
+    _feed(planner, _linear(0.05, -0.001, [1, 10, 30, 5, 20, 2, 40, 15, 25, 8]))
+    assert planner._fitted_gap() is None and planner.gap == 3
+    # No fixed cost per request: nothing to save by bridging
+    planner = ReadPlanner({"fast": [(0, 1), (15, 1)]}, gap=3)
+    _feed(planner, _linear(-0.001, 0.001, [1, 10, 30, 5, 20, 2, 40, 15, 25, 8]))
+    assert planner._fitted_gap() is None and planner.gap == 3
+
+
+def test_auto_tune_off_keeps_the_gap():
+    planner = ReadPlanner({"fast": [(0, 1), (15, 1)]}, gap=3, auto_tune=False)
+    assert not any(_feed(planner, _linear(0.0205, 0.001, [1, 10, 30, 5, 20, 2, 40, 15, 25, 8])))
+    assert planner.gap == 3
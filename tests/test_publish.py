@@ -0,0 +1,119 @@
+"""Change-only publishing: deadbands, and the forced publish after max_silence."""
+from __future__ import annotations
+
+import asyncio
+
+from common import FakeConnection, polling
+from simulator import initial_registers
+from spirala_heat_pump.const import TEMP_DEADBAND
+from spirala_heat_pump.registers import REGISTERS
+
+TANK = next(p for p in REGISTERS if p.key == "tank_temp_1")
+SILENCE = 60
+
+
+def _nudge(fake: FakeConnection, celsius: float) -> None:
+    fake.registers[TANK.addr] += round(celsius / TANK.scale)
+
+
+async def _listening(coordinator, *keys: str) -> dict[str, int]:
+    """Notifications per key from now on."""
+    counts = dict.fromkeys(keys, 0)
+    for key in keys:
+        coordinator.async_add_listener(lambda key=key: counts.__setitem__(key, counts[key] + 1), key)
+    await coordinator.async_refresh()
+    for key in keys:
+        counts[key] = 0
+    return counts
+
+
+async def _poll(coordinator, secs: float = 1.0) -> None:
+    coordinator.clock.now += secs
+    await coordinator.async_refresh()
+
+
+def test_changes_inside_the_deadband_are_not_published(tmp_path):
+    async def run():
+        fake = FakeConnection(initial_registers())
+        async with polling(tmp_path, connection=fake, max_silence=SILENCE) as coordinator:
+            counts = await _listening(coordinator, TANK.key)
+            slot = coordinator.decoder.index[TANK.key]
+            published = coordinator._published[slot]
+            suppressed = coordinator.publish_stats["suppressed_writes"]
+
+            _nudge(fake, TEMP_DEADBAND / 2)
+            await _poll(coordinator)
+            assert counts[TANK.key] == 0
+            assert coordinator._published[slot] == published
+            # The snapshot has the new value; entities just are not told
+            assert coordinator.data.values[slot] > published
+            assert coordinator.publish_stats["suppressed_writes"] > suppressed
+            # Measured against the value last published, so a slow drift gets out
+            _nudge(fake, TEMP_DEADBAND / 2)
+            await _poll(coordinator)
+            assert counts[TANK.key] == 1
+            assert coordinator._published[slot] - published >= TEMP_DEADBAND
+
+    asyncio.run(run())
+
+
+def test_changes_outside_the_deadband_are_published(tmp_path):
+    async def run():
+        fake = FakeConnection(initial_registers())
+        async with polling(tmp_path, connection=fake, max_silence=SILENCE) as coordinator:
+            counts = await _listening(coordinator, TANK.key, "io_state")
+            slot = coordinator.decoder.index[TANK.key]
+
+            _nudge(fake, -2 * TEMP_DEADBAND)
+            await _poll(coordinator)
+            assert counts == {TANK.key: 1, "io_state": 0}
+            assert coordinator._published[slot] == coordinator.data.values[slot]
+            # Without a deadband any change is published
+            io_state = next(p for p in REGISTERS if p.key == "io_state")
+            fake.registers[io_state.addr] ^= 1
+            await _poll(coordinator)
+            assert counts == {TANK.key: 1, "io_state": 1}
+            # Unchanged: nothing
+            await _poll(coordinator)
+            assert counts == {TANK.key: 1, "io_state": 1}
+
+    asyncio.run(run())
+
+
+def test_unchanged_values_are_published_after_max_silence(tmp_path):
+    async def run():
+        fake = FakeConnection(initial_registers())
+        async with polling(tmp_path, connection=fake, max_silence=SILENCE) as coordinator:
+            counts = await _listening(coordinator, TANK.key, "io_state")
+            for _ in range(SILENCE // 10 - 1):
+                await _poll(coordinator, 10)
+            assert counts == {TANK.key: 0, "io_state": 0}
+            # A change inside the deadband is published as well once the key has been silent long enough
+            _nudge(fake, TEMP_DEADBAND / 2)
+            await _poll(coordinator, 10)
+            assert counts == {TANK.key: 1, "io_state": 1}
+            # And the silence is counted from there
+            await _poll(coordinator, SILENCE - 1)
+            assert counts == {TANK.key: 1, "io_state": 1}
+            await _poll(coordinator, 1)
+            assert counts == {TANK.key: 2, "io_state": 2}
+
+    asyncio.run(run())
+
+
+def test_diff_of_missing_values(tmp_path):
+    async def run():
+        fake = FakeConnection(initial_registers())
+        async with polling(tmp_path, connection=fake, max_silence=SILENCE) as coordinator:
+            await coordinator.async_refresh()
+            slot = coordinator.decoder.index[TANK.key]
+            now = coordinator.clock()
+            values = list(coordinator.data.values)
+            # Going unknown and coming back are changes, whatever the deadband
+            values[slot] = None
+            assert coordinator._diff(values, [slot], now) == {TANK.key}
+            values[slot] = coordinator.data.values[slot]
+            assert coordinator._diff(values, [slot], now) == {TANK.key}
+            assert coordinator._diff(values, [slot], now) == set()
+
+    asyncio.run(run())
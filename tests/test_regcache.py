@@ -0,0 +1,58 @@
+"""The raw register cache: pages, ages, stale spans and invalidation."""
+from __future__ import annotations
+
+import math
+
+from spirala_heat_pump import regcache
+from spirala_heat_pump.regcache import RegisterCache
+
+PAGE = regcache._PAGE
+
+
+def test_store_and_read_across_pages():
+    cache = RegisterCache()
+    assert cache.size == 0
+    start = PAGE - 3
+    cache.store(start, [1, 2, 3, 4, 5], 10.0)
+    assert cache.size == 2 * PAGE
+    assert cache.read(start, 5) == ([1, 2, 3, 4, 5], 10.0)
+    # Never seen: None, and the range is as old as it gets
+    values, seen = cache.read(start - 1, 7)
+    assert values == [None, 1, 2, 3, 4, 5, None] and seen == -math.inf
+    values, seen = cache.read(5 * PAGE, 2)
+    assert values == [None, None] and seen == -math.inf
+    # The oldest register gives the age of the range
+    cache.store(start + 1, [20, 30], 15.0)
+    assert cache.read(start, 5) == ([1, 20, 30, 4, 5], 10.0)
+    assert cache.read(start + 1, 2) == ([20, 30], 15.0)
+
+
+def test_stale_is_the_smallest_span_to_read():
+    cache = RegisterCache()
+    cache.store(0, list(range(20)), 10.0)
+    cache.store(5, [0] * 3, 20.0)
+    cache.store(12, [0] * 2, 20.0)
+    assert cache.stale(5, 3, 15.0) is None
+    assert cache.stale(0, 20, 15.0) == (0, 20)
+    assert cache.stale(5, 9, 15.0) == (8, 4)
+    assert cache.stale(5, 9, 5.0) is None
+    assert (cache.hits, cache.misses) == (2, 2)
+    # Registers on a page never seen
+    assert cache.stale(PAGE - 2, 4, 0.0) == (PAGE - 2, 4)
+    assert cache.stale(10, 4 * PAGE, 0.0) == (20, 4 * PAGE - 10)
+
+
+def test_invalidated_registers_are_stale_whatever_the_age():
+    cache = RegisterCache()
+    cache.store(0, [7] * 10, 10.0)
+    cache.invalidate(3, 2)
+    assert cache.read(0, 10) == ([7, 7, 7, None, None, 7, 7, 7, 7, 7], -math.inf)
+    assert cache.stale(0, 10, 5.0) == (3, 2)
+    # Even when any age would do
+    assert cache.stale(0, 10, -math.inf) == (3, 2)
+    assert cache.stale(5, 5, -math.inf) is None
+    # Invalidating registers on a page never seen allocates nothing
+    cache.invalidate(3 * PAGE, 10)
+    assert cache.size == PAGE
+    cache.store(3, [8, 9], 12.0)
+    assert cache.read(0, 10) == ([7, 7, 7, 8, 9, 7, 7, 7, 7, 7], 10.0)
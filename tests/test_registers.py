@@ -0,0 +1,119 @@
+"""The register map: validation and the per-model overrides."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from common import FakeConnection, polling
+from simulator import initial_registers
+from spirala_heat_pump import registers
+from spirala_heat_pump.const import DEFAULT_SLOW_SCAN_SECS
+from spirala_heat_pump.identity import IDENTITY_ADDR, IDENTITY_COUNT
+from spirala_heat_pump.registers import REGISTERS, Point, schema_for, validate
+
+SETPOINT = next(p for p in REGISTERS if p.key == "setpoint_1")
+IO_STATE = next(p for p in REGISTERS if p.key == "io_state")
+
+
+def test_shipped_map_is_valid():
+    assert validate(REGISTERS) == REGISTERS
+
+
+def test_rejects_overlapping_registers():
+    with pytest.raises(ValueError, match="overlaps setpoint_1 at register"):
+        validate([*REGISTERS, Point("extra", SETPOINT.addr)])
+    # A two-register value running into the next point
+    with pytest.raises(ValueError, match="overlaps"):
+        validate([Point("a", 10, words=2), Point("b", 11)])
+    with pytest.raises(ValueError, match="Duplicate"):
+        validate([Point("a", 10), Point("a", 11)])
+    # Bits share their word's register
+    validate([Point("w", 10), Point("w_0", 10, word="w", bit=0), Point("w_1", 10, word="w", bit=1)])
+
+
+@pytest.mark.parametrize("point", [
+    Point("negative", -1),
+    Point("past_the_end", 65535, words=2),
+    Point("no_words", 10, words=0),
+])
+def test_rejects_registers_out_of_range(point):
+    with pytest.raises(ValueError, match="out of range"):
+        validate([point])
+
+
+def test_last_register_is_in_range():
+    validate([Point("last", 65534, words=2)])
+
+
+@pytest.mark.parametrize("bit", [
+    Point("w_16", 10, word="w", bit=16),
+    Point("w_none", 10, word="w"),
+    Point("w_0_again", 10, word="w", bit=0),
+])
+def test_rejects_bad_bits(bit):
+    with pytest.raises(ValueError, match="bad or duplicate bit"):
+        validate([Point("w", 10), Point("w_0", 10, word="w", bit=0), bit])
+
+
+def test_rejects_bits_of_unknown_words():
+    with pytest.raises(ValueError, match="unknown word"):
+        validate([Point("w", 10), Point("x_0", 10, word="x", bit=0)])
+    # The word has to be at the bit's address
+    with pytest.raises(ValueError, match="unknown word"):
+        validate([Point("w", 10), Point("w_0", 11, word="w", bit=0)])
+
+
+def test_rejects_bad_point_settings():
+    with pytest.raises(ValueError, match="unknown poll tier"):
+        validate([Point("a", 10, tier="hourly")])
+    with pytest.raises(ValueError, match="only single registers"):
+        validate([Point("a", 10, words=2, writable=True)])
+    with pytest.raises(ValueError, match="minimum and maximum"):
+        validate([Point("a", 10, platform="number", minimum=0)])
+
+
+def _model_overrides(monkeypatch, overrides) -> None:
+    monkeypatch.setattr(registers, "_MODEL_SCHEMAS", {
+        model: registers._apply(REGISTERS, model_overrides) for model, model_overrides in overrides.items()
+    })
+
+
+def test_schema_for_applies_model_overrides(monkeypatch):
+    _model_overrides(monkeypatch, {"WW-B": {"setpoint_1": {"maximum": 60}}})
+    points = {p.key: p for p in schema_for("WW-B")}
+    assert points["setpoint_1"] == SETPOINT._replace(maximum=60)
+    # Same keys in the same order, so snapshot slots do not move between models
+    assert [p.key for p in schema_for("WW-B")] == [p.key for p in REGISTERS]
+    assert all(points[p.key] == p for p in REGISTERS if p.key != "setpoint_1")
+    # Other and unknown models use the shipped map
+    assert schema_for("WW-A") is REGISTERS
+    assert schema_for(None) is REGISTERS
+
+
+def test_coordinator_switches_to_the_model_map(tmp_path, monkeypatch):
+    _model_overrides(monkeypatch, {"WW-B": {"setpoint_1": {"scale": 1 / 128, "maximum": 60}}})
+
+    async def run():
+        image = initial_registers()
+        image[IDENTITY_ADDR:IDENTITY_ADDR + IDENTITY_COUNT] = [ord("B") << 8] + [0] * (IDENTITY_COUNT - 1)
+        fake = FakeConnection(image)
+        async with polling(tmp_path, connection=fake) as coordinator:
+            await coordinator.async_refresh()
+            assert coordinator.identity.model == "WW-B"
+            assert coordinator.points["setpoint_1"].maximum == 60
+            slot = coordinator.decoder.index["setpoint_1"]
+            coordinator.clock.now += DEFAULT_SLOW_SCAN_SECS
+            await coordinator.async_refresh()
+            assert coordinator.data.values[slot] == image[SETPOINT.addr] / 128
+
+    asyncio.run(run())
+
+
+def test_overrides_are_validated():
+    with pytest.raises(ValueError, match="unknown points"):
+        registers._apply(REGISTERS, {"no_such_point": {"addr": 1}})
+    with pytest.raises(ValueError, match="overlaps"):
+        registers._apply(REGISTERS, {"setpoint_1": {"addr": IO_STATE.addr}})
+    with pytest.raises(ValueError, match="out of range"):
+        registers._apply(REGISTERS, {"setpoint_1": {"addr": 70000}})
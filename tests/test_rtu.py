@@ -0,0 +1,137 @@
+"""RTU links: real frames over a pty and RTU over TCP, and read sizes derived from the baud rate."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from common import free_port
+from simulator import RtuBus
+from spirala_heat_pump import connection
+from spirala_heat_pump.config_flow import explicit_plan_options
+from spirala_heat_pump.const import (
+    BAUDRATES, DEFAULT_MAX_REGS_PER_READ, DEFAULT_READ_GAP, MAX_REGS_PER_READ, RTU_MAX_FRAME_SECS,
+    RTU_TURNAROUND_SECS, TRANSPORT_RTU_OVER_TCP, TRANSPORT_SERIAL, TRANSPORT_TCP,
+)
+from spirala_heat_pump.planner import plan_defaults, rtu_char_secs, rtu_read_secs, rtu_silent_secs
+
+BAUDRATE = 19200
+
+
+def _images(units: list[int]) -> dict[int, list[int]]:
+    return {unit: [unit * 1000 + addr for addr in range(200)] for unit in units}
+
+
+async def _exercise(conn: connection.SpiralaConnection) -> None:
+    """Reads and writes two units on the bus through one connection."""
+    max_count, _ = plan_defaults({"transport": conn.transport, "baudrate": BAUDRATE})
+    for unit in (1, 2):
+        rr, rtt = await conn.read_holding_registers(unit, 0, max_count)
+        assert rr.registers == _images([unit])[unit][:max_count]
+        # The bus is paced at the baud rate, so no read beats its wire time
+        assert rtt >= rtu_read_secs(BAUDRATE, max_count) - 2 * rtu_silent_secs(BAUDRATE)
+    rr, _ = await conn.write_register(2, 10, 4321)
+    assert not rr.isError()
+    values = [(await conn.read_holding_registers(unit, 10, 1))[0].registers[0] for unit in (1, 2)]
+    assert values == [1010, 4321]
+    # Back to back frames from both units, kept apart by the bus silence
+    results = await asyncio.gather(*(conn.read_holding_registers(unit, 0, 4) for unit in (1, 2) for _ in range(3)))
+    assert all(not rr.isError() for rr, _ in results)
+    assert conn.reconnects == 0
+
+
+def test_rtu_over_serial_port():
+    async def run():
+        bus = await RtuBus([1, 2], BAUDRATE, images=_images([1, 2])).start()
+        conn = connection.SpiralaConnection(bus.device, 0, TRANSPORT_SERIAL, baudrate=BAUDRATE)
+        assert conn.bus_silence == rtu_silent_secs(BAUDRATE)
+        try:
+            await _exercise(conn)
+        finally:
+            conn.close()
+            await bus.close()
+
+    asyncio.run(run())
+
+
+def test_rtu_over_tcp():
+    async def run():
+        port = free_port()
+        bus = await RtuBus([1, 2], BAUDRATE, images=_images([1, 2])).start()
+        await bus.start_tcp("127.0.0.1", port)
+        conn = connection.SpiralaConnection("127.0.0.1", port, TRANSPORT_RTU_OVER_TCP, baudrate=BAUDRATE)
+        try:
+            await _exercise(conn)
+        finally:
+            conn.close()
+            await bus.close()
+
+    asyncio.run(run())
+
+
+def test_plan_defaults_over_tcp():
+    assert plan_defaults({}) == (DEFAULT_MAX_REGS_PER_READ, DEFAULT_READ_GAP)
+    assert plan_defaults({"transport": TRANSPORT_TCP, "baudrate": 1200}) == (
+        DEFAULT_MAX_REGS_PER_READ, DEFAULT_READ_GAP
+    )
+
+
+def _response_secs(baudrate: int, count: int) -> float:
+    """Wire time of a read response: address, function, byte count, registers and CRC."""
+    return (5 + 2 * count) * rtu_char_secs(baudrate)
+
+
+@pytest.mark.parametrize("baudrate", BAUDRATES)
+@pytest.mark.parametrize("transport", [TRANSPORT_RTU_OVER_TCP, TRANSPORT_SERIAL])
+def test_plan_defaults_over_rtu(transport, baudrate):
+    max_count, gap = plan_defaults({"transport": transport, "baudrate": baudrate})
+    # The largest response that fits in RTU_MAX_FRAME_SECS, within the Modbus limit
+    assert 1 <= max_count <= MAX_REGS_PER_READ
+    assert _response_secs(baudrate, max_count) <= RTU_MAX_FRAME_SECS or max_count == 1
+    assert max_count == MAX_REGS_PER_READ or _response_secs(baudrate, max_count + 1) > RTU_MAX_FRAME_SECS
+    # A hole is bridged while its registers cost no more wire time than another request
+    overhead = rtu_read_secs(baudrate, 0) + RTU_TURNAROUND_SECS
+    char = rtu_char_secs(baudrate)
+    assert 0 <= gap <= max_count
+    assert 2 * gap * char <= overhead
+    assert gap == max_count or 2 * (gap + 1) * char > overhead
+
+
+def test_plan_defaults_follow_the_baud_rate():
+    sizes = [plan_defaults({"transport": TRANSPORT_SERIAL, "baudrate": b})[0] for b in sorted(BAUDRATES)]
+    assert sizes == sorted(sizes) and sizes[0] < sizes[-1] == MAX_REGS_PER_READ
+    assert plan_defaults({"transport": TRANSPORT_SERIAL}) == plan_defaults(
+        {"transport": TRANSPORT_SERIAL, "baudrate": 9600}
+    )
+
+
+def test_derived_read_sizes_are_not_stored():
+    data = {"transport": TRANSPORT_SERIAL, "device": "/dev/ttyUSB0", "baudrate": 9600}
+    max_count, gap = plan_defaults(data)
+    # Submitted as shown, with a new baud rate: re-derived for 1200 baud
+    options = explicit_plan_options(data, {"max_regs_per_read": max_count, "read_gap": gap, "baudrate": 1200})
+    assert options == {"baudrate": 1200}
+    # Left at the defaults for the new rate
+    slow_count, slow_gap = plan_defaults({**data, "baudrate": 1200})
+    options = explicit_plan_options(data, {"max_regs_per_read": slow_count, "read_gap": slow_gap, "baudrate": 1200})
+    assert options == {"baudrate": 1200}
+
+
+def test_explicit_read_sizes_are_kept():
+    data = {"transport": TRANSPORT_SERIAL, "device": "/dev/ttyUSB0", "baudrate": 9600}
+    max_count, gap = plan_defaults(data)
+    options = explicit_plan_options(data, {"max_regs_per_read": 20, "read_gap": gap, "baudrate": 9600})
+    assert options == {"max_regs_per_read": 20, "baudrate": 9600}
+    # A stored override is shown and submitted again across a baud rate change
+    stored = {**data, **options}
+    options = explicit_plan_options(stored, {"max_regs_per_read": 20, "read_gap": gap, "baudrate": 38400})
+    assert options == {"max_regs_per_read": 20, "baudrate": 38400}
+
+
+def test_stored_derived_sizes_are_dropped_on_save():
+    # Entries saved before only derived values were dropped carry them in their options
+    data = {"transport": TRANSPORT_SERIAL, "device": "/dev/ttyUSB0", "baudrate": 9600}
+    max_count, gap = plan_defaults(data)
+    stored = {**data, "max_regs_per_read": max_count, "read_gap": gap}
+    options = explicit_plan_options(stored, {"max_regs_per_read": max_count, "read_gap": gap, "baudrate": 2400})
+    assert options == {"baudrate": 2400}
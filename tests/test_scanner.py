@@ -0,0 +1,89 @@
+"""Register sweeps: bisecting around holes, and keeping the results of a sweep that is cut short."""
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+
+from common import FakeConnection, FakeResponse, polling
+from spirala_heat_pump import scanner as scanner_mod
+from spirala_heat_pump.connection import ModbusConnectionError
+from spirala_heat_pump.scanner import RegisterScanner
+
+
+class SweptConnection(FakeConnection):
+    """Reads touching `holes` are illegal addresses; after `drop_after` reads the link is gone."""
+
+    holes: set[int] = set()
+    drop_after: int | None = None
+
+    async def read_holding_registers(self, unit_id: int, address: int, count: int):
+        if self.drop_after is not None and len(self.requests) >= self.drop_after:
+            raise ModbusConnectionError("gone")
+        if self.holes & set(range(address, address + count)):
+            self.requests.append(("read", address, count))
+            rr = FakeResponse(error=True)
+            rr.exception_code = scanner_mod._ILLEGAL_ADDRESS
+            return rr, 0.001
+        return await super().read_holding_registers(unit_id, address, count)
+
+
+@pytest.fixture(autouse=True)
+def _no_gap(monkeypatch):
+    monkeypatch.setattr(scanner_mod, "SCAN_GAP_SECS", 0.0)
+
+
+def _stored(tmp_path, coordinator) -> dict:
+    path = tmp_path / ".storage" / f"spirala_heat_pump.{coordinator.storage_id}.scan"
+    return json.loads(path.read_text())["data"]
+
+
+def test_sweep_bisects_down_to_holes(tmp_path):
+    async def run():
+        fake = SweptConnection(list(range(1000, 1300)))
+        fake.holes = {205}
+        async with polling(tmp_path, connection=fake) as coordinator:
+            scanner = coordinator.scanner
+            report = await scanner.async_sweep(200, 264)
+            assert report["invalid"] == [[205, 206]]
+            assert set(scanner.registers) == set(range(200, 264)) - {205}
+            assert scanner.registers[210][1] == 1210
+            # Halving down to the hole, then growing again after good reads
+            assert fake.requests[:10] == [
+                ("read", 200, 32), ("read", 200, 16), ("read", 200, 8), ("read", 200, 4),
+                ("read", 204, 8), ("read", 204, 4), ("read", 204, 2), ("read", 204, 1),
+                ("read", 205, 2), ("read", 205, 1),
+            ]
+            assert len(fake.requests) < 64
+            # Swept registers are not read again unless asked to
+            fake.requests.clear()
+            await scanner.async_sweep(200, 264)
+            assert fake.requests == []
+            await scanner.async_sweep(200, 264, rescan=True)
+            assert fake.requests
+
+    asyncio.run(run())
+
+
+def test_interrupted_sweep_keeps_its_results(tmp_path):
+    async def run():
+        fake = SweptConnection(list(range(1000, 1300)))
+        fake.drop_after = 1
+        async with polling(tmp_path, connection=fake) as coordinator:
+            with pytest.raises(ModbusConnectionError):
+                await coordinator.scanner.async_sweep(200, 264)
+            swept = set(coordinator.scanner.registers)
+            assert swept == set(range(200, 232))
+            stored = _stored(tmp_path, coordinator)
+            assert {int(addr) for addr in stored["registers"]} == swept
+
+            # After a restart the sweep goes on where it stopped
+            scanner = RegisterScanner(coordinator)
+            fake.drop_after = None
+            fake.requests.clear()
+            report = await scanner.async_sweep(200, 264)
+            assert report["readable"] == 64
+            assert fake.requests == [("read", 232, 32)]
+
+    asyncio.run(run())
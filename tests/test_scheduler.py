@@ -0,0 +1,164 @@
+"""The poll scheduler: a fixed grid of ticks, skipped overruns, the scan rates and merged refreshes."""
+from __future__ import annotations
+
+import asyncio
+
+from common import FakeConnection, polling
+from simulator import initial_registers
+from spirala_heat_pump.registers import REGISTERS
+
+SCAN, IDLE = 1.0, 5.0
+IO_STATE = next(p.addr for p in REGISTERS if p.key == "io_state")
+CONTACTOR = 1 << 5
+
+
+class LoopTime:
+    """Stands in for hass.loop in the scheduler: a time set by the test and the tick it scheduled."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.tick: tuple[float, object] | None = None
+
+    def time(self) -> float:
+        return self.now
+
+    def call_at(self, when: float, callback):
+        self.tick = (when, callback)
+        return self
+
+    def cancel(self) -> None:
+        self.tick = None
+
+
+class Hass:
+    """The test's Home Assistant, with the scheduler looking at LoopTime."""
+
+    def __init__(self, hass, loop: LoopTime) -> None:
+        self._hass = hass
+        self.loop = loop
+
+    def __getattr__(self, name):
+        return getattr(self._hass, name)
+
+
+class GatedConnection(FakeConnection):
+    """Reads wait for `gate` while it is set, keeping a poll on the bus."""
+
+    gate: asyncio.Event | None = None
+
+    async def read_holding_registers(self, unit_id: int, address: int, count: int):
+        if self.gate is not None:
+            await self.gate.wait()
+        return await super().read_holding_registers(unit_id, address, count)
+
+
+async def _started(coordinator) -> LoopTime:
+    loop = LoopTime()
+    coordinator.hass = Hass(coordinator.hass, loop)
+    # HA only schedules refreshes while anyone listens
+    coordinator.async_add_listener(lambda: None)
+    await coordinator.async_refresh()
+    return loop
+
+
+async def _fire(coordinator, loop: LoopTime, at: float) -> None:
+    """Run the scheduled tick with the loop at `at`."""
+    when, callback = loop.tick
+    assert at >= when
+    loop.now = at
+    callback()
+    await asyncio.sleep(0.01)
+    assert coordinator._poll_task is None
+
+
+def test_ticks_stay_on_the_grid(tmp_path):
+    async def run():
+        fake = FakeConnection(initial_registers())
+        async with polling(tmp_path, connection=fake, scan_interval=SCAN, idle_scan_interval=IDLE) as coordinator:
+            loop = await _started(coordinator)
+            assert loop.tick[0] == IDLE
+            polls = coordinator.publish_stats["polls"]
+            # However late a tick fires, and however long its poll takes, the next is on the grid
+            for at in (5.3, 10.0, 15.9, 20.01):
+                await _fire(coordinator, loop, at)
+            assert coordinator.publish_stats["polls"] == polls + 4
+            assert loop.tick[0] == 25.0
+            assert coordinator.stats.skipped_ticks == 0
+
+    asyncio.run(run())
+
+
+def test_overrun_skips_the_missed_ticks(tmp_path):
+    async def run():
+        fake = FakeConnection(initial_registers())
+        async with polling(tmp_path, connection=fake, scan_interval=SCAN, idle_scan_interval=IDLE) as coordinator:
+            loop = await _started(coordinator)
+            # Ticks at 10 and 15 were missed; the next is the first one still ahead
+            await _fire(coordinator, loop, 17.0)
+            assert loop.tick[0] == 20.0
+            assert coordinator.stats.skipped_ticks == 2
+            # Landing on a tick counts it as missed too, rather than firing it at once
+            await _fire(coordinator, loop, 25.0)
+            assert loop.tick[0] == 30.0
+            assert coordinator.stats.skipped_ticks == 3
+
+    asyncio.run(run())
+
+
+def test_scan_rate_follows_the_compressor(tmp_path):
+    async def run():
+        fake = FakeConnection(initial_registers())
+        fake.registers[IO_STATE] = 0
+        async with polling(tmp_path, connection=fake, scan_interval=SCAN, idle_scan_interval=IDLE) as coordinator:
+            loop = await _started(coordinator)
+            assert not coordinator.compressor_running
+            assert coordinator.update_interval.total_seconds() == IDLE
+
+            fake.registers[IO_STATE] = CONTACTOR
+            await _fire(coordinator, loop, 5.0)
+            assert coordinator.compressor_running
+            assert coordinator.update_interval.total_seconds() == SCAN
+            assert loop.tick[0] == 6.0
+            for at in (6.0, 7.2, 8.0):
+                await _fire(coordinator, loop, at)
+            assert loop.tick[0] == 9.0
+
+            fake.registers[IO_STATE] = 0
+            await _fire(coordinator, loop, 9.0)
+            assert coordinator.update_interval.total_seconds() == IDLE
+            assert loop.tick[0] == 14.0
+            assert coordinator.stats.skipped_ticks == 0
+
+    asyncio.run(run())
+
+
+def test_refresh_requests_merge_with_the_poll_on_the_bus(tmp_path):
+    async def run():
+        fake = GatedConnection(initial_registers())
+        async with polling(tmp_path, connection=fake, scan_interval=SCAN, idle_scan_interval=IDLE) as coordinator:
+            loop = await _started(coordinator)
+            polls = coordinator.publish_stats["polls"]
+
+            fake.gate = asyncio.Event()
+            loop.now = 1.0
+            poll = asyncio.ensure_future(coordinator.async_refresh())
+            await asyncio.sleep(0.01)
+            assert coordinator.polling
+            # Both return at once and are folded into one poll after the one on the bus
+            await coordinator.async_request_refresh()
+            await coordinator.async_request_refresh()
+            assert coordinator.stats.merged_refreshes == 2
+            fake.gate.set()
+            await poll
+            await asyncio.sleep(0.01)
+            assert not coordinator.polling
+            assert coordinator.publish_stats["polls"] == polls + 2
+            # Refreshes off the grid leave the tick where it was
+            assert loop.tick[0] == IDLE
+
+            # Without a poll on the bus a request polls at once
+            await coordinator.async_request_refresh()
+            assert coordinator.publish_stats["polls"] == polls + 3
+            assert coordinator.stats.merged_refreshes == 2
+
+    asyncio.run(run())
@@ -0,0 +1,167 @@
+"""The read_registers and write_registers services, against a fake unit."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+
+import spirala_heat_pump
+from common import FakeConnection, FakeResponse, polling
+from simulator import initial_registers
+from spirala_heat_pump.const import DOMAIN, SERVICE_READ_REGISTERS, SERVICE_WRITE_REGISTERS
+
+
+async def _call(coordinator, service: str, **data):
+    return await coordinator.hass.services.async_call(
+        DOMAIN, service, data, blocking=True, return_response=True
+    )
+
+
+async def _loaded(coordinator) -> None:
+    await spirala_heat_pump.async_setup(coordinator.hass, {})
+    coordinator.hass.data.setdefault(DOMAIN, {})["test"] = coordinator
+
+
+def test_read_registers_from_the_cache_or_the_unit(tmp_path):
+    async def run():
+        fake = FakeConnection(initial_registers())
+        async with polling(tmp_path, connection=fake) as coordinator:
+            await _loaded(coordinator)
+            clock = coordinator.clock
+            result = await _call(coordinator, SERVICE_READ_REGISTERS, address=100, count=4)
+            assert result == {"address": 100, "registers": fake.registers[100:104], "age": 0.0, "cached": False}
+            assert fake.requests == [("read", 100, 4)]
+
+            clock.now += 3.5
+            result = await _call(coordinator, SERVICE_READ_REGISTERS, address=100, count=4)
+            assert result["age"] == 3.5 and result["cached"]
+            assert len(fake.requests) == 1
+            # Only the registers that are too old, or never seen, go on the wire
+            fake.requests.clear()
+            coordinator.register_cache.store(102, fake.registers[102:104], clock())
+            result = await _call(coordinator, SERVICE_READ_REGISTERS, address=100, count=6, max_age=1)
+            assert fake.requests == [("read", 100, 6)]
+            fake.requests.clear()
+            clock.now += 2
+            coordinator.register_cache.store(101, fake.registers[101:106], clock())
+            result = await _call(coordinator, SERVICE_READ_REGISTERS, address=100, count=6, max_age=1)
+            assert fake.requests == [("read", 100, 1)]
+            assert result["age"] == 0.0 and not result["cached"]
+
+    asyncio.run(run())
+
+
+def test_invalidated_registers_are_read_whatever_the_max_age(tmp_path):
+    async def run():
+        fake = FakeConnection(initial_registers())
+        async with polling(tmp_path, connection=fake) as coordinator:
+            await _loaded(coordinator)
+            await _call(coordinator, SERVICE_READ_REGISTERS, address=100, count=4)
+            coordinator.register_cache.invalidate(101, 1)
+            fake.requests.clear()
+            result = await _call(coordinator, SERVICE_READ_REGISTERS, address=100, count=4, max_age=float("inf"))
+            assert fake.requests == [("read", 101, 1)]
+            assert result["registers"] == fake.registers[100:104]
+            assert result["age"] == 0.0
+
+    asyncio.run(run())
+
+
+class WritingConnection(FakeConnection):
+    """While each read is out a write lands on the next register in `writes`."""
+
+    writes: list[int] = []
+    coordinator = None
+
+    async def read_holding_registers(self, unit_id: int, address: int, count: int):
+        if self.writes:
+            self.coordinator.register_cache.invalidate(self.writes.pop(0), 1)
+        return await super().read_holding_registers(unit_id, address, count)
+
+
+def test_registers_written_during_the_read_are_read_again(tmp_path):
+    async def run():
+        fake = WritingConnection(initial_registers())
+        async with polling(tmp_path, connection=fake) as coordinator:
+            await _loaded(coordinator)
+            fake.coordinator = coordinator
+            clock = coordinator.clock
+            await _call(coordinator, SERVICE_READ_REGISTERS, address=104, count=4)
+
+            clock.now += 60
+            coordinator.register_cache.store(104, fake.registers[104:106], clock())
+            fake.requests.clear()
+            fake.writes = [105]
+            result = await _call(coordinator, SERVICE_READ_REGISTERS, address=104, count=4)
+            assert fake.requests == [("read", 106, 2), ("read", 105, 1)]
+            assert result["registers"] == fake.registers[104:108] and result["age"] == 0.0
+
+            # Another write during the second read: unknown, never an infinite age
+            clock.now += 60
+            coordinator.register_cache.store(104, fake.registers[104:106], clock())
+            fake.requests.clear()
+            fake.writes = [105, 104]
+            result = await _call(coordinator, SERVICE_READ_REGISTERS, address=104, count=4)
+            assert fake.requests == [("read", 106, 2), ("read", 105, 1)]
+            assert result["registers"] == [None, *fake.registers[105:108]] and result["age"] is None
+
+    asyncio.run(run())
+
+
+def test_read_registers_errors(tmp_path):
+    async def run():
+        fake = FakeConnection(initial_registers())
+        async with polling(tmp_path, connection=fake) as coordinator:
+            await _loaded(coordinator)
+            fake.fail_reads = {100}
+            with pytest.raises(HomeAssistantError, match="Register read failed"):
+                await _call(coordinator, SERVICE_READ_REGISTERS, address=100, count=4)
+            with pytest.raises(ServiceValidationError):
+                await _call(coordinator, SERVICE_READ_REGISTERS, address=65530, count=10)
+            with pytest.raises(ServiceValidationError):
+                await _call(coordinator, SERVICE_READ_REGISTERS, address=1, config_entry_id="other")
+
+    asyncio.run(run())
+
+
+class RejectingConnection(FakeConnection):
+    async def write_register(self, unit_id: int, address: int, value: int):
+        self.requests.append(("write", address, [value]))
+        return FakeResponse(error=True), 0.001
+
+
+def test_write_registers_returns_the_read_back(tmp_path):
+    async def run():
+        fake = FakeConnection(initial_registers())
+        # The unit clamps the second register
+        fake.stored = {101: 500}
+        async with polling(tmp_path, connection=fake) as coordinator:
+            await _loaded(coordinator)
+            result = await _call(coordinator, SERVICE_WRITE_REGISTERS, address=100, values=[1, 2, 3])
+            # Right away, not debounced
+            assert fake.requests == [("write_multiple", 100, [1, 2, 3]), ("read", 100, 3)]
+            assert result == {"address": 100, "registers": [1, 500, 3]}
+            # The read-back is in the cache
+            fake.requests.clear()
+            result = await _call(coordinator, SERVICE_READ_REGISTERS, address=100, count=3)
+            assert result["registers"] == [1, 500, 3] and result["cached"]
+            assert fake.requests == []
+
+    asyncio.run(run())
+
+
+def test_rejected_write_fails_the_call(tmp_path):
+    async def run():
+        fake = RejectingConnection(initial_registers())
+        async with polling(tmp_path, connection=fake) as coordinator:
+            await _loaded(coordinator)
+            before = fake.registers[100]
+            with pytest.raises(HomeAssistantError, match="Register write failed"):
+                await _call(coordinator, SERVICE_WRITE_REGISTERS, address=100, values=[1])
+            assert fake.requests == [("write", 100, [1]), ("read", 100, 1)]
+            assert fake.registers[100] == before
+            with pytest.raises(ServiceValidationError):
+                await _call(coordinator, SERVICE_WRITE_REGISTERS, address=65535, values=[1, 2])
+
+    asyncio.run(run())
@@ -0,0 +1,95 @@
+"""Entry setup: starting from the cached snapshot, and reloading when the options change."""
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+from homeassistant import config_entries
+
+from common import FakeConnection, polling, running_hass
+from simulator import initial_registers
+import spirala_heat_pump
+from spirala_heat_pump.const import DOMAIN
+from spirala_heat_pump.coordinator import SpiralaCoordinator
+
+
+async def _cached(tmp_path, **changes) -> dict:
+    """What a coordinator polling the simulator saves in its Store, with `changes` to the values."""
+    async with polling(tmp_path, connection=FakeConnection(initial_registers())) as coordinator:
+        await coordinator.async_refresh()
+        cache = coordinator._cache_data()
+    cache["values"].update(changes)
+    return cache
+
+
+def test_setup_restores_the_cached_snapshot(tmp_path):
+    async def run():
+        cache = await _cached(tmp_path, tank_temp_1=99.0, no_longer_a_point=1)
+        assert cache["serial"]
+        fake = FakeConnection(initial_registers())
+        async with polling(tmp_path, connection=fake, enable_history=False, enable_journal=False) as coordinator:
+            coordinator.config_entry = SimpleNamespace(entry_id="test")
+            await coordinator._store.async_save(cache)
+            await coordinator.async_setup()
+            # Entities can be built before the unit has answered
+            assert coordinator.started_from_cache and fake.requests == []
+            assert coordinator.data.get("tank_temp_1") == 99.0
+            assert coordinator.data.get("supply_temp") == cache["values"]["supply_temp"]
+            assert "no_longer_a_point" not in coordinator.data.index
+            assert coordinator.identity.serial == cache["serial"] and not coordinator.identity.confirmed
+            # The poll in the background replaces the cached values
+            await coordinator.hass.async_block_till_done()
+            assert fake.requests
+            tank = coordinator.points["tank_temp_1"]
+            assert coordinator.data.get("tank_temp_1") == fake.registers[tank.addr] * tank.scale
+
+    asyncio.run(run())
+
+
+def test_cache_without_values(tmp_path):
+    async def run():
+        async with polling(tmp_path, connection=FakeConnection(initial_registers())) as coordinator:
+            assert await coordinator.async_load_cache() is False
+            assert coordinator.data is None and coordinator.identity.serial is None
+            # The identity is restored even without a snapshot to start from
+            await coordinator._store.async_save({"serial": "SP1234", "model": "WW-A", "values": {}})
+            assert await coordinator.async_load_cache() is False
+            assert coordinator.data is None and not coordinator.started_from_cache
+            assert coordinator.identity.serial == "SP1234"
+
+    asyncio.run(run())
+
+
+def test_changing_an_option_reloads_the_entry(tmp_path):
+    async def run():
+        async with running_hass(tmp_path) as hass:
+            hass.config_entries = config_entries.ConfigEntries(hass, {})
+            entry = config_entries.ConfigEntry(
+                version=1, minor_version=1, domain=DOMAIN, title="Heat pump",
+                data={"host": "127.0.0.1", "port": 502, "unit_id": 1}, source=config_entries.SOURCE_USER,
+                options={"enable_history": True},
+            )
+            hass.config_entries._entries[entry.entry_id] = entry
+            # As async_setup_entry registers it
+            entry.add_update_listener(spirala_heat_pump._async_options_updated)
+            reloads: list[str] = []
+
+            async def async_reload(entry_id: str) -> bool:
+                reloads.append(entry_id)
+                return True
+
+            hass.config_entries.async_reload = async_reload
+            hass.config_entries.async_update_entry(entry, options={"enable_history": True})
+            await hass.async_block_till_done()
+            assert reloads == []
+            hass.config_entries.async_update_entry(entry, options={"enable_history": False})
+            await hass.async_block_till_done()
+            assert reloads == [entry.entry_id]
+            # The coordinator of the reloaded entry is built with the new options
+            coordinator = SpiralaCoordinator(hass, entry)
+            try:
+                assert coordinator.history_enabled is False
+            finally:
+                await coordinator.async_close()
+
+    asyncio.run(run())
@@ -0,0 +1,39 @@
+"""Latency histograms: buckets and percentiles over the recent samples."""
+from __future__ import annotations
+
+from spirala_heat_pump.stats import RTT_BUCKETS_MS, ROLLING_SAMPLES, Histogram
+
+
+def test_percentiles_of_a_known_sequence():
+    h = Histogram()
+    assert h.percentile(50) is None
+    for ms in range(100, 0, -1):
+        h.add(ms)
+    # Nearest rank over the sorted samples, whatever order they came in
+    assert (h.percentile(0), h.percentile(50), h.percentile(95), h.percentile(100)) == (1, 51, 96, 100)
+    stats = h.as_dict()
+    assert (stats["count"], stats["mean_ms"], stats["min_ms"], stats["max_ms"]) == (100, 50.5, 1, 100)
+    assert (stats["p50_ms"], stats["p95_ms"]) == (51, 96)
+
+
+def test_percentiles_only_see_recent_samples():
+    h = Histogram()
+    for _ in range(ROLLING_SAMPLES):
+        h.add(1000.0)
+    for _ in range(ROLLING_SAMPLES):
+        h.add(2.0)
+    assert h.percentile(95) == 2.0
+    # Counts, extremes and buckets cover every sample
+    assert (h.count, h.min, h.max) == (2 * ROLLING_SAMPLES, 2.0, 1000.0)
+    assert sum(h.buckets) == h.count
+
+
+def test_buckets():
+    h = Histogram()
+    for ms in (0.5, 5, 5.1, 2000, 2000.1, 1e6):
+        h.add(ms)
+    buckets = h.as_dict()["buckets"]
+    # Upper bounds are inclusive, the last bucket is open-ended
+    assert buckets["<=5ms"] == 2 and buckets["<=10ms"] == 1
+    assert buckets[f"<={RTT_BUCKETS_MS[-1]}ms"] == 1
+    assert buckets[f">{RTT_BUCKETS_MS[-1]}ms"] == 2
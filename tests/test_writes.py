@@ -0,0 +1,177 @@
+"""Debounced writes: coalescing, FC16 fallback, read-back and the optimistic overlay."""
+from __future__ import annotations
+
+import asyncio
+
+from common import FakeConnection, polling
+from simulator import initial_registers
+from spirala_heat_pump import coordinator as coordinator_mod
+from spirala_heat_pump.const import DEFAULT_SLOW_SCAN_SECS
+
+# setpoint_1, setpoint_2 and setpoint_dhw are adjacent; diff_circuit_1 stands alone
+SETPOINTS = {18: "setpoint_1", 19: "setpoint_2", 20: "setpoint_dhw"}
+DIFF = 44
+
+
+def raw(celsius: float) -> int:
+    return round(celsius * 256)
+
+
+async def _flush(coordinator) -> None:
+    """Run the debounced flush now instead of after WRITE_DEBOUNCE_SECS."""
+    coordinator._unsub_write_flush()
+    await coordinator._async_flush_writes()
+
+
+def value(coordinator, key: str):
+    return coordinator.data.values[coordinator.decoder.index[key]]
+
+
+def test_adjacent_writes_go_out_as_one_request(tmp_path):
+    async def run():
+        fake = FakeConnection(initial_registers())
+        async with polling(tmp_path, connection=fake) as coordinator:
+            await coordinator.async_refresh()
+            notified = []
+            for key in (*SETPOINTS.values(), "diff_circuit_1"):
+                coordinator.async_add_listener(lambda key=key: notified.append(key), key)
+            fake.requests.clear()
+            await coordinator.async_write_register(18, raw(40))
+            await coordinator.async_write_register(20, raw(52))
+            await coordinator.async_write_register(19, raw(44))
+            # The last value per address wins
+            await coordinator.async_write_register(18, raw(41))
+            await coordinator.async_write_register(DIFF, 7)
+            assert fake.requests == []
+            # Shown right away
+            assert value(coordinator, "setpoint_1") == 41 and value(coordinator, "diff_circuit_1") == 7
+            await _flush(coordinator)
+            assert fake.requests == [
+                ("write_multiple", 18, [raw(41), raw(44), raw(52)]),
+                ("read", 18, 3),
+                ("write", DIFF, [7]),
+                ("read", DIFF, 1),
+            ]
+            assert fake.registers[18:21] == [raw(41), raw(44), raw(52)]
+            assert [value(coordinator, key) for key in SETPOINTS.values()] == [41, 44, 52]
+            assert set(notified) == {*SETPOINTS.values(), "diff_circuit_1"}
+            assert coordinator._pending_writes == {} and coordinator._inflight_writes == {}
+
+    asyncio.run(run())
+
+
+def test_debounce_timer_flushes(tmp_path, monkeypatch):
+    monkeypatch.setattr(coordinator_mod, "WRITE_DEBOUNCE_SECS", 0.05)
+
+    async def run():
+        fake = FakeConnection(initial_registers())
+        async with polling(tmp_path, connection=fake) as coordinator:
+            await coordinator.async_refresh()
+            fake.requests.clear()
+            await coordinator.async_write_register(DIFF, 6)
+            await coordinator.async_write_register(DIFF, 8)
+            await asyncio.sleep(0.02)
+            assert fake.requests == []
+            await asyncio.sleep(0.1)
+            assert fake.requests == [("write", DIFF, [8]), ("read", DIFF, 1)]
+
+    asyncio.run(run())
+
+
+def test_single_register_writes_without_fc16(tmp_path):
+    async def run():
+        fake = FakeConnection(initial_registers())
+        fake.fc16 = False
+        async with polling(tmp_path, connection=fake) as coordinator:
+            await coordinator.async_refresh()
+            fake.requests.clear()
+            for addr, celsius in zip(SETPOINTS, (30, 31, 32)):
+                await coordinator.async_write_register(addr, raw(celsius))
+            await _flush(coordinator)
+            assert fake.requests == [
+                ("write_multiple", 18, [raw(30), raw(31), raw(32)]),
+                ("write", 18, [raw(30)]),
+                ("write", 19, [raw(31)]),
+                ("write", 20, [raw(32)]),
+                ("read", 18, 3),
+            ]
+            assert [value(coordinator, key) for key in SETPOINTS.values()] == [30, 31, 32]
+
+    asyncio.run(run())
+
+
+def test_read_back_is_what_is_published(tmp_path):
+    async def run():
+        fake = FakeConnection(initial_registers())
+        # The unit clamps the setpoint
+        fake.stored = {18: raw(60)}
+        async with polling(tmp_path, connection=fake) as coordinator:
+            await coordinator.async_refresh()
+            await coordinator.async_write_register(18, raw(75))
+            assert value(coordinator, "setpoint_1") == 75
+            await _flush(coordinator)
+            assert value(coordinator, "setpoint_1") == 60
+
+    asyncio.run(run())
+
+
+def test_failed_read_back_rereads_on_the_next_poll(tmp_path):
+    async def run():
+        fake = FakeConnection(initial_registers())
+        async with polling(tmp_path, connection=fake) as coordinator:
+            await coordinator.async_refresh()
+            fake.fail_reads = {DIFF}
+            await coordinator.async_write_register(DIFF, 9)
+            await _flush(coordinator)
+            fake.fail_reads = set()
+            fake.requests.clear()
+            # The slow tier is not due for minutes, but the written register is read now
+            coordinator.clock.now += 1
+            await coordinator.async_refresh()
+            assert any(kind == "read" and start <= DIFF < start + count for kind, start, count in fake.requests)
+            assert value(coordinator, "diff_circuit_1") == 9
+
+    asyncio.run(run())
+
+
+def test_polls_keep_showing_writes_until_read_back(tmp_path):
+    async def run():
+        fake = FakeConnection(initial_registers())
+        old = fake.registers[DIFF]
+        async with polling(tmp_path, connection=fake) as coordinator:
+            clock = coordinator.clock
+            await coordinator.async_refresh()
+
+            # Queued: a poll reading the register still shows the new value
+            await coordinator.async_write_register(DIFF, old + 3)
+            clock.now += DEFAULT_SLOW_SCAN_SECS + 1
+            await coordinator.async_refresh()
+            assert value(coordinator, "diff_circuit_1") == old + 3
+
+            # Written but not read back: the same
+            fake.hold = asyncio.Event()
+            flush = asyncio.ensure_future(_flush(coordinator))
+            await asyncio.sleep(0.01)
+            assert coordinator._inflight_writes == {DIFF: old + 3}
+            fake.requests.clear()
+            clock.now += DEFAULT_SLOW_SCAN_SECS + 1
+            await coordinator.async_refresh()
+            assert any(kind == "read" and start <= DIFF < start + count for kind, start, count in fake.requests)
+            assert fake.registers[DIFF] == old
+            assert value(coordinator, "diff_circuit_1") == old + 3
+
+            # A newer value queued during the write is not dropped with it
+            await coordinator.async_write_register(DIFF, old + 4)
+            fake.hold.set()
+            await flush
+            assert coordinator._inflight_writes == {} and coordinator._pending_writes == {DIFF: old + 4}
+            assert value(coordinator, "diff_circuit_1") == old + 4
+            await _flush(coordinator)
+
+            # Read back: polls show the unit's value again
+            fake.registers[DIFF] = old
+            clock.now += DEFAULT_SLOW_SCAN_SECS + 1
+            await coordinator.async_refresh()
+            assert value(coordinator, "diff_circuit_1") == old
+
+    asyncio.run(run())
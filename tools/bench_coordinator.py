@@ -0,0 +1,101 @@
+"""SpiralaCoordinator run for simulated hours against the dynamic simulator.
+
+Needs Home Assistant installed (the coordinator is a DataUpdateCoordinator).
+The simulator and the coordinator share a simulated clock, so an hour of
+polling at a 1 s scan interval runs as fast as the polls themselves. One
+listener per decoded key stands in for the entities and counts the state
+writes they would make. CPU time is for the whole process and includes the
+in-process simulator, so compare runs rather than reading it absolutely.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import tempfile
+import time
+from types import SimpleNamespace
+
+from _pkg import load
+from simulator import SimulatedUnit, SpiralaModel, start_server
+
+try:
+    from homeassistant.core import HomeAssistant
+except ImportError:  # pragma: no cover - tools run without HA otherwise
+    raise SystemExit("bench_coordinator.py needs Home Assistant installed")
+
+const = load("const")
+coordinator_mod = load("coordinator")
+decoder = load("decoder")
+
+
+async def run(scan: float, hours: float, seed: int) -> dict[str, float]:
+    now = [0.0]
+    unit = SimulatedUnit(SpiralaModel(seed=seed), clock=lambda: now[0])
+    server = await start_server("127.0.0.1", 5020, [const.DEFAULT_UNIT_ID], units={const.DEFAULT_UNIT_ID: unit})
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        entry = SimpleNamespace(
+            entry_id="bench", options={},
+            data={"host": "127.0.0.1", "port": 5020, "unit_id": const.DEFAULT_UNIT_ID, "scan_interval": scan},
+        )
+        coordinator = coordinator_mod.SpiralaCoordinator(hass, entry)
+        # Polls are driven below on the simulated clock, not by HA's timer
+        coordinator.update_interval = None
+        coordinator.clock = lambda: now[0]
+        writes = [0]
+
+        def on_update() -> None:
+            writes[0] += 1
+
+        for key in coordinator.decoder.index:
+            if key not in decoder.EXTRA_KEYS:
+                coordinator.async_add_listener(on_update, key)
+        await coordinator.connection.connect()
+
+        polls = int(hours * 3600 / scan)
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        for i in range(polls):
+            now[0] = i * scan
+            await coordinator.async_refresh()
+        wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+        await coordinator.async_close()
+
+    await server.shutdown()
+    sim_secs = hours * 3600
+    return {
+        "scan_s": scan,
+        "polls": polls,
+        "polls_per_s": polls / wall,
+        "requests_per_sim_s": coordinator.stats.requests / sim_secs,
+        "requests_per_poll": coordinator.stats.requests / polls,
+        "cpu_ms_per_poll": cpu / polls * 1000,
+        "cpu_s_per_sim_h": cpu / hours,
+        "state_writes": writes[0],
+        "state_writes_per_sim_h": writes[0] / hours,
+        "suppressed": coordinator.publish_stats["suppressed_writes"],
+        "starts_count": coordinator.data.get("starts_count") if coordinator.data else None,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--hours", type=float, default=1.0)
+    parser.add_argument("--scan", type=float, action="append", default=None,
+                        help="scan interval in seconds, repeatable (default 1, 5, 30)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    results = [await run(scan, args.hours, args.seed) for scan in args.scan or (1, 5, 30)]
+    columns = list(results[0])
+    print(f"{args.hours:g} simulated hour(s) per run")
+    print("  ".join(columns))
+    for row in results:
+        print("  ".join(
+            f"{row[c]:>{len(c)}.3f}" if isinstance(row[c], float) else f"{row[c]!s:>{len(c)}}" for c in columns
+        ))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
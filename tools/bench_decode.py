@@ -0,0 +1,90 @@
+"""Decode cost per poll: legacy dict pipeline vs the compiled decode plan.
+
+Both decode the same full-poll responses from the simulator register
+image. The legacy path is the per-poll dict rebuild the coordinator used
+before the decode plan, followed by the bit shifts the binary sensors did
+on every state write.
+"""
+from __future__ import annotations
+
+import argparse
+import timeit
+
+from _pkg import load
+from simulator import initial_registers
+
+const = load("const")
+decoder = load("decoder")
+planner = load("planner")
+registers = load("registers")
+
+
+def _legacy_maps():
+    """The per-group dict maps const.py had before the register schema."""
+    maps: dict[str, dict[str, int]] = {}
+    for p in registers.REGISTERS:
+        if p.word is None:
+            maps.setdefault(p.group, {})[p.key] = p.addr
+    bits = {}
+    for p in registers.REGISTERS:
+        if p.word is not None:
+            bits.setdefault(p.word, []).append((p.key, p.bit))
+    return maps, bits
+
+
+MAPS, BITS = _legacy_maps()
+
+
+def legacy_decode(responses):
+    data = {}
+    for start, regs in responses:
+        for i, value in enumerate(regs):
+            data[start + i] = value
+    for name, hi_addr in MAPS["counter"].items():
+        data[name] = (data.get(hi_addr, 0) << 16) | data.get(hi_addr + 1, 0)
+    for k, addr in MAPS["temperature"].items():
+        raw = data.get(addr)
+        data[k] = None if raw is None else raw / 256.0
+    for group in ("status", "percent", "diff", "mode", "feature"):
+        for k, addr in MAPS[group].items():
+            data[k] = data.get(addr)
+    for k, addr in MAPS["setpoint"].items():
+        raw = data.get(addr)
+        data[k] = None if raw is None else raw / 256.0
+    for word_key, bits in BITS.items():
+        for _, bit in bits:
+            word = data.get(word_key)
+            _ = None if word is None else bool((word >> bit) & 1)
+    return data
+
+
+def plan_decode(plan, snapshot, responses):
+    values = snapshot.values
+    for start, regs in responses:
+        plan.decode(start, regs, values)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    image = initial_registers()
+    reads = planner.ReadPlanner(planner.spans_by_tier(), const.DEFAULT_MAX_REGS_PER_READ,
+                                const.DEFAULT_READ_GAP, auto_tune=False).plan
+    responses = [(start, image[start:start + count]) for start, count in reads]
+    plan = decoder.DecodePlan()
+    snapshot = plan.new_snapshot()
+    legacy = legacy_decode(responses)
+    plan_decode(plan, snapshot, responses)
+    for key, value in snapshot.as_dict().items():
+        assert key not in legacy or legacy[key] == value, key
+
+    for name, fn in (("legacy", lambda: legacy_decode(responses)),
+                     ("decode plan", lambda: plan_decode(plan, snapshot, responses))):
+        secs = min(timeit.repeat(fn, number=args.number, repeat=5)) / args.number
+        print(f"{name:<12}{secs * 1e6:>8.2f} us/poll")
+
+
+if __name__ == "__main__":
+    main()
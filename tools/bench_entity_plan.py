@@ -0,0 +1,77 @@
+"""Registers per poll for a range of entity configurations.
+
+The coordinator only polls the registers of the keys entities listen to,
+plus the values it needs itself (planner.internal_keys: the inputs of the
+history, journal, statistics and metrics, or with --consumers-off only the
+feature flags and io_contactor). This builds the
+entity set of each configuration the way the platforms do (entry options
+and feature flags), disables some on top, and reports reads and registers
+for a fast-tier poll and a poll of every tier, with the wire time of the
+fast poll on an RTU bus at --baudrate.
+"""
+from __future__ import annotations
+
+import argparse
+
+from _pkg import load
+
+const = load("const")
+planner = load("planner")
+registers = load("registers")
+
+ALL_FEATURES = {"has_circuit_2": True, "enable_dhw": True}
+
+
+def entity_keys(options: dict, features: dict) -> set[str]:
+    """Keys of the register entities created for an entry (see entity.platform_points)."""
+    return {
+        p.key for p in registers.REGISTERS
+        if p.platform is not None
+        and (p.requires is None or options.get(*p.requires))
+        and (p.flag is None or features.get(p.flag))
+    }
+
+
+def configurations() -> dict[str, set[str] | None]:
+    full = entity_keys({"has_circuit_2": True}, ALL_FEATURES)
+    single = entity_keys({}, {"enable_dhw": True})
+    points = {p.key: p for p in registers.REGISTERS}
+    return {
+        "before entities listen": None,
+        "circuit 2 and DHW": full,
+        "defaults (one circuit)": single,
+        "one circuit, no DHW": entity_keys({}, {}),
+        "binary sensors disabled": {k for k in single if points[k].platform != "binary_sensor"},
+        "counters, diffs disabled": {k for k in single if points[k].group not in ("counter", "diff")},
+        "no register entities": set(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-regs", type=int, default=const.DEFAULT_MAX_REGS_PER_READ)
+    parser.add_argument("--gap", type=int, default=const.DEFAULT_READ_GAP)
+    parser.add_argument("--baudrate", type=int, default=const.DEFAULT_BAUDRATE)
+    parser.add_argument("--consumers-off", action="store_true",
+                        help="history, journal, statistics and metrics off")
+    args = parser.parse_args()
+    on = not args.consumers_off
+    internal = planner.internal_keys(history=on, journal=on, statistics=on, metrics=on)
+    every_tier = list(const.POLL_TIERS)
+    print(f"{'configuration':<26}{'entities':>9}{'fast reads':>11}{'fast regs':>10}"
+          f"{'all reads':>10}{'all regs':>9}{'rtu fast ms':>12}")
+    for name, keys in configurations().items():
+        polled = None if keys is None else internal | keys
+        plan = planner.ReadPlanner(
+            planner.spans_by_tier(registers.REGISTERS, polled), args.max_regs, args.gap, auto_tune=False
+        )
+        fast = plan.plan_for([const.POLL_TIER_FAST])
+        full = plan.plan_for(every_tier)
+        wire = sum(planner.rtu_read_secs(args.baudrate, count) for _, count in fast)
+        entities = "all" if keys is None else len(keys)
+        print(f"{name:<26}{entities:>9}{len(fast):>11}{sum(c for _, c in fast):>10}"
+              f"{len(full):>10}{sum(c for _, c in full):>9}{wire * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Snapshot export into a local Unix socket, per format.
+
+Needs Home Assistant installed. Polls the simulator through the
+coordinator with export enabled to a Unix socket this script listens on,
+checks every poll arrived, and reports bytes per poll and the time spent
+on the poll path. A second run sends to a sink that never completes, to
+show that submitting stays cheap and the queue stays bounded.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+from _pkg import load
+from simulator import start_server
+
+try:
+    from homeassistant.core import HomeAssistant
+except ImportError:  # pragma: no cover - tools run without HA otherwise
+    raise SystemExit("bench_export.py needs Home Assistant installed")
+
+const = load("const")
+coordinator_mod = load("coordinator")
+export = load("export")
+
+
+class StalledSink:
+    async def async_send(self, payload: bytes) -> None:
+        await asyncio.Event().wait()
+
+    async def async_close(self) -> None:
+        return None
+
+
+async def run_format(hass, fmt: str, path: str, received: list[bytes], polls: int) -> None:
+    received.clear()
+    entry = SimpleNamespace(
+        entry_id=f"bench-{fmt}", options={},
+        data={"host": "127.0.0.1", "port": 5020, "unit_id": const.DEFAULT_UNIT_ID,
+              "export_format": fmt, "export_target": f"unix://{path}"},
+    )
+    coordinator = coordinator_mod.SpiralaCoordinator(hass, entry)
+    coordinator.config_entry = None
+    coordinator.async_add_listener(lambda: None)
+    await coordinator.async_setup()
+    submit = 0.0
+    submit_export = coordinator._export
+
+    def timed_export(snapshot, elapsed):
+        nonlocal submit
+        t0 = time.perf_counter()
+        submit_export(snapshot, elapsed)
+        submit += time.perf_counter() - t0
+
+    coordinator._export = timed_export
+    for _ in range(polls):
+        await coordinator.async_refresh()
+    await coordinator.async_close()
+    await asyncio.sleep(0.1)
+    stats = coordinator.exporter.stats
+    size = sum(map(len, received))
+    t0 = time.perf_counter()
+    coordinator.exporter.encode([(time.time(), 1.0, b"\xff" * 8, coordinator.data.values)] * 20)
+    encode_us = (time.perf_counter() - t0) / 20 * 1e6
+    assert stats["sent"] == stats["records"], stats
+    print(f"{fmt:<8} records={stats['records']:<4} batches={stats['batches']:<3} bytes/poll={size / stats['records']:6.0f} "
+          f"submit={submit / polls * 1e6:5.1f} us/poll encode={encode_us:5.1f} us/record")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--polls", type=int, default=50)
+    args = parser.parse_args()
+    server = await start_server("127.0.0.1", 5020, [const.DEFAULT_UNIT_ID])
+    with tempfile.TemporaryDirectory() as config_dir:
+        os.makedirs(os.path.join(config_dir, ".storage"))
+        path = os.path.join(config_dir, "export.sock")
+        received: list[bytes] = []
+
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            while data := await reader.read(65536):
+                received.append(data)
+
+        listener = await asyncio.start_unix_server(handle, path)
+        hass = HomeAssistant(config_dir)
+        for fmt in const.EXPORT_FORMATS:
+            await run_format(hass, fmt, path, received, args.polls)
+
+        exporter = export.SnapshotExporter(hass, StalledSink(), "msgpack", ["a", "b"], {})
+        records = const.EXPORT_QUEUE_MAX * 5
+        t0 = time.perf_counter()
+        for i in range(records):
+            exporter.submit(float(i), 0.01, 1, [1.0, 2])
+        submit_us = (time.perf_counter() - t0) / records * 1e6
+        print(f"stalled sink: {records} submits at {submit_us:.1f} us, queued={len(exporter._queue)} "
+              f"dropped={exporter.stats['dropped']}")
+        exporter._task.cancel()
+        listener.close()
+        await hass.async_block_till_done()
+    await server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,175 @@
+"""Import time of the integration and setup time of an entry.
+
+Needs Home Assistant installed. Each import run is a fresh interpreter
+that first imports the Home Assistant modules the integration uses (HA
+has them loaded before it imports an integration), then times importing
+the package and its platforms, and checks pymodbus was not imported with
+them. `-X importtime` of one run gives the heaviest modules. Setup runs
+the coordinator part of `async_setup_entry` against the simulator and
+builds every entity the platforms would add. The simulator imports
+pymodbus itself, so the setup time does not include importing it.
+
+With --max-import-ms / --max-setup-ms it exits non-zero when a median is
+over budget or pymodbus is imported with the package, so a regression
+fails CI instead of slowing down every HA start.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+from _pkg import PKG_DIR, PKG_NAME
+
+try:
+    from homeassistant.core import HomeAssistant
+except ImportError:  # pragma: no cover - tools run without HA otherwise
+    raise SystemExit("bench_import.py needs Home Assistant installed")
+
+PLATFORM_MODULES = ("binary_sensor", "number", "select", "sensor", "switch", "diagnostics", "config_flow")
+# Loaded by HA itself before any integration
+PRELOAD = (
+    "voluptuous", "homeassistant.core", "homeassistant.config_entries", "homeassistant.helpers.storage",
+    "homeassistant.helpers.update_coordinator", "homeassistant.helpers.config_validation",
+    "homeassistant.helpers.device_registry", "homeassistant.components.sensor",
+    "homeassistant.components.binary_sensor", "homeassistant.components.number",
+    "homeassistant.components.select", "homeassistant.components.switch",
+)
+
+_IMPORT_RUN = """
+import sys, time
+sys.path.insert(0, {path!r})
+# __import__ rather than importlib, which -X importtime does not see
+for name in {preload!r}:
+    __import__(name)
+sys.stderr.write("-- timed\\n")
+t0 = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+print(time.perf_counter() - t0, "pymodbus" in sys.modules)
+"""
+
+
+def _script(modules: list[str]) -> str:
+    return _IMPORT_RUN.format(path=str(PKG_DIR.parent), preload=PRELOAD, modules=modules)
+
+
+def import_runs(modules: list[str], runs: int) -> tuple[list[float], bool]:
+    times = []
+    pymodbus = False
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _script(modules)], capture_output=True, text=True, check=True)
+        secs, loaded = out.stdout.split()
+        times.append(float(secs))
+        pymodbus |= loaded == "True"
+    return times, pymodbus
+
+
+def heaviest(modules: list[str], top: int) -> list[tuple[int, str]]:
+    """(cumulative us, module) of the modules first imported with the package, heaviest first."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _script(modules)], capture_output=True, text=True, check=True
+    )
+    rows = []
+    timed = out.stderr.split("-- timed\n", 1)[1]
+    for line in timed.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+async def setup_run(config_dir: str) -> tuple[float, float, int]:
+    """Seconds to set up the coordinator and to build the entities, and their number."""
+    coordinator_mod = sys.modules[f"{PKG_NAME}.coordinator"]
+    entity = sys.modules[f"{PKG_NAME}.entity"]
+    platforms = {
+        "binary_sensor": sys.modules[f"{PKG_NAME}.binary_sensor"].BitBinarySensor,
+        "number": sys.modules[f"{PKG_NAME}.number"].SpiralaNumber,
+        "select": sys.modules[f"{PKG_NAME}.select"].ThermostatModeSelect,
+        "switch": sys.modules[f"{PKG_NAME}.switch"].RegisterSwitch,
+    }
+    sensor = sys.modules[f"{PKG_NAME}.sensor"]
+    hass = HomeAssistant(config_dir)
+    entry = SimpleNamespace(entry_id="bench", options={}, data={"host": "127.0.0.1", "port": 5020, "unit_id": 1})
+    coordinator = coordinator_mod.SpiralaCoordinator(hass, entry)
+    coordinator.config_entry = None
+    t0 = time.perf_counter()
+    await coordinator.async_setup()
+    t1 = time.perf_counter()
+    ents = [cls(coordinator, p) for platform, cls in platforms.items()
+            for p in entity.platform_points(coordinator, platform)]
+    ents += [sensor.SpiralaSensor(coordinator, p) for p in entity.platform_points(coordinator, "sensor")]
+    ents += [sensor.SpiralaStatSensor(coordinator, d) for d in sensor.STAT_DESCRIPTIONS]
+    ents += [sensor.SpiralaMetricSensor(coordinator, d) for d in sensor.METRIC_DESCRIPTIONS]
+    t2 = time.perf_counter()
+    await coordinator.async_close()
+    await hass.async_block_till_done()
+    await hass.async_stop(force=True)
+    return t1 - t0, t2 - t1, len(ents)
+
+
+async def setup_runs(runs: int) -> tuple[list[float], list[float], int]:
+    from simulator import start_server
+
+    server = await start_server("127.0.0.1", 5020, [1])
+    setups, entities, count = [], [], 0
+    for _ in range(runs):
+        # No startup cache, so setup waits for the first refresh every time
+        with tempfile.TemporaryDirectory() as config_dir:
+            os.makedirs(os.path.join(config_dir, ".storage"))
+            setup, build, count = await setup_run(config_dir)
+        setups.append(setup)
+        entities.append(build)
+    await server.shutdown()
+    return setups, entities, count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--max-import-ms", type=float)
+    parser.add_argument("--max-setup-ms", type=float)
+    args = parser.parse_args()
+    failures = []
+
+    modules = [PKG_NAME, *(f"{PKG_NAME}.{m}" for m in PLATFORM_MODULES)]
+    times, pymodbus = import_runs(modules, args.runs)
+    import_ms = statistics.median(times) * 1000
+    print(f"import package and platforms: median {import_ms:.1f} ms, min {min(times) * 1000:.1f} ms "
+          f"over {args.runs} runs, pymodbus imported: {pymodbus}")
+    pymodbus_times, _ = import_runs(["pymodbus.client"], args.runs)
+    print(f"import pymodbus.client for reference: median {statistics.median(pymodbus_times) * 1000:.1f} ms")
+    print("heaviest modules (cumulative):")
+    for us, name in heaviest(modules, args.top):
+        print(f"  {us / 1000:8.1f} ms  {name}")
+    if pymodbus:
+        failures.append("pymodbus is imported with the package")
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        failures.append(f"import {import_ms:.1f} ms > {args.max_import_ms} ms")
+
+    sys.path.insert(0, str(PKG_DIR.parent))
+    for module in modules:
+        __import__(module)
+    setups, builds, count = asyncio.run(setup_runs(args.runs))
+    setup_ms = statistics.median(setups) * 1000
+    print(f"setup (first refresh): median {setup_ms:.1f} ms, max {max(setups) * 1000:.1f} ms")
+    print(f"build {count} entities: median {statistics.median(builds) * 1000:.2f} ms")
+    if args.max_setup_ms is not None and setup_ms > args.max_setup_ms:
+        failures.append(f"setup {setup_ms:.1f} ms > {args.max_setup_ms} ms")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Compare the legacy fixed batches with the planned reads.
+
+Runs against the local simulator, optionally behind a proxy that adds a
+gateway-like turnaround per request, and reports requests and registers
+per poll and the wall time per poll for both plans. The "fast" rows are
+the polls in between medium/slow tier refreshes.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from pymodbus.client import AsyncModbusTcpClient
+
+from _pkg import load
+from simulator import start_gateway_proxy, start_server
+
+const = load("const")
+planner = load("planner")
+
+LEGACY_BATCHES = [(0, 16), (16, 20), (27, 10), (36, 4), (40, 51), (150, 4)]
+
+
+async def run_plan(client: AsyncModbusTcpClient, plan, polls: int, unit: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(polls):
+        for start, count in plan:
+            rr = await client.read_holding_registers(start, count=count, device_id=unit)
+            assert not rr.isError(), rr
+    return (time.perf_counter() - t0) / polls
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--polls", type=int, default=50)
+    parser.add_argument("--turnaround-ms", type=float, default=20.0)
+    parser.add_argument("--max-regs", type=int, default=const.DEFAULT_MAX_REGS_PER_READ)
+    parser.add_argument("--gap", type=int, default=const.DEFAULT_READ_GAP)
+    args = parser.parse_args()
+
+    unit = const.DEFAULT_UNIT_ID
+    server = await start_server("127.0.0.1", 5020, [unit])
+    proxy = await start_gateway_proxy(5021, 5020, args.turnaround_ms / 1000)
+    client = AsyncModbusTcpClient("127.0.0.1", port=5021)
+    await client.connect()
+
+    tuned = planner.ReadPlanner(planner.spans_by_tier(), args.max_regs, args.gap)
+    for start, count in tuned.plan * 10:
+        t0 = time.perf_counter()
+        await client.read_holding_registers(start, count=count, device_id=unit)
+        tuned.record(count, time.perf_counter() - t0)
+
+    fixed = planner.ReadPlanner(planner.spans_by_tier(), args.max_regs, args.gap, auto_tune=False)
+    plans = {
+        "legacy": LEGACY_BATCHES,
+        "planned": fixed.plan,
+        f"tuned(gap={tuned.gap})": tuned.plan,
+        "planned fast": fixed.plan_for([const.POLL_TIER_FAST]),
+        "tuned fast": tuned.plan_for([const.POLL_TIER_FAST]),
+    }
+    print(f"{'plan':<16}{'req/poll':>10}{'regs/poll':>11}{'ms/poll':>10}")
+    for name, plan in plans.items():
+        wall = await run_plan(client, plan, args.polls, unit)
+        regs = sum(c for _, c in plan)
+        print(f"{name:<16}{len(plan):>10}{regs:>11}{wall * 1000:>10.1f}")
+
+    client.close()
+    proxy.close()
+    await server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
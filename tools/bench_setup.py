@@ -0,0 +1,91 @@
+"""Setup time of a config entry with a cold vs warm startup cache.
+
+Needs Home Assistant installed. Runs the coordinator part of
+`async_setup_entry` (history, cache, first refresh) against the simulator
+behind a gateway proxy that delays every request, and against a gateway
+that accepts connections but never answers. "ready" is when setup returns
+and the platforms could be forwarded, "fresh" when the first poll of the
+device is in.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+from _pkg import load
+from simulator import start_gateway_proxy, start_server
+
+try:
+    from homeassistant.core import HomeAssistant
+except ImportError:  # pragma: no cover - tools run without HA otherwise
+    raise SystemExit("bench_setup.py needs Home Assistant installed")
+
+const = load("const")
+coordinator_mod = load("coordinator")
+
+
+async def setup_once(config_dir: str, port: int) -> tuple[float, float | None, bool]:
+    hass = HomeAssistant(config_dir)
+    entry = SimpleNamespace(
+        entry_id="bench", options={},
+        data={"host": "127.0.0.1", "port": port, "unit_id": const.DEFAULT_UNIT_ID},
+    )
+    coordinator = coordinator_mod.SpiralaCoordinator(hass, entry)
+    t0 = time.perf_counter()
+    try:
+        await coordinator.async_setup()
+    except Exception:  # noqa: BLE001 - ConfigEntryNotReady; HA would retry later
+        ready = None
+    else:
+        ready = time.perf_counter() - t0
+    fresh = None
+    if ready is not None:
+        # Wait for the background revalidation, bounded like HA's retry would be
+        for _ in range(200):
+            if coordinator.stats.polls and coordinator.last_update_success:
+                fresh = time.perf_counter() - t0
+                break
+            if coordinator.stats.polls and not coordinator.last_update_success:
+                break
+            await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - t0
+    await coordinator.async_close()
+    await hass.async_block_till_done()
+    return ready if ready is not None else elapsed, fresh, ready is not None
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turnaround-ms", type=float, default=150.0)
+    args = parser.parse_args()
+
+    server = await start_server("127.0.0.1", 5020, [const.DEFAULT_UNIT_ID])
+    slow = await start_gateway_proxy(5021, 5020, args.turnaround_ms / 1000)
+    dead = await start_gateway_proxy(5022, 5020, delay=3600)
+
+    print(f"{'gateway':<10} {'cache':<6} {'setup':>8} {'ready_s':>8} {'fresh_s':>8}")
+    with tempfile.TemporaryDirectory() as config_dir:
+        os.makedirs(os.path.join(config_dir, ".storage"))
+        for label, port in (("slow", 5021), ("offline", 5022)):
+            for cache in ("cold", "warm"):
+                path = os.path.join(config_dir, ".storage", f"{const.DOMAIN}.bench")
+                if cache == "cold" and os.path.exists(path):
+                    os.remove(path)
+                if cache == "warm" and not os.path.exists(path):
+                    # Warm the cache from the healthy gateway first
+                    await setup_once(config_dir, 5021)
+                ready, fresh, ok = await setup_once(config_dir, port)
+                fresh_s = f"{fresh:8.3f}" if fresh is not None else f"{'-':>8}"
+                print(f"{label:<10} {cache:<6} {'ok' if ok else 'retry':>8} {ready:8.3f} {fresh_s}")
+
+    slow.close()
+    dead.close()
+    await server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
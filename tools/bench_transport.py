@@ -0,0 +1,79 @@
+"""Poll throughput per transport: Modbus TCP, RTU over TCP and RTU on a serial port.
+
+The RTU transports run against the simulator's RtuBus, paced at the bus
+baud rate, through a pty (serial) or a raw TCP port (RTU over TCP). Each
+RTU transport is polled with the fixed TCP read plan and with the plan
+sized for its baud rate, reporting reads and registers per poll, poll
+time, the longest single request (how long a write could wait behind a
+read) and polls per second.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from _pkg import load
+from simulator import RtuBus, start_server
+
+const = load("const")
+connection = load("connection")
+planner = load("planner")
+
+
+async def run(conn, unit: int, plan: list[tuple[int, int]], polls: int) -> dict[str, float]:
+    slowest = 0.0
+    t0 = time.perf_counter()
+    for _ in range(polls):
+        for start, count in plan:
+            rr, rtt = await conn.read_holding_registers(unit, start, count)
+            assert not rr.isError(), rr
+            slowest = max(slowest, rtt)
+    wall = time.perf_counter() - t0
+    return {"poll_ms": wall / polls * 1000, "slowest_ms": slowest * 1000, "polls_s": polls / wall}
+
+
+def report(label: str, plan: list[tuple[int, int]], result: dict[str, float]) -> None:
+    regs = sum(count for _, count in plan)
+    print(f"{label:<28} reads={len(plan):<3} regs={regs:<4} poll={result['poll_ms']:7.1f} ms "
+          f"slowest={result['slowest_ms']:6.1f} ms polls/s={result['polls_s']:6.2f} "
+          f"regs/s={regs * result['polls_s']:8.0f}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--baudrate", type=int, default=const.DEFAULT_BAUDRATE)
+    parser.add_argument("--polls", type=int, default=10)
+    args = parser.parse_args()
+    unit = const.DEFAULT_UNIT_ID
+    spans = planner.spans_by_tier()
+
+    def plan_for(transport: str) -> list[tuple[int, int]]:
+        max_count, gap = planner.plan_defaults({"transport": transport, "baudrate": args.baudrate})
+        return planner.ReadPlanner(spans, max_count, gap, auto_tune=False).plan
+
+    tcp_plan = plan_for(const.TRANSPORT_TCP)
+    print(f"bus {args.baudrate} baud, {args.polls} polls of every tier")
+
+    server = await start_server("127.0.0.1", 5020, [unit])
+    conn = connection.SpiralaConnection("127.0.0.1", 5020)
+    report("tcp", tcp_plan, await run(conn, unit, tcp_plan, args.polls))
+    conn.close()
+    await server.shutdown()
+
+    bus = await RtuBus([unit], args.baudrate).start()
+    await bus.start_tcp("127.0.0.1", 5022)
+    for transport, host, port in (
+        (const.TRANSPORT_RTU_OVER_TCP, "127.0.0.1", 5022),
+        (const.TRANSPORT_SERIAL, bus.device, 0),
+    ):
+        conn = connection.SpiralaConnection(host, port, transport, baudrate=args.baudrate)
+        report(f"{transport} (tcp plan)", tcp_plan, await run(conn, unit, tcp_plan, args.polls))
+        rtu_plan = plan_for(transport)
+        report(f"{transport} (baud plan)", rtu_plan, await run(conn, unit, rtu_plan, args.polls))
+        conn.close()
+    await bus.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+"""Soak the shared connection against a gateway that drops and errors.
+
+Polls through the fault-injecting proxy, then takes the gateway away for
+a while and brings it back. Reports how requests ended and checks the
+connection reconnected with backoff instead of hammering the dead port.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import collections
+import time
+
+from _pkg import load
+from simulator import start_gateway_proxy, start_server
+
+const = load("const")
+connection = load("connection")
+ModbusConnectionError, ModbusError = connection.ModbusConnectionError, connection.ModbusError
+
+
+async def poll(conn, unit: int, seconds: float, outcomes: collections.Counter) -> None:
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        try:
+            rr, _ = await conn.read_holding_registers(unit, 0, 40)
+            outcomes["exception_response" if rr.isError() else "ok"] += 1
+        except ModbusConnectionError:
+            outcomes["not_connected"] += 1
+        except (ModbusError, asyncio.TimeoutError):
+            outcomes["timeout"] += 1
+        await asyncio.sleep(0.05)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--outage", type=float, default=4.0)
+    parser.add_argument("--drop-rate", type=float, default=0.02)
+    parser.add_argument("--exception-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    unit = const.DEFAULT_UNIT_ID
+    server = await start_server("127.0.0.1", 5020, [unit])
+
+    def gateway():
+        return start_gateway_proxy(5021, 5020, delay=0.005, jitter=0.005, drop_rate=args.drop_rate,
+                                   exception_rate=args.exception_rate, seed=1)
+
+    proxy = await gateway()
+    conn = connection.SpiralaConnection("127.0.0.1", 5021)
+    conn.add_unit(unit)
+    outcomes: collections.Counter = collections.Counter()
+
+    await poll(conn, unit, args.seconds, outcomes)
+    print(f"flaky gateway: {dict(outcomes)} reconnects={conn.reconnects}")
+
+    proxy.close()
+    await proxy.wait_closed()
+    conn._connection_lost()
+    before = outcomes["not_connected"]
+    await poll(conn, unit, args.outage, outcomes)
+    print(f"outage: {outcomes['not_connected'] - before} fast failures, state={conn.state}")
+
+    proxy = await gateway()
+    deadline = time.monotonic() + 30
+    ok_before = outcomes["ok"]
+    while outcomes["ok"] == ok_before and time.monotonic() < deadline:
+        await poll(conn, unit, 0.5, outcomes)
+    print(f"recovered: state={conn.state} reconnects={conn.reconnects}")
+    assert outcomes["ok"] > ok_before, "connection did not recover"
+
+    conn.close()
+    proxy.close()
+    await server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
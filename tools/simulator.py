@@ -0,0 +1,501 @@
+"""Local Modbus simulator serving the Spirala register map.
+
+Served over Modbus TCP by default, or as an RTU bus (`--rtu`) on a pty
+and, optionally, behind an RTU-over-TCP port; the bus is paced at its baud
+rate so frames take their real wire time. Units are static register
+images by default. A unit can also be driven by
+`SpiralaModel` (tank temperatures, compressor hysteresis, counters) or by
+replaying a recorded register trace, and can answer with injected latency
+and exception responses. Time comes from a clock callable so benchmarks
+can run simulated hours against it in seconds.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import random
+import struct
+import time
+import tty
+from typing import Callable
+
+from pymodbus import FramerType
+from pymodbus.client import AsyncModbusTcpClient
+from pymodbus.constants import ExcCodes
+from pymodbus.datastore import ModbusDeviceContext, ModbusSequentialDataBlock, ModbusServerContext
+from pymodbus.server import ModbusSerialServer, ModbusTcpServer
+
+from _pkg import load
+
+const = load("const")
+registers = load("registers")
+ADDR = registers.ADDRESSES
+
+REGISTER_COUNT = 200
+
+
+def initial_registers() -> list[int]:
+    regs = [0] * REGISTER_COUNT
+    for p in registers.REGISTERS:
+        if p.group == "temperature":
+            regs[p.addr] = int((45.0 if "tank" in p.key else 35.0) * 256)
+    for key, temp in (("setpoint_1", 45), ("setpoint_2", 40), ("setpoint_dhw", 50)):
+        regs[ADDR[key]] = temp * 256
+    regs[ADDR["starts_count"] + 1] = 12345
+    regs[ADDR["runtime_hours"] + 1] = 6789
+    regs[ADDR["enable_dhw"]] = 1
+    regs[ADDR["dhw_enable"]] = 1
+    for addr, ch in enumerate(b"H1gm30350:151120", start=0):
+        reg = 170 + addr // 2
+        regs[reg] |= ch << (8 if addr % 2 == 0 else 0)
+    return regs
+
+
+def _temp(value: float) -> int:
+    return int(round(value * 256)) & 0xFFFF
+
+
+def _read_temp(raw: int) -> float:
+    return (raw - 0x10000 if raw & 0x8000 else raw) / 256
+
+
+class SpiralaModel:
+    """Coarse thermal model of one heat pump.
+
+    Circuit 1 and the DHW tank lose heat towards the room, the compressor
+    heats whichever circuit asked for it and stops at its setpoint. A
+    circuit asks for heat once it is `diff` below the setpoint, DHW first.
+    Setpoints, differentials and the DHW enable are read from the registers
+    every step, so writes from the integration change the behaviour.
+    """
+
+    STEP_SECS = 5.0
+    MIN_OFF_SECS = 300.0
+    ROOM_TEMP = 20.0
+    # K/s while heating and loss coefficient per second
+    HEAT_RATE = {1: 0.004, 3: 0.006}
+    LOSS = 1 / 40000
+
+    def __init__(self, seed: int | None = None, noise: float = 0.03) -> None:
+        self.rng = random.Random(seed)
+        self.noise = noise
+        self.t: float | None = None
+        self.circuit = 0
+        self._demand = 0
+        self.stopped_at = -math.inf
+        self.run_secs = 0.0
+        self.temps = {"tank_temp_1": 40.0, "dhw_tank_temp": 47.0}
+
+    def advance(self, now: float, regs: list[int]) -> None:
+        if self.t is None:
+            self.t = now
+            self._init(regs)
+        while self.t < now:
+            dt = min(self.STEP_SECS, now - self.t)
+            self.t += dt
+            self._step(dt, regs)
+        self._publish(regs)
+
+    def _init(self, regs: list[int]) -> None:
+        for key, default in (("diff_circuit_1", 5), ("diff_dhw", 7)):
+            addr = ADDR[key]
+            regs[addr] = regs[addr] or default
+
+    def _setpoint(self, regs: list[int], circuit: int) -> tuple[float, float]:
+        if circuit == 3:
+            return _read_temp(regs[ADDR["setpoint_dhw"]]), regs[ADDR["diff_dhw"]]
+        return _read_temp(regs[ADDR["setpoint_1"]]), regs[ADDR["diff_circuit_1"]]
+
+    def _step(self, dt: float, regs: list[int]) -> None:
+        temps = self.temps
+        for key in temps:
+            temps[key] -= (temps[key] - self.ROOM_TEMP) * self.LOSS * dt
+        dhw = regs[ADDR["dhw_enable"]] and regs[ADDR["enable_dhw"]]
+        if self.circuit:
+            key = "dhw_tank_temp" if self.circuit == 3 else "tank_temp_1"
+            temps[key] += self.HEAT_RATE[self.circuit] * dt
+            self.run_secs += dt
+            self._demand = 0
+            if temps[key] >= self._setpoint(regs, self.circuit)[0]:
+                self.circuit = 0
+                self.stopped_at = self.t
+            return
+        demand = 0
+        for circuit, key in ((3, "dhw_tank_temp"), (1, "tank_temp_1")):
+            if circuit == 3 and not dhw:
+                continue
+            setpoint, diff = self._setpoint(regs, circuit)
+            if temps[key] <= setpoint - diff:
+                demand = circuit
+                break
+        self._demand = demand
+        if demand and self.t - self.stopped_at >= self.MIN_OFF_SECS:
+            self.circuit = demand
+            starts = ADDR["starts_count"]
+            value = ((regs[starts] << 16) | regs[starts + 1]) + 1
+            regs[starts], regs[starts + 1] = value >> 16 & 0xFFFF, value & 0xFFFF
+
+    def _publish(self, regs: list[int]) -> None:
+        noise = self.rng.uniform
+        temps = self.temps
+        outdoor = 2.0 + 6.0 * math.sin(2 * math.pi * (self.t % 86400) / 86400)
+        running = self.circuit != 0
+        heated = temps["dhw_tank_temp" if self.circuit == 3 else "tank_temp_1"]
+        supply = heated + (6.0 if running else 1.0)
+        regs[ADDR["tank_temp_1"]] = _temp(temps["tank_temp_1"] + noise(-self.noise, self.noise))
+        regs[ADDR["tank_temp_2"]] = _temp(temps["tank_temp_1"] - 0.5)
+        regs[ADDR["dhw_tank_temp"]] = _temp(temps["dhw_tank_temp"] + noise(-self.noise, self.noise))
+        regs[3] = _temp(outdoor)
+        regs[ADDR["supply_temp"]] = _temp(supply + noise(-self.noise, self.noise))
+        regs[ADDR["return_temp"]] = _temp(supply - (5.0 if running else 0.5))
+        if running:
+            reason = 0
+        elif self._demand:
+            reason = 3  # start_in: waiting out the minimum off time
+        else:
+            reason = 1  # heated
+        regs[ADDR["not_running_reason"]] = reason
+        regs[ADDR["active_circuit"]] = self.circuit
+        regs[ADDR["io_state"]] = (1 << 5 | 1 << 3) if running else 0
+        relays = 0
+        if running:
+            relays = 1 << 4 | (1 << 1 if self.circuit == 3 else 1 << 7)
+        regs[ADDR["relay_state"]] = relays
+        regs[ADDR["injector_valve_pct"]] = 60 if running else 0
+        regs[ADDR["cold_pump_pct"]] = 100 if running else 0
+        hours = ADDR["runtime_hours"]
+        if self.run_secs >= 3600:
+            value = ((regs[hours] << 16) | regs[hours + 1]) + int(self.run_secs // 3600)
+            regs[hours], regs[hours + 1] = value >> 16 & 0xFFFF, value & 0xFFFF
+            self.run_secs %= 3600
+
+
+class TraceReplay:
+    """Plays back a register trace recorded with `--record`.
+
+    A trace is JSON lines of `{"t": seconds, "regs": {"addr": value}}`;
+    each line holds the registers that changed since the previous one.
+    """
+
+    def __init__(self, path: str, loop: bool = True) -> None:
+        with open(path, encoding="utf-8") as fh:
+            self.frames = [
+                (line["t"], [(int(addr), value) for addr, value in line["regs"].items()])
+                for line in map(json.loads, fh) if line
+            ]
+        self.loop = loop
+        self.duration = self.frames[-1][0] if self.frames else 0.0
+        self.t0: float | None = None
+        self.pos = 0
+
+    def advance(self, now: float, regs: list[int]) -> None:
+        if self.t0 is None:
+            self.t0 = now
+        elapsed = now - self.t0
+        while True:
+            while self.pos < len(self.frames) and self.frames[self.pos][0] <= elapsed:
+                for addr, value in self.frames[self.pos][1]:
+                    regs[addr] = value
+                self.pos += 1
+            if not (self.loop and self.pos >= len(self.frames) and self.duration > 0
+                    and elapsed >= self.duration):
+                return
+            self.t0 += self.duration
+            elapsed -= self.duration
+            self.pos = 0
+
+
+class SimulatedUnit:
+    """Hooks a register source and fault injection into one unit's datastore.
+
+    `source` is advanced to `clock()` before every request. Each request
+    is answered after `delay` plus up to `jitter` seconds, and with
+    probability `exception_rate` a "slave device failure" is returned.
+    """
+
+    def __init__(self, source=None, clock: Callable[[], float] = time.monotonic, delay: float = 0.0,
+                 jitter: float = 0.0, exception_rate: float = 0.0, seed: int | None = None) -> None:
+        self.source = source
+        self.clock = clock
+        self.delay = delay
+        self.jitter = jitter
+        self.exception_rate = exception_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.cpu = 0.0
+
+    async def action(self, func_code, start_address, address, count, registers, values):
+        self.requests += 1
+        if self.delay or self.jitter:
+            await asyncio.sleep(self.delay + self.rng.uniform(0, self.jitter))
+        if self.exception_rate and self.rng.random() < self.exception_rate:
+            return ExcCodes.DEVICE_FAILURE
+        if self.source is not None:
+            t0 = time.process_time()
+            # The runtime block starts at protocol address start_address
+            self.source.advance(self.clock(), _Offset(registers, start_address))
+            self.cpu += time.process_time() - t0
+        return None
+
+
+class _Offset:
+    """Protocol-addressed view of a datastore block."""
+
+    __slots__ = ("regs", "base")
+
+    def __init__(self, regs: list[int], base: int) -> None:
+        self.regs = regs
+        self.base = base
+
+    def __getitem__(self, addr: int) -> int:
+        return self.regs[addr - self.base]
+
+    def __setitem__(self, addr: int, value: int) -> None:
+        self.regs[addr - self.base] = value
+
+
+def build_context(unit_ids: list[int], images: dict[int, list[int]] | None = None,
+                  units: dict[int, SimulatedUnit] | None = None) -> ModbusServerContext:
+    images = images or {}
+    units = units or {}
+    devices = {}
+    for uid in unit_ids:
+        device = ModbusDeviceContext(hr=ModbusSequentialDataBlock(1, images.get(uid) or initial_registers()))
+        if uid in units:
+            device.simdevice.action = units[uid].action
+        devices[uid] = device
+    return ModbusServerContext(devices=devices, single=False)
+
+
+async def start_server(host: str, port: int, unit_ids: list[int],
+                       images: dict[int, list[int]] | None = None,
+                       units: dict[int, SimulatedUnit] | None = None) -> ModbusTcpServer:
+    server = ModbusTcpServer(build_context(unit_ids, images, units), address=(host, port))
+    asyncio.create_task(server.serve_forever())
+    await asyncio.sleep(0.1)
+    return server
+
+
+class RtuBus:
+    """An RS485 bus with the simulated units on it, reachable over ptys or TCP.
+
+    The units are served by a pymodbus RTU server on one pty. Everything
+    reaching the bus is paced at `baudrate`: a chunk of bytes is delivered
+    after its wire time (11 bits per character), behind whatever is still on
+    the wire in either direction, since RS485 is half duplex. `device` is
+    the pty a serial client opens; `start_tcp` adds an RTU-over-TCP port
+    like a transparent serial gateway.
+    """
+
+    def __init__(self, unit_ids: list[int], baudrate: int = 9600, images: dict[int, list[int]] | None = None,
+                 units: dict[int, SimulatedUnit] | None = None) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.char_secs = 11 / baudrate
+        self._free_at = 0.0
+        self._fds: list[int] = []
+        self._server_fd, server_path = self._pty()
+        self._client_fd, self.device = self._pty()
+        # Responses go back to whichever end sent the last request, like a gateway
+        self._reply_to: Callable[[bytes], None] = self._write_client
+        self.loop.add_reader(self._server_fd, self._from_server)
+        self.loop.add_reader(self._client_fd, self._from_client)
+        self.server = ModbusSerialServer(
+            build_context(unit_ids, images, units), framer=FramerType.RTU, port=server_path, baudrate=baudrate
+        )
+        self._tcp: asyncio.AbstractServer | None = None
+
+    def _pty(self) -> tuple[int, str]:
+        master, slave = os.openpty()
+        # No echo or line editing; the slave stays open so the master never sees EIO
+        tty.setraw(slave)
+        os.set_blocking(master, False)
+        self._fds += [master, slave]
+        return master, os.ttyname(slave)
+
+    async def start(self) -> RtuBus:
+        asyncio.create_task(self.server.serve_forever())
+        await asyncio.sleep(0.1)
+        return self
+
+    def _send(self, data: bytes, deliver: Callable[[bytes], None]) -> None:
+        at = max(self.loop.time(), self._free_at) + len(data) * self.char_secs
+        self._free_at = at
+        self.loop.call_at(at, deliver, data)
+
+    def _from_client(self) -> None:
+        with contextlib.suppress(BlockingIOError):
+            data = os.read(self._client_fd, 1024)
+            self._reply_to = self._write_client
+            self._send(data, self._write_server)
+
+    def _from_server(self) -> None:
+        with contextlib.suppress(BlockingIOError):
+            self._send(os.read(self._server_fd, 1024), self._reply_to)
+
+    def _write_server(self, data: bytes) -> None:
+        with contextlib.suppress(OSError):
+            os.write(self._server_fd, data)
+
+    def _write_client(self, data: bytes) -> None:
+        with contextlib.suppress(OSError):
+            os.write(self._client_fd, data)
+
+    async def start_tcp(self, host: str, port: int) -> None:
+        """Serve the bus as raw RTU frames over TCP, one gateway for every connection."""
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            with contextlib.suppress(ConnectionError, asyncio.CancelledError):
+                while data := await reader.read(1024):
+                    self._reply_to = writer.write
+                    self._send(data, self._write_server)
+            writer.close()
+
+        self._tcp = await asyncio.start_server(handle, host, port)
+
+    async def close(self) -> None:
+        if self._tcp is not None:
+            self._tcp.close()
+        self.loop.remove_reader(self._server_fd)
+        self.loop.remove_reader(self._client_fd)
+        await self.server.shutdown()
+        for fd in self._fds:
+            os.close(fd)
+
+
+async def start_gateway_proxy(listen_port: int, target_port: int, delay: float = 0.0, jitter: float = 0.0,
+                              drop_rate: float = 0.0, exception_rate: float = 0.0,
+                              seed: int | None = None) -> asyncio.AbstractServer:
+    """TCP proxy in front of the simulator behaving like a flaky serial gateway.
+
+    Every request is delayed by `delay` plus up to `jitter` seconds. With
+    probability `drop_rate` the connection is dropped instead of forwarding
+    it, and with `exception_rate` a "slave device failure" exception
+    response is returned without asking the simulator.
+    """
+    rng = random.Random(seed)
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        up_reader, up_writer = await asyncio.open_connection("127.0.0.1", target_port)
+
+        async def upstream() -> None:
+            while True:
+                try:
+                    header = await reader.readexactly(7)
+                    tid, _, length, unit = struct.unpack(">HHHB", header)
+                    pdu = await reader.readexactly(length - 1)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    # Client went away
+                    up_writer.close()
+                    return
+                await asyncio.sleep(delay + rng.uniform(0, jitter))
+                roll = rng.random()
+                if roll < drop_rate:
+                    writer.close()
+                    up_writer.close()
+                    return
+                if roll < drop_rate + exception_rate:
+                    writer.write(struct.pack(">HHHBBB", tid, 0, 3, unit, pdu[0] | 0x80, 0x04))
+                    await writer.drain()
+                    continue
+                up_writer.write(header + pdu)
+                await up_writer.drain()
+
+        async def downstream() -> None:
+            while data := await up_reader.read(260):
+                writer.write(data)
+                await writer.drain()
+            writer.close()
+
+        with contextlib.suppress(asyncio.CancelledError):
+            await asyncio.gather(upstream(), downstream(), return_exceptions=True)
+        writer.close()
+        up_writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", listen_port)
+
+
+async def record_trace(host: str, port: int, unit: int, path: str, seconds: float, interval: float) -> int:
+    """Poll a real (or simulated) unit and write the changed registers as a trace."""
+    client = AsyncModbusTcpClient(host, port=port)
+    await client.connect()
+    last: list[int | None] = [None] * REGISTER_COUNT
+    lines = 0
+    t0 = time.monotonic()
+    with open(path, "w", encoding="utf-8") as fh:
+        while (t := time.monotonic() - t0) < seconds:
+            regs: list[int] = []
+            for start in range(0, REGISTER_COUNT, 100):
+                rr = await client.read_holding_registers(start, count=100, device_id=unit)
+                if rr.isError():
+                    break
+                regs.extend(rr.registers)
+            else:
+                changed = {str(a): v for a, v in enumerate(regs) if last[a] != v}
+                if changed:
+                    fh.write(json.dumps({"t": round(t, 3), "regs": changed}) + "\n")
+                    lines += 1
+                last[:] = regs
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - t0 - t)))
+    client.close()
+    return lines
+
+
+async def _main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5020)
+    parser.add_argument("--unit", type=int, action="append", default=None)
+    parser.add_argument("--mode", choices=("static", "model", "replay"), default="model")
+    parser.add_argument("--trace", help="trace file for --mode replay")
+    parser.add_argument("--speed", type=float, default=1.0, help="simulated seconds per second")
+    parser.add_argument("--delay", type=float, default=0.0, help="response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--exception-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0,
+                        help="drop the connection instead of answering (served through a proxy)")
+    parser.add_argument("--record", metavar="FILE",
+                        help="record a trace from --host/--port/--unit instead of serving")
+    parser.add_argument("--seconds", type=float, default=3600.0, help="recording length")
+    parser.add_argument("--interval", type=float, default=1.0, help="recording poll interval")
+    parser.add_argument("--rtu", action="store_true",
+                        help="serve an RTU bus on a pty, and as RTU over TCP on --port")
+    parser.add_argument("--baudrate", type=int, default=9600, help="bus baud rate with --rtu")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    unit_ids = args.unit or [const.DEFAULT_UNIT_ID]
+    if args.record:
+        lines = await record_trace(args.host, args.port, unit_ids[0], args.record, args.seconds, args.interval)
+        print(f"{lines} trace lines written to {args.record}")
+        return
+
+    t0 = time.monotonic()
+
+    def clock() -> float:
+        return (time.monotonic() - t0) * args.speed
+
+    units = {}
+    for uid in unit_ids:
+        if args.mode == "model":
+            source = SpiralaModel(seed=args.seed)
+        elif args.mode == "replay":
+            source = TraceReplay(args.trace)
+        else:
+            source = None
+        units[uid] = SimulatedUnit(source, clock, args.delay, args.jitter, args.exception_rate, args.seed)
+    if args.rtu:
+        bus = await RtuBus(unit_ids, args.baudrate, units=units).start()
+        await bus.start_tcp(args.host, args.port)
+        print(f"RTU bus at {args.baudrate} baud on {bus.device}, RTU over TCP on {args.host}:{args.port}")
+        await asyncio.Event().wait()
+    port = args.port + 1 if args.drop_rate else args.port
+    server = ModbusTcpServer(build_context(unit_ids, units=units), address=(args.host, port))
+    if args.drop_rate:
+        await start_gateway_proxy(args.port, port, drop_rate=args.drop_rate, seed=args.seed)
+    await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())